@@ -0,0 +1,366 @@
+"""
+GUI-independent application core: constants, paths, settings and IPv4
+validation. Shared by the PyQt5 window (main.py) and the headless batch
+mode, so it must never import PyQt5 or OpenGL.
+"""
+
+import os
+import sys
+import json
+import logging
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Tuple
+
+import pygeoip
+
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+SOFTWARE_VERSION = "v0.3.4"
+GEODB_VERSION = "v0.0.1"
+
+APP_SETTINGS_FILE_NAME = "geo_ip_tracker_settings.json"
+
+# GeoDB reader cache strategies (pygeoip flags):
+#   - standard : seek + read the file for every lookup (lowest memory)
+#   - mmap     : map the file; pages are shared through the OS page cache
+#   - memory   : read the whole file into process memory (fastest lookups)
+GEODB_CACHE_MODES = {
+    "standard": pygeoip.STANDARD,
+    "mmap": pygeoip.MMAP_CACHE,
+    "memory": pygeoip.MEMORY_CACHE,
+}
+# Not a pygeoip flag: lookups go through the precompiled, memory-mapped
+# index (geoip_index.py), which is rebuilt when the source .dat changes.
+GEODB_COMPILED_MODE = "compiled"
+GEODB_READER_MODES = tuple(GEODB_CACHE_MODES) + (GEODB_COMPILED_MODE,)
+DEFAULT_GEODB_CACHE_MODE = "standard"
+GEODB_CACHE_MODE_SETTING_KEY = "geodb_cache_mode"
+
+# In-process LRU cache of GeoIP records (see lookup_cache.py).
+GEOIP_CACHE_SIZE_SETTING_KEY = "geoip_cache_size"
+GEOIP_CACHE_TTL_SETTING_KEY = "geoip_cache_ttl_seconds"
+DEFAULT_GEOIP_CACHE_SIZE = 4096
+DEFAULT_GEOIP_CACHE_TTL_SECONDS = 0  # 0 = entries never expire
+
+VT_CACHE_TTL_SETTING_KEY = "vt_cache_ttl_seconds"
+DEFAULT_VT_CACHE_TTL_SECONDS = 24 * 60 * 60
+
+VT_CONNECT_TIMEOUT_SETTING_KEY = "vt_connect_timeout_seconds"
+VT_READ_TIMEOUT_SETTING_KEY = "vt_read_timeout_seconds"
+DEFAULT_VT_CONNECT_TIMEOUT_SECONDS = 5
+DEFAULT_VT_READ_TIMEOUT_SECONDS = 10
+
+# VirusTotal public API quota, per API key.
+VT_REQUESTS_PER_MINUTE_SETTING_KEY = "vt_requests_per_minute"
+VT_REQUESTS_PER_DAY_SETTING_KEY = "vt_requests_per_day"
+DEFAULT_VT_REQUESTS_PER_MINUTE = 4
+DEFAULT_VT_REQUESTS_PER_DAY = 500
+
+# With an offline ASN index, query RDAP for addresses it does not cover.
+RDAP_FALLBACK_SETTING_KEY = "rdap_fallback"
+DEFAULT_RDAP_FALLBACK = True
+
+# When to ask VirusTotal for a public IP, given the local blocklists:
+# "unlisted" = only for IPs no local list matches (a second opinion),
+# "always" = for every IP, "never" = local blocklists only.
+VT_LOOKUP_POLICY_SETTING_KEY = "vt_lookup_policy"
+VT_LOOKUP_POLICIES = ("unlisted", "always", "never")
+DEFAULT_VT_LOOKUP_POLICY = "unlisted"
+
+# Extra IPv4 ranges ("a.b.c.d/nn" or "a.b.c.d-e.f.g.h") classified as
+# internal (PRIVATE_IPV4), e.g. the organisation's own public blocks.
+INTERNAL_IP_RANGES_SETTING_KEY = "internal_ip_ranges"
+
+# Globe frame rates: full rate while the user interacts (and for
+# "globe_idle_after_seconds" after), idle rate otherwise (0 = stop
+# rendering when idle). Nothing is rendered while the window is minimized.
+GLOBE_FRAME_RATE_SETTING_KEY = "globe_frame_rate"
+GLOBE_IDLE_FRAME_RATE_SETTING_KEY = "globe_idle_frame_rate"
+GLOBE_IDLE_AFTER_SETTING_KEY = "globe_idle_after_seconds"
+DEFAULT_GLOBE_FRAME_RATE = 50
+DEFAULT_GLOBE_IDLE_FRAME_RATE = 10
+DEFAULT_GLOBE_IDLE_AFTER_SECONDS = 5
+
+
+# =============================================================================
+# App Config / Path helpers
+# =============================================================================
+
+@dataclass(frozen=True)
+class AppConfig:
+    vt_api_keys: Tuple[str, ...]
+    geo_db_path: str
+    kml_file_path: str
+    software_version: str
+    geodb_version: str
+
+
+def get_app_dir() -> str:
+    if getattr(sys, "frozen", False):
+        return os.path.dirname(sys.executable)
+    return os.path.dirname(os.path.abspath(__file__))
+
+
+def resource_path(file_path: str) -> str:
+    if hasattr(sys, "_MEIPASS"):
+        return os.path.join(sys._MEIPASS, file_path)
+    return os.path.join(os.path.abspath("."), file_path)
+
+
+def get_geo_db_file_path() -> str:
+    return resource_path("resource/GeoLiteCity.dat")
+
+
+def get_legacy_vt_api_key_file_path() -> str:
+    return os.path.join(get_app_dir(), "user_vt_api.key")
+
+
+def get_app_settings_file_path() -> str:
+    return os.path.join(get_app_dir(), APP_SETTINGS_FILE_NAME)
+
+
+def load_app_settings() -> dict:
+    settings_path = get_app_settings_file_path()
+
+    if not os.path.exists(settings_path):
+        return {}
+
+    try:
+        with open(settings_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        if isinstance(data, dict):
+            return data
+
+    except Exception:
+        logging.exception("Failed to load app settings file.")
+
+    return {}
+
+
+def save_app_settings(settings: dict) -> bool:
+    settings_path = get_app_settings_file_path()
+
+    try:
+        with open(settings_path, "w", encoding="utf-8") as f:
+            json.dump(settings, f, indent=4, ensure_ascii=False)
+        return True
+
+    except Exception:
+        logging.exception("Failed to save app settings file.")
+        return False
+
+
+def setup_logging() -> None:
+    try:
+        log_path = os.path.join(get_app_dir(), "geo_ip_tracker.log")
+        logging.basicConfig(
+            filename=log_path,
+            level=logging.INFO,
+            format="%(asctime)s [%(levelname)s] %(message)s",
+            encoding="utf-8",
+        )
+    except Exception:
+        logging.basicConfig(level=logging.INFO)
+
+
+def ensure_geodb_exists_or_exit(geo_db_path: str) -> None:
+    if not os.path.isfile(geo_db_path):
+        logging.error("GeoDB file not found: %s", geo_db_path)
+        sys.exit(1)
+
+
+def resolve_geodb_cache_mode(cli_value: Optional[str] = None) -> str:
+    """
+    Command line value wins over the settings file, which wins over the default.
+    """
+    if cli_value:
+        return cli_value
+
+    mode = str(load_app_settings().get(GEODB_CACHE_MODE_SETTING_KEY) or DEFAULT_GEODB_CACHE_MODE).lower()
+
+    if mode not in GEODB_READER_MODES:
+        logging.warning("Unknown GeoDB cache mode in settings: %s (using %s)", mode, DEFAULT_GEODB_CACHE_MODE)
+        return DEFAULT_GEODB_CACHE_MODE
+
+    return mode
+
+
+def load_geoip_cache_settings() -> Tuple[int, float]:
+    """
+    Returns (max_size, ttl_seconds) for the GeoIP record cache.
+    """
+    settings = load_app_settings()
+
+    try:
+        max_size = int(settings.get(GEOIP_CACHE_SIZE_SETTING_KEY, DEFAULT_GEOIP_CACHE_SIZE))
+        ttl_seconds = float(settings.get(GEOIP_CACHE_TTL_SETTING_KEY, DEFAULT_GEOIP_CACHE_TTL_SECONDS))
+    except (TypeError, ValueError):
+        logging.warning("Invalid GeoIP cache settings, using defaults.")
+        return DEFAULT_GEOIP_CACHE_SIZE, DEFAULT_GEOIP_CACHE_TTL_SECONDS
+
+    return max(0, max_size), max(0.0, ttl_seconds)
+
+
+def load_vt_cache_ttl() -> float:
+    """
+    Returns the age in seconds after which cached VirusTotal results are refreshed.
+    """
+    try:
+        ttl_seconds = float(load_app_settings().get(VT_CACHE_TTL_SETTING_KEY, DEFAULT_VT_CACHE_TTL_SECONDS))
+    except (TypeError, ValueError):
+        logging.warning("Invalid VirusTotal cache TTL in settings, using default.")
+        return DEFAULT_VT_CACHE_TTL_SECONDS
+
+    return max(0.0, ttl_seconds)
+
+
+def load_vt_http_timeouts() -> Tuple[float, float]:
+    """
+    Returns (connect_timeout, read_timeout) in seconds for VirusTotal requests.
+    """
+    settings = load_app_settings()
+
+    try:
+        connect_timeout = float(settings.get(VT_CONNECT_TIMEOUT_SETTING_KEY, DEFAULT_VT_CONNECT_TIMEOUT_SECONDS))
+        read_timeout = float(settings.get(VT_READ_TIMEOUT_SETTING_KEY, DEFAULT_VT_READ_TIMEOUT_SECONDS))
+    except (TypeError, ValueError):
+        logging.warning("Invalid VirusTotal timeout settings, using defaults.")
+        return DEFAULT_VT_CONNECT_TIMEOUT_SECONDS, DEFAULT_VT_READ_TIMEOUT_SECONDS
+
+    if connect_timeout <= 0 or read_timeout <= 0:
+        logging.warning("VirusTotal timeouts must be positive, using defaults.")
+        return DEFAULT_VT_CONNECT_TIMEOUT_SECONDS, DEFAULT_VT_READ_TIMEOUT_SECONDS
+
+    return connect_timeout, read_timeout
+
+
+def load_vt_quota_settings() -> Tuple[float, int]:
+    """
+    Returns (requests_per_minute, requests_per_day) allowed per VirusTotal API key.
+    """
+    settings = load_app_settings()
+
+    try:
+        per_minute = float(settings.get(VT_REQUESTS_PER_MINUTE_SETTING_KEY, DEFAULT_VT_REQUESTS_PER_MINUTE))
+        per_day = int(settings.get(VT_REQUESTS_PER_DAY_SETTING_KEY, DEFAULT_VT_REQUESTS_PER_DAY))
+    except (TypeError, ValueError):
+        per_minute, per_day = 0, 0
+
+    if per_minute <= 0 or per_day <= 0:
+        logging.warning("Invalid VirusTotal quota settings, using defaults.")
+        return DEFAULT_VT_REQUESTS_PER_MINUTE, DEFAULT_VT_REQUESTS_PER_DAY
+
+    return per_minute, per_day
+
+
+def load_globe_frame_rates() -> Tuple[float, float, float]:
+    """
+    Returns (frame_rate, idle_frame_rate, idle_after_seconds) for the globe view.
+    """
+    settings = load_app_settings()
+
+    try:
+        frame_rate = float(settings.get(GLOBE_FRAME_RATE_SETTING_KEY, DEFAULT_GLOBE_FRAME_RATE))
+        idle_frame_rate = float(settings.get(GLOBE_IDLE_FRAME_RATE_SETTING_KEY, DEFAULT_GLOBE_IDLE_FRAME_RATE))
+        idle_after = float(settings.get(GLOBE_IDLE_AFTER_SETTING_KEY, DEFAULT_GLOBE_IDLE_AFTER_SECONDS))
+    except (TypeError, ValueError):
+        frame_rate, idle_frame_rate, idle_after = 0, -1, -1
+
+    if frame_rate <= 0 or not 0 <= idle_frame_rate <= frame_rate or idle_after < 0:
+        logging.warning("Invalid globe frame rate settings, using defaults.")
+        return DEFAULT_GLOBE_FRAME_RATE, DEFAULT_GLOBE_IDLE_FRAME_RATE, DEFAULT_GLOBE_IDLE_AFTER_SECONDS
+
+    return frame_rate, idle_frame_rate, idle_after
+
+
+def load_rdap_fallback_enabled() -> bool:
+    value = load_app_settings().get(RDAP_FALLBACK_SETTING_KEY, DEFAULT_RDAP_FALLBACK)
+    if not isinstance(value, bool):
+        logging.warning("Invalid RDAP fallback setting, using default.")
+        return DEFAULT_RDAP_FALLBACK
+    return value
+
+
+def load_vt_lookup_policy() -> str:
+    value = load_app_settings().get(VT_LOOKUP_POLICY_SETTING_KEY, DEFAULT_VT_LOOKUP_POLICY)
+    if value not in VT_LOOKUP_POLICIES:
+        logging.warning("Invalid VirusTotal lookup policy in settings, using default.")
+        return DEFAULT_VT_LOOKUP_POLICY
+    return value
+
+
+def load_internal_ip_ranges() -> List[str]:
+    value = load_app_settings().get(INTERNAL_IP_RANGES_SETTING_KEY, [])
+    if not isinstance(value, list):
+        logging.warning("Invalid internal IP ranges setting, ignoring it.")
+        return []
+    return value
+
+
+def open_geoip_reader(geo_db_path: str, cache_mode: str = DEFAULT_GEODB_CACHE_MODE):
+    """
+    Returns an object with `record_by_name` (pygeoip.GeoIP or CompiledGeoIPIndex).
+    """
+    if cache_mode == GEODB_COMPILED_MODE:
+        from geoip_index import load_or_compile_geoip_index
+        reader = load_or_compile_geoip_index(geo_db_path)
+    else:
+        reader = pygeoip.GeoIP(geo_db_path, flags=GEODB_CACHE_MODES[cache_mode])
+    logging.info("GeoDB opened: %s (cache mode: %s)", geo_db_path, cache_mode)
+    return reader
+
+
+# =============================================================================
+# Validation
+# =============================================================================
+
+_ip_classifier = None
+
+
+def get_ip_classifier():
+    """
+    The process-wide compiled classifier (see ip_classifier.py), built on
+    first use with the internal ranges from the settings file.
+    """
+    global _ip_classifier
+    if _ip_classifier is None:
+        from ip_classifier import IpClassifier, parse_internal_ranges
+        _ip_classifier = IpClassifier(parse_internal_ranges(load_internal_ip_ranges()))
+    return _ip_classifier
+
+
+def classify_ip_address(ip_text: str) -> Tuple[Optional[str], str, Optional[str]]:
+    """
+    Classify user input as public/private/unsupported IPv4.
+
+    Returns:
+        (normalized_ip, status_code, message)
+
+    status_code values:
+        - PUBLIC_IPV4
+        - PRIVATE_IPV4 (also for the configured internal ranges)
+        - INVALID
+        - UNSUPPORTED
+    """
+    return get_ip_classifier().classify(ip_text)
+
+
+def classify_ip_addresses(ip_texts: Iterable[str]) -> List[Tuple[Optional[str], str, Optional[str]]]:
+    """
+    `classify_ip_address` for a batch of inputs, in order.
+    """
+    return get_ip_classifier().classify_many(ip_texts)
+
+
+def parse_ip_address(ip_text: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Backward-compatible public IPv4 validator.
+    """
+    ip_addr, status_code, message = classify_ip_address(ip_text)
+    if status_code == "PUBLIC_IPV4":
+        return ip_addr, None
+    return None, message
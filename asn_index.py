@@ -0,0 +1,356 @@
+"""
+Offline IP-to-ASN index.
+
+`python main.py import-asn ip2asn-v4.tsv[.gz]` imports a public IP-to-ASN
+dataset (iptoasn.com format: range start, range end, AS number, country
+code, AS description; tab separated, addresses dotted or as integers) into
+a memory-mapped sorted-interval file next to GeoLiteCity.dat.
+
+Lookups are one binary search over the range starts: microseconds per
+address, or one vectorized pass per batch chunk. They answer the ASN fields
+shown in the "Target network details" panel without an RDAP round trip.
+`asn_cidr` is the largest CIDR block of the matching range that contains
+the address, so it is at most as wide as the announced prefix.
+"""
+
+import os
+import sys
+import socket
+import struct
+import logging
+import argparse
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app_core import get_geo_db_file_path, load_app_settings, setup_logging
+from geoip_bulk import ipv4_to_uint32
+from range_index import (
+    NO_RANGE,
+    StringInterner,
+    StringTable,
+    covering_prefix_length,
+    covering_prefix_lengths,
+    file_sha256,
+    format_cidr,
+    lookup_range_slot,
+    lookup_range_slots,
+    map_index_file,
+    open_dataset,
+    read_header_bytes,
+    resolve_overlaps,
+    string_table_sections,
+    write_index_file,
+)
+
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+ASN_INDEX_MAGIC = b"ASNIDX\0\0"
+ASN_INDEX_VERSION = 1
+ASN_INDEX_FILE_NAME = "ip2asn.idx"
+
+# Overrides the default index location (next to GeoLiteCity.dat).
+ASN_INDEX_PATH_SETTING_KEY = "asn_index_path"
+
+# magic, version, source_sha256, source_size, source_mtime_ns,
+# range_count, string_count, blob_size
+ASN_INDEX_HEADER = struct.Struct("<8sI32sQqIIQ")
+
+
+def get_default_asn_index_path() -> str:
+    return os.path.join(os.path.dirname(get_geo_db_file_path()), ASN_INDEX_FILE_NAME)
+
+
+def get_asn_index_file_path() -> str:
+    return load_app_settings().get(ASN_INDEX_PATH_SETTING_KEY) or get_default_asn_index_path()
+
+
+def asn_index_sections(range_count: int, string_count: int, blob_size: int) -> List[Tuple[str, str, int]]:
+    return [
+        ("starts", "<u4", range_count),
+        ("ends", "<u4", range_count),
+        ("asn", "<u4", range_count),
+        ("str_country", "<u4", range_count),
+        ("str_description", "<u4", range_count),
+    ] + string_table_sections(string_count, blob_size)
+
+
+# =============================================================================
+# Import
+# =============================================================================
+
+def _parse_ipv4(text: str) -> Optional[int]:
+    if text.isdigit():
+        value = int(text)
+        return value if value <= 0xFFFFFFFF else None
+    try:
+        return int.from_bytes(socket.inet_aton(text), "big")
+    except OSError:
+        return None
+
+
+def iter_ip2asn_rows(lines: Iterable[str]) -> Iterator[Tuple[int, int, int, str, str]]:
+    """
+    Yields (start, end, asn, country_code, description) for every routed
+    IPv4 row. IPv6 rows, "Not routed" rows (AS 0) and malformed lines are
+    skipped.
+    """
+    for line in lines:
+        fields = line.rstrip("\r\n").split("\t")
+        if len(fields) < 3 or line.startswith("#"):
+            continue
+
+        start = _parse_ipv4(fields[0])
+        end = _parse_ipv4(fields[1])
+        if start is None or end is None or end < start:
+            continue
+
+        try:
+            asn = int(fields[2])
+        except ValueError:
+            continue
+        if asn == 0:
+            continue
+
+        country_code = fields[3].strip() if len(fields) > 3 else ""
+        description = fields[4].strip() if len(fields) > 4 else ""
+        if country_code == "None":
+            country_code = ""
+
+        yield start, end, asn, country_code, description
+
+
+def import_asn_dataset(source_path: str, index_path: str) -> dict:
+    """
+    Builds the index from `source_path` and atomically writes it to
+    `index_path`. On overlap the later row wins inside its own extent and
+    an enclosing range continues after it; adjacent ranges of the same AS
+    are merged. Returns the written header.
+    """
+    stat = os.stat(source_path)
+    source_sha256 = file_sha256(source_path)
+
+    with open_dataset(source_path) as f:
+        # The longer range first at equal starts, so a nested one wins.
+        rows = sorted(iter_ip2asn_rows(f), key=lambda row: (row[0], -row[1]))
+
+    strings = StringInterner()
+    row_ids = [(strings.intern(row[3]), strings.intern(row[4])) for row in rows]
+    pieces = resolve_overlaps([row[0] for row in rows], [row[1] for row in rows])
+
+    starts: List[int] = []
+    ends: List[int] = []
+    asns: List[int] = []
+    countries: List[int] = []
+    descriptions: List[int] = []
+
+    for start, end, row in zip(*(values.tolist() for values in pieces)):
+        asn = rows[row][2]
+        country_id, description_id = row_ids[row]
+
+        if (
+            starts
+            and ends[-1] + 1 == start
+            and asns[-1] == asn
+            and countries[-1] == country_id
+            and descriptions[-1] == description_id
+        ):
+            ends[-1] = end
+            continue
+
+        starts.append(start)
+        ends.append(end)
+        asns.append(asn)
+        countries.append(country_id)
+        descriptions.append(description_id)
+
+    arrays = {
+        "starts": np.asarray(starts, dtype="<u4"),
+        "ends": np.asarray(ends, dtype="<u4"),
+        "asn": np.asarray(asns, dtype="<u4"),
+        "str_country": np.asarray(countries, dtype="<u4"),
+        "str_description": np.asarray(descriptions, dtype="<u4"),
+    }
+    arrays.update(strings.arrays())
+
+    header = {
+        "source_sha256": source_sha256,
+        "source_size": stat.st_size,
+        "source_mtime_ns": stat.st_mtime_ns,
+        "range_count": len(starts),
+        "string_count": len(strings),
+        "blob_size": strings.blob_size,
+    }
+
+    write_index_file(
+        index_path,
+        ASN_INDEX_HEADER.pack(
+            ASN_INDEX_MAGIC,
+            ASN_INDEX_VERSION,
+            header["source_sha256"],
+            header["source_size"],
+            header["source_mtime_ns"],
+            header["range_count"],
+            header["string_count"],
+            header["blob_size"],
+        ),
+        asn_index_sections(header["range_count"], header["string_count"], header["blob_size"]),
+        arrays,
+    )
+
+    logging.info(
+        "ASN index written: %s (%d source rows, %d ranges, %d strings)",
+        index_path,
+        len(rows),
+        header["range_count"],
+        header["string_count"],
+    )
+
+    return dict(header, source_rows=len(rows))
+
+
+def read_asn_index_header(index_path: str) -> Optional[dict]:
+    fields = read_header_bytes(index_path, ASN_INDEX_HEADER)
+    if fields is None:
+        return None
+
+    magic, version, source_sha256, source_size, source_mtime_ns, range_count, string_count, blob_size = fields
+    if magic != ASN_INDEX_MAGIC or version != ASN_INDEX_VERSION:
+        return None
+
+    return {
+        "source_sha256": source_sha256,
+        "source_size": source_size,
+        "source_mtime_ns": source_mtime_ns,
+        "range_count": range_count,
+        "string_count": string_count,
+        "blob_size": blob_size,
+    }
+
+
+# =============================================================================
+# Reader
+# =============================================================================
+
+class AsnIndex:
+    def __init__(self, index_path: str):
+        header = read_asn_index_header(index_path)
+        if header is None:
+            raise ValueError(f"Not a compatible ASN index: {index_path}")
+
+        self.index_path = index_path
+        self.header = header
+
+        self._mmap, views = map_index_file(
+            index_path,
+            ASN_INDEX_HEADER,
+            asn_index_sections(header["range_count"], header["string_count"], header["blob_size"]),
+        )
+        self.starts = views["starts"]
+        self.ends = views["ends"]
+        self.asns = views["asn"]
+        self.country_ids = views["str_country"]
+        self.description_ids = views["str_description"]
+        self.strings = StringTable(views["string_offsets"], views["string_blob"])
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def _record(self, slot: int, ip_num: int, prefix_len: int) -> dict:
+        country_code = self.strings.get(int(self.country_ids[slot]))
+        description = self.strings.get(int(self.description_ids[slot])) or "No data"
+
+        return {
+            "asn": str(int(self.asns[slot])),
+            # Same shape as ipwhois' asn_description ("NAME, CC").
+            "asn_description": f"{description}, {country_code}" if country_code else description,
+            "asn_country_code": country_code,
+            "asn_cidr": format_cidr(ip_num, prefix_len),
+        }
+
+    def lookup_one(self, ip_addr: str) -> Optional[dict]:
+        """
+        ASN fields for one IPv4 address, or None when it is not routed.
+        """
+        try:
+            ip_num = int.from_bytes(socket.inet_aton(ip_addr), "big")
+        except OSError:
+            return None
+
+        slot = lookup_range_slot(self.starts, self.ends, ip_num)
+        if slot == NO_RANGE:
+            return None
+
+        prefix_len = covering_prefix_length(ip_num, int(self.starts[slot]), int(self.ends[slot]))
+        return self._record(slot, ip_num, prefix_len)
+
+    def lookup(self, ip_addrs: List[str]) -> List[Optional[dict]]:
+        """
+        Vectorized `lookup_one` over a list of IPv4 strings.
+        """
+        ip_nums, valid = ipv4_to_uint32(ip_addrs)
+        slots = lookup_range_slots(self.starts, self.ends, ip_nums)
+        slots[~valid] = NO_RANGE
+
+        hit = slots != NO_RANGE
+        prefix_lengths = np.zeros(len(slots), dtype=np.int64)
+        prefix_lengths[hit] = covering_prefix_lengths(
+            ip_nums[hit], self.starts[slots[hit]], self.ends[slots[hit]]
+        )
+
+        return [
+            self._record(slot, ip_num, prefix_len) if slot != NO_RANGE else None
+            for slot, ip_num, prefix_len in zip(slots.tolist(), ip_nums.tolist(), prefix_lengths.tolist())
+        ]
+
+
+def open_asn_index(index_path: Optional[str] = None) -> Optional[AsnIndex]:
+    """
+    Opens the offline ASN index; None when none was imported (lookups then
+    go to RDAP).
+    """
+    index_path = index_path or get_asn_index_file_path()
+
+    if not os.path.isfile(index_path):
+        logging.info("No offline ASN index at %s", index_path)
+        return None
+
+    try:
+        index = AsnIndex(index_path)
+    except (OSError, ValueError):
+        logging.exception("Failed to open ASN index: %s", index_path)
+        return None
+
+    logging.info("ASN index opened: %s (%d ranges)", index_path, len(index))
+    return index
+
+
+# =============================================================================
+# Entrypoint (`python main.py import-asn`)
+# =============================================================================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="main.py import-asn",
+        description="Import an IP-to-ASN dataset (iptoasn.com TSV, optionally .gz) into the offline ASN index.",
+    )
+    parser.add_argument("dataset", help="Path to ip2asn-v4.tsv / ip2asn-v4-u32.tsv (or .gz).")
+    parser.add_argument("-o", "--output", default=None, help="Index path (default: next to GeoLiteCity.dat).")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+
+    if not os.path.isfile(args.dataset):
+        print(f"Dataset not found: {args.dataset}", file=sys.stderr)
+        return 1
+
+    index_path = args.output or get_asn_index_file_path()
+    header = import_asn_dataset(args.dataset, index_path)
+    print(
+        f"ASN index written: {index_path} "
+        f"({header['source_rows']} rows, {header['range_count']} ranges, {header['string_count']} strings)"
+    )
+    return 0
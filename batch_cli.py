@@ -0,0 +1,709 @@
+"""
+Headless batch mode: `python main.py batch [options]`.
+
+Reads IPs (one per line) from a file or stdin, classifies them, resolves
+GeoIP data and streams JSONL or CSV rows in fixed-size chunks, so memory
+stays constant regardless of input size. Chunks can be sharded across a
+process pool with --workers. Never imports PyQt5/OpenGL.
+"""
+
+import io
+import os
+import sys
+import csv
+import json
+import time
+import queue
+import logging
+import argparse
+import multiprocessing
+from collections import deque
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple
+
+import numpy as np
+
+from app_core import (
+    SOFTWARE_VERSION,
+    GEODB_READER_MODES,
+    DEFAULT_GEODB_CACHE_MODE,
+    get_geo_db_file_path,
+    setup_logging,
+    classify_ip_addresses,
+    resolve_geodb_cache_mode,
+    open_geoip_reader,
+    load_geoip_cache_settings,
+)
+from lookup_cache import LruTtlCache, CachedGeoIPReader
+from range_index import open_dataset
+
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+BATCH_OUTPUT_FORMATS = ("jsonl", "csv")
+BATCH_ENGINES = ("bulk", "pygeoip")
+
+DEFAULT_CHUNK_SIZE = 4096
+
+NO_GEOIP_DATA_MESSAGE = "No GeoIP data found."
+
+BATCH_FIELDS = (
+    "input",
+    "ip_addr",
+    "status",
+    "message",
+    "country_code",
+    "country_code3",
+    "country_name",
+    "continent",
+    "region_code",
+    "city",
+    "postal_code",
+    "latitude",
+    "longitude",
+    "time_zone",
+)
+
+GEO_FIELDS = BATCH_FIELDS[4:]
+
+# Appended with --asn / --rir / --blocklists: the keys of `AsnIndex.lookup`,
+# `RirIndex.lookup` and `BlocklistMatcher.lookup` records.
+ASN_BATCH_FIELDS = ("asn", "asn_description", "asn_country_code", "asn_cidr")
+RIR_BATCH_FIELDS = ("asn_registry", "asn_date", "rir_country_code")
+BLOCKLIST_BATCH_FIELDS = ("blocklists",)
+
+INDEX_BATCH_FIELDS = {
+    "asn": ASN_BATCH_FIELDS,
+    "rir": RIR_BATCH_FIELDS,
+    "blocklist": BLOCKLIST_BATCH_FIELDS,
+}
+
+INDEX_MISSING_HINTS = {
+    "asn": "run `main.py import-asn`",
+    "rir": "run `main.py import-rir`",
+    "blocklist": "add .netset/.txt/.csv lists to the blocklist directory",
+}
+
+RecordLookup = Callable[[List[str]], List[Optional[dict]]]
+
+# (output fields, lookup) of one offline index.
+IndexLookup = Tuple[Tuple[str, ...], RecordLookup]
+
+
+# =============================================================================
+# Input / row building
+# =============================================================================
+
+def iter_input_lines(stream: TextIO) -> Iterator[str]:
+    for line in stream:
+        text = line.strip()
+        if not text or text.startswith("#"):
+            continue
+        yield text
+
+
+def iter_chunks(items: Iterable[str], chunk_size: int) -> Iterator[List[str]]:
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def build_batch_row(
+    input_text: str,
+    ip_addr: Optional[str],
+    status_code: str,
+    message: Optional[str],
+    record: Optional[dict],
+    index_records: Sequence[Tuple[Tuple[str, ...], Optional[dict]]] = (),
+) -> dict:
+    row = {
+        "input": input_text,
+        "ip_addr": ip_addr,
+        "status": status_code,
+        "message": message,
+    }
+
+    if status_code == "PUBLIC_IPV4" and not record:
+        row["message"] = NO_GEOIP_DATA_MESSAGE
+
+    for field in GEO_FIELDS:
+        row[field] = record.get(field) if record else None
+
+    for fields, index_record in index_records:
+        for field in fields:
+            row[field] = index_record.get(field) if index_record else None
+
+    return row
+
+
+def make_record_lookup(
+    geo_db_path: str,
+    engine: str,
+    cache_mode: str = DEFAULT_GEODB_CACHE_MODE,
+    record_cache: Optional[LruTtlCache] = None,
+) -> Callable[[List[str]], List[Optional[dict]]]:
+    """
+    Returns a function mapping a list of public IPv4 strings to GeoIP records
+    (`record_by_name` dicts or None). `cache_mode` and `record_cache` apply
+    to the per-IP pygeoip engine; the bulk engine resolves whole chunks
+    against the compiled, memory-mapped GeoIP index.
+    """
+    if engine == "bulk":
+        from geoip_index import open_bulk_reader
+
+        bulk_reader = open_bulk_reader(geo_db_path)
+        return lambda ip_addrs: list(bulk_reader.lookup(ip_addrs).records())
+
+    geoip_reader = open_geoip_reader(geo_db_path, cache_mode)
+    if record_cache is not None:
+        geoip_reader = CachedGeoIPReader(geoip_reader, record_cache)
+
+    def lookup(ip_addrs: List[str]) -> List[Optional[dict]]:
+        records = []
+        for ip_addr in ip_addrs:
+            try:
+                records.append(geoip_reader.record_by_name(ip_addr))
+            except Exception:
+                logging.exception("GeoIP lookup failed: %s", ip_addr)
+                records.append(None)
+        return records
+
+    return lookup
+
+
+def make_index_lookup(kind: str, index_path: Optional[str] = None) -> Optional[IndexLookup]:
+    """
+    Vectorized lookup against the offline "asn" / "rir" index, or the
+    "blocklist" index compiled from the lists in `index_path` (a directory).
+    None when there is none. The parent process opens every index before
+    starting workers, so the blocklist index is compiled exactly once.
+    """
+    if kind == "asn":
+        from asn_index import open_asn_index as open_index
+    elif kind == "rir":
+        from rir_index import open_rir_index as open_index
+    else:
+        from blocklist_index import load_or_compile_blocklists
+
+        def open_index(blocklist_dir: Optional[str]):
+            return load_or_compile_blocklists([blocklist_dir] if blocklist_dir else None)
+
+    index = open_index(index_path)
+    return (INDEX_BATCH_FIELDS[kind], index.lookup) if index is not None else None
+
+
+def resolve_chunk(
+    chunk: List[str],
+    lookup_records: RecordLookup,
+    index_lookups: Sequence[IndexLookup] = (),
+) -> List[dict]:
+    classified = [(text,) + result for text, result in zip(chunk, classify_ip_addresses(chunk))]
+
+    public_ips = [ip_addr for _, ip_addr, status_code, _ in classified if status_code == "PUBLIC_IPV4"]
+    records = iter(lookup_records(public_ips))
+    index_records = [(fields, iter(lookup(public_ips))) for fields, lookup in index_lookups]
+
+    rows = []
+    for text, ip_addr, status_code, message in classified:
+        is_public = status_code == "PUBLIC_IPV4"
+        rows.append(build_batch_row(
+            text,
+            ip_addr,
+            status_code,
+            message,
+            next(records) if is_public else None,
+            [(fields, next(found) if is_public else None) for fields, found in index_records],
+        ))
+    return rows
+
+
+def iter_batch_rows(
+    lines: Iterable[str],
+    lookup_records: RecordLookup,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    index_lookups: Sequence[IndexLookup] = (),
+) -> Iterator[List[dict]]:
+    """
+    Yields one list of output rows per input chunk, in input order.
+    """
+    for chunk in iter_chunks(lines, chunk_size):
+        yield resolve_chunk(chunk, lookup_records, index_lookups)
+
+
+# =============================================================================
+# Parallel (multi-process) batch
+# =============================================================================
+
+_worker_lookup_records = None
+_worker_record_cache: Optional[LruTtlCache] = None
+_worker_index_lookups: List[IndexLookup] = []
+
+
+def _init_batch_worker(
+    geo_db_path: str,
+    engine: str,
+    cache_mode: str,
+    record_cache_size: int,
+    record_cache_ttl: float,
+    index_paths: Sequence[Tuple[str, str]] = (),
+) -> None:
+    """
+    Pool initializer. Workers default to the "mmap" cache mode, so every
+    worker maps the same GeoDB pages from the OS page cache instead of
+    holding a private copy. Each worker keeps its own record cache.
+    """
+    global _worker_lookup_records, _worker_record_cache, _worker_index_lookups
+    if engine == "pygeoip":
+        _worker_record_cache = LruTtlCache(record_cache_size, record_cache_ttl, name="GeoIP record cache")
+    _worker_lookup_records = make_record_lookup(geo_db_path, engine, cache_mode, _worker_record_cache)
+    _worker_index_lookups = [make_index_lookup(kind, index_path) for kind, index_path in index_paths]
+
+
+def _resolve_chunk_in_worker(chunk: List[str]) -> Tuple[int, List[dict], Optional[dict]]:
+    """
+    Rows of one chunk, with the worker's pid and current record cache
+    counters (None for the bulk engine).
+    """
+    rows = resolve_chunk(chunk, _worker_lookup_records, _worker_index_lookups)
+    cache_stats = _worker_record_cache.stats() if _worker_record_cache is not None else None
+    return os.getpid(), rows, cache_stats
+
+
+def _take_result(results: "queue.Queue") -> tuple:
+    result = results.get()
+    if isinstance(result, BaseException):
+        raise result
+    return result
+
+
+def iter_parallel_batch_rows(
+    lines: Iterable[str],
+    geo_db_path: str,
+    engine: str,
+    workers: int,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ordered: bool = True,
+    cache_mode: str = "mmap",
+    record_cache_size: int = 0,
+    record_cache_ttl: float = 0,
+    index_paths: Sequence[Tuple[str, str]] = (),
+    worker_cache_stats: Optional[Dict[int, dict]] = None,
+) -> Iterator[List[dict]]:
+    """
+    Shards input chunks across a process pool. `index_paths` lists the
+    (kind, path) offline indexes to join; every worker maps the same files.
+    `worker_cache_stats`, if given, receives the latest record cache
+    counters per worker pid.
+
+    At most `2 * workers` chunks are in flight, so memory stays bounded even
+    for unbounded input. With `ordered=False` chunks are yielded as soon as
+    they finish, which avoids head-of-line blocking behind a slow chunk.
+    """
+    max_in_flight = workers * 2
+
+    def rows_of(result: tuple) -> List[dict]:
+        pid, rows, cache_stats = result
+        if worker_cache_stats is not None and cache_stats is not None:
+            worker_cache_stats[pid] = cache_stats
+        return rows
+
+    with multiprocessing.Pool(
+        workers,
+        initializer=_init_batch_worker,
+        initargs=(geo_db_path, engine, cache_mode, record_cache_size, record_cache_ttl, index_paths),
+    ) as pool:
+        if ordered:
+            pending = deque()
+            for chunk in iter_chunks(lines, chunk_size):
+                pending.append(pool.apply_async(_resolve_chunk_in_worker, (chunk,)))
+                if len(pending) >= max_in_flight:
+                    yield rows_of(pending.popleft().get())
+
+            while pending:
+                yield rows_of(pending.popleft().get())
+            return
+
+        results = queue.Queue()
+        in_flight = 0
+        for chunk in iter_chunks(lines, chunk_size):
+            pool.apply_async(
+                _resolve_chunk_in_worker,
+                (chunk,),
+                callback=results.put,
+                error_callback=results.put,
+            )
+            in_flight += 1
+            if in_flight >= max_in_flight:
+                yield rows_of(_take_result(results))
+                in_flight -= 1
+
+        while in_flight:
+            yield rows_of(_take_result(results))
+            in_flight -= 1
+
+
+# =============================================================================
+# Output writers
+# =============================================================================
+
+class JsonlRowWriter:
+    def __init__(self, stream: TextIO):
+        self.stream = stream
+
+    def write_rows(self, rows: List[dict]) -> None:
+        self.stream.write("".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows))
+        self.stream.flush()
+
+
+class CsvRowWriter:
+    def __init__(self, stream: TextIO, fieldnames=BATCH_FIELDS):
+        self.stream = stream
+        self.writer = csv.DictWriter(stream, fieldnames=fieldnames, lineterminator="\n")
+        self.writer.writeheader()
+
+    def write_rows(self, rows: List[dict]) -> None:
+        self.writer.writerows(rows)
+        self.stream.flush()
+
+
+# =============================================================================
+# Statistics (--stats)
+# =============================================================================
+
+def merge_cache_stats(cache_stats: Sequence[dict]) -> Optional[dict]:
+    """
+    Sums the record cache counters of several workers.
+    """
+    if not cache_stats:
+        return None
+
+    merged = dict(cache_stats[0], workers=len(cache_stats))
+    for key in ("size", "max_size", "hits", "misses", "evictions", "expirations"):
+        merged[key] = sum(stats[key] for stats in cache_stats)
+    requests = merged["hits"] + merged["misses"]
+    merged["hit_rate"] = (merged["hits"] / requests) if requests else 0.0
+    return merged
+
+
+class BatchStats:
+    """
+    Run counters for any engine and worker count: rows per status, GeoIP
+    hits, throughput, and the pygeoip record cache counters (summed over
+    workers).
+    """
+
+    def __init__(self, engine: str, workers: int):
+        self.engine = engine
+        self.workers = workers
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        self.chunks = 0
+        self.rows = 0
+        self.geoip_found = 0
+        self.statuses: Dict[str, int] = {}
+        self.record_cache: Optional[dict] = None
+
+    def add_rows(self, rows: List[dict]) -> None:
+        self.chunks += 1
+        self.rows += len(rows)
+        for row in rows:
+            status_code = row["status"]
+            self.statuses[status_code] = self.statuses.get(status_code, 0) + 1
+            if status_code == "PUBLIC_IPV4" and row["message"] != NO_GEOIP_DATA_MESSAGE:
+                self.geoip_found += 1
+
+    def finish(self, record_cache: Optional[dict] = None) -> None:
+        self.finished = time.perf_counter()
+        self.record_cache = record_cache
+
+    def as_dict(self) -> dict:
+        seconds = (self.finished or time.perf_counter()) - self.started
+        return {
+            "engine": self.engine,
+            "workers": self.workers,
+            "chunks": self.chunks,
+            "rows": self.rows,
+            "statuses": dict(sorted(self.statuses.items())),
+            "geoip_found": self.geoip_found,
+            "seconds": round(seconds, 3),
+            "rows_per_second": round(self.rows / seconds, 1) if seconds > 0 else 0.0,
+            "record_cache": self.record_cache,
+        }
+
+    def log(self) -> None:
+        stats = self.as_dict()
+        logging.info(
+            "Batch stats: engine=%s workers=%d rows=%d geoip_found=%d seconds=%.3f rows/s=%.1f statuses=%s",
+            stats["engine"],
+            stats["workers"],
+            stats["rows"],
+            stats["geoip_found"],
+            stats["seconds"],
+            stats["rows_per_second"],
+            stats["statuses"],
+        )
+        if self.record_cache is not None:
+            logging.info(
+                "GeoIP record cache stats: hits=%d misses=%d evictions=%d expirations=%d hit_rate=%.1f%%",
+                self.record_cache["hits"],
+                self.record_cache["misses"],
+                self.record_cache["evictions"],
+                self.record_cache["expirations"],
+                self.record_cache["hit_rate"] * 100,
+            )
+
+
+# =============================================================================
+# Reading results back
+# =============================================================================
+
+def _iter_jsonl_rows(stream: TextIO) -> Iterator[dict]:
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            continue
+
+
+def read_batch_coordinates(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[np.ndarray]:
+    """
+    (latitude, longitude) float32 arrays of up to `chunk_size` rows of a
+    batch result file (JSONL, or CSV by extension; optionally .gz). Rows
+    without valid coordinates are skipped.
+    """
+    name = path[:-3] if path.endswith(".gz") else path
+    with open_dataset(path) as stream:
+        rows = csv.DictReader(stream) if name.lower().endswith(".csv") else _iter_jsonl_rows(stream)
+        for chunk in iter_chunks(rows, chunk_size):
+            coordinates = []
+            for row in chunk:
+                try:
+                    coordinates.append((float(row["latitude"]), float(row["longitude"])))
+                except (KeyError, TypeError, ValueError):
+                    continue
+
+            coordinates = np.array(coordinates, dtype=np.float32).reshape(-1, 2)
+            valid = (np.abs(coordinates[:, 0]) <= 90) & (np.abs(coordinates[:, 1]) <= 180)
+            if valid.any():
+                yield coordinates[valid]
+
+
+# =============================================================================
+# Entrypoint
+# =============================================================================
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="main.py batch",
+        description="Headless batch IPv4 classification and GeoIP lookup.",
+    )
+    parser.add_argument(
+        "-i", "--input", default="-",
+        help="Input file with one IP per line ('-' = stdin, default).",
+    )
+    parser.add_argument(
+        "-o", "--output", default="-",
+        help="Output file ('-' = stdout, default).",
+    )
+    parser.add_argument(
+        "-f", "--format", choices=BATCH_OUTPUT_FORMATS, default="jsonl",
+        help="Output format (default: jsonl).",
+    )
+    parser.add_argument(
+        "--geodb", default=None,
+        help="Path to GeoLiteCity.dat (default: bundled resource).",
+    )
+    parser.add_argument(
+        "--engine", choices=BATCH_ENGINES, default="bulk",
+        help="GeoIP lookup engine (default: bulk).",
+    )
+    parser.add_argument(
+        "--geodb-cache-mode", choices=GEODB_READER_MODES, default=None,
+        help="pygeoip reader cache mode (default: settings file, or "
+             f"'{DEFAULT_GEODB_CACHE_MODE}'; 'mmap' for --workers).",
+    )
+    parser.add_argument(
+        "--cache-size", type=int, default=None,
+        help="GeoIP record LRU cache entries for the pygeoip engine, 0 disables "
+             "(default: settings file, or 4096).",
+    )
+    parser.add_argument(
+        "--cache-ttl", type=float, default=None,
+        help="GeoIP record cache TTL in seconds, 0 = no expiry (default: settings file, or 0).",
+    )
+    parser.add_argument(
+        "--asn", action="store_true",
+        help="Add ASN columns (" + ", ".join(ASN_BATCH_FIELDS) + ") from the offline ASN index "
+             "(see `main.py import-asn`).",
+    )
+    parser.add_argument(
+        "--asn-index", default=None,
+        help="Path to the ASN index (default: settings file, or next to GeoLiteCity.dat).",
+    )
+    parser.add_argument(
+        "--rir", action="store_true",
+        help="Add registry columns (" + ", ".join(RIR_BATCH_FIELDS) + ") from the offline RIR "
+             "delegation index (see `main.py import-rir`).",
+    )
+    parser.add_argument(
+        "--rir-index", default=None,
+        help="Path to the RIR index (default: settings file, or next to GeoLiteCity.dat).",
+    )
+    parser.add_argument(
+        "--blocklists", action="store_true",
+        help="Add a `blocklists` column naming the local blocklists that contain each IP.",
+    )
+    parser.add_argument(
+        "--blocklist-dir", default=None,
+        help="Directory with .netset/.ipset/.txt/.list/.csv blocklists "
+             "(default: settings file, or `blocklists` next to GeoLiteCity.dat).",
+    )
+    parser.add_argument(
+        "--stats", action="store_true",
+        help="Print run statistics as JSON to stderr when done: rows per status, GeoIP hits, "
+             "throughput and, for the pygeoip engine, record cache counters (summed over workers).",
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+        help=f"Lines resolved per chunk (default: {DEFAULT_CHUNK_SIZE}).",
+    )
+    parser.add_argument(
+        "-w", "--workers", type=int, default=1,
+        help="Worker processes (0 = all cores, default: 1 = in-process).",
+    )
+    parser.add_argument(
+        "--unordered", action="store_true",
+        help="With --workers, emit chunks as they complete instead of in input order.",
+    )
+    parser.add_argument("--version", action="version", version=SOFTWARE_VERSION)
+    return parser
+
+
+def open_text_stream(path: str, mode: str, default: TextIO) -> TextIO:
+    if path == "-":
+        return default
+    return open(path, mode, encoding="utf-8", errors="replace", newline="")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_arg_parser().parse_args(argv)
+    setup_logging()
+
+    geo_db_path = args.geodb or get_geo_db_file_path()
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    chunk_size = max(1, args.chunk_size)
+
+    cache_size, cache_ttl = load_geoip_cache_settings()
+    cache_size = cache_size if args.cache_size is None else max(0, args.cache_size)
+    cache_ttl = cache_ttl if args.cache_ttl is None else max(0.0, args.cache_ttl)
+    record_cache = LruTtlCache(cache_size, cache_ttl, name="GeoIP record cache")
+
+    # Opened in this process for the serial path, and for the bulk engine
+    # also before starting workers, so the index is compiled exactly once.
+    if workers == 1 or args.engine == "bulk":
+        try:
+            lookup_records = make_record_lookup(
+                geo_db_path,
+                args.engine,
+                resolve_geodb_cache_mode(args.geodb_cache_mode),
+                record_cache,
+            )
+        except Exception as e:
+            logging.exception("Failed to open GeoIP database.")
+            print(f"Failed to open GeoIP database: {geo_db_path} ({e})", file=sys.stderr)
+            return 1
+
+    elif not os.path.isfile(geo_db_path):
+        logging.error("GeoDB file not found: %s", geo_db_path)
+        print(f"GeoDB file not found: {geo_db_path}", file=sys.stderr)
+        return 1
+
+    index_paths = []
+    if args.asn:
+        from asn_index import get_asn_index_file_path
+        index_paths.append(("asn", args.asn_index or get_asn_index_file_path()))
+    if args.rir:
+        from rir_index import get_rir_index_file_path
+        index_paths.append(("rir", args.rir_index or get_rir_index_file_path()))
+    if args.blocklists:
+        from blocklist_index import get_blocklist_dir
+        index_paths.append(("blocklist", args.blocklist_dir or get_blocklist_dir()))
+
+    index_lookups = []
+    for kind, index_path in index_paths:
+        index_lookup = make_index_lookup(kind, index_path)
+        if index_lookup is None:
+            print(
+                f"{kind.upper()} index not found or unreadable: {index_path} ({INDEX_MISSING_HINTS[kind]})",
+                file=sys.stderr,
+            )
+            return 1
+        index_lookups.append(index_lookup)
+
+    stats = BatchStats(args.engine, workers)
+    worker_cache_stats: Dict[int, dict] = {}
+
+    stdin = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8", errors="replace")
+    input_stream = open_text_stream(args.input, "r", stdin)
+    output_stream = open_text_stream(args.output, "w", sys.stdout)
+
+    try:
+        if args.format == "csv":
+            writer = CsvRowWriter(
+                output_stream,
+                BATCH_FIELDS + sum((fields for fields, _ in index_lookups), ()),
+            )
+        else:
+            writer = JsonlRowWriter(output_stream)
+        lines = iter_input_lines(input_stream)
+
+        if workers == 1:
+            row_chunks = iter_batch_rows(lines, lookup_records, chunk_size, index_lookups)
+        else:
+            row_chunks = iter_parallel_batch_rows(
+                lines,
+                geo_db_path,
+                args.engine,
+                workers,
+                chunk_size,
+                ordered=not args.unordered,
+                cache_mode=args.geodb_cache_mode or "mmap",
+                record_cache_size=cache_size,
+                record_cache_ttl=cache_ttl,
+                index_paths=index_paths,
+                worker_cache_stats=worker_cache_stats,
+            )
+
+        for rows in row_chunks:
+            writer.write_rows(rows)
+            stats.add_rows(rows)
+
+    except BrokenPipeError:
+        # Downstream consumer (e.g. `head`) closed the pipe.
+        return 0
+
+    finally:
+        if input_stream is not stdin:
+            input_stream.close()
+        if output_stream is not sys.stdout:
+            output_stream.close()
+
+    if args.engine != "pygeoip":
+        stats.finish()
+    elif workers == 1:
+        stats.finish(record_cache.stats())
+    else:
+        stats.finish(merge_cache_stats(list(worker_cache_stats.values())))
+
+    stats.log()
+    if args.stats:
+        print(json.dumps(stats.as_dict()), file=sys.stderr)
+
+    return 0
@@ -0,0 +1,104 @@
+"""
+Benchmark: offline ASN index import and lookup latency.
+
+Usage:
+    python benchmarks/bench_asn_index.py [--dataset ip2asn-v4.tsv.gz] [--ranges 500000] [--count 200000]
+
+Without --dataset a synthetic iptoasn-style TSV with --ranges rows is
+generated. Reports import time, index size, scalar `lookup_one` latency and
+vectorized `lookup` throughput, and checks sampled answers against a plain
+linear scan of the source rows.
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from asn_index import AsnIndex, import_asn_dataset, iter_ip2asn_rows, open_dataset
+from geoip_bulk import uint32_to_ipv4
+
+
+def write_synthetic_dataset(path: str, ranges: int, seed: int) -> None:
+    rng = random.Random(seed)
+    bounds = sorted(rng.sample(range(1 << 24, 0xE0000000), ranges * 2))
+
+    with open(path, "w", encoding="utf-8") as f:
+        for index in range(ranges):
+            start, end = bounds[2 * index], bounds[2 * index + 1]
+            asn = rng.randint(1, 400000)
+            f.write(f"{uint32_to_ipv4(start)}\t{uint32_to_ipv4(end)}\t{asn}\tUS\tAS{asn}-EXAMPLE\n")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dataset", default=None)
+    parser.add_argument("--ranges", type=int, default=500000)
+    parser.add_argument("--count", type=int, default=200000)
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        dataset = args.dataset
+        if dataset is None:
+            dataset = os.path.join(work_dir, "ip2asn-v4.tsv")
+            write_synthetic_dataset(dataset, args.ranges, args.seed)
+
+        index_path = os.path.join(work_dir, "ip2asn.idx")
+
+        started = time.perf_counter()
+        header = import_asn_dataset(dataset, index_path)
+        import_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        index = AsnIndex(index_path)
+        open_ms = (time.perf_counter() - started) * 1000
+
+        rng = np.random.default_rng(args.seed)
+        ip_addrs = [uint32_to_ipv4(ip_num) for ip_num in rng.integers(0, 2 ** 32, size=args.count, dtype=np.uint64)]
+
+        started = time.perf_counter()
+        scalar = [index.lookup_one(ip_addr) for ip_addr in ip_addrs]
+        scalar_us = (time.perf_counter() - started) / len(ip_addrs) * 1e6
+
+        started = time.perf_counter()
+        bulk = index.lookup(ip_addrs)
+        bulk_seconds = time.perf_counter() - started
+
+        with open_dataset(dataset) as f:
+            rows = sorted(iter_ip2asn_rows(f))
+        row_starts = np.asarray([row[0] for row in rows], dtype=np.uint64)
+
+        mismatches = 0
+        for ip_addr, record in list(zip(ip_addrs, scalar))[:2000]:
+            ip_num = int.from_bytes(bytes(int(part) for part in ip_addr.split(".")), "big")
+            slot = int(np.searchsorted(row_starts, ip_num, side="right")) - 1
+            expected = str(rows[slot][2]) if slot >= 0 and ip_num <= rows[slot][1] else None
+            if (record["asn"] if record else None) != expected:
+                mismatches += 1
+
+        print(f"dataset            : {dataset}")
+        print(f"source rows        : {header['source_rows']}  ->  ranges : {header['range_count']}")
+        print(f"import             : {import_seconds:.2f} s   index size : {os.path.getsize(index_path) / 1e6:.1f} MB")
+        print(f"open (mmap)        : {open_ms:.2f} ms")
+        print(f"lookup_one         : {scalar_us:.1f} us / address")
+        print(f"lookup (vectorized): {len(ip_addrs) / bulk_seconds:,.0f} addresses / s")
+        print(f"scalar == bulk     : {scalar == bulk}")
+        print(f"mismatches (2000 sampled vs source rows): {mismatches}")
+
+        del index
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""
+Benchmark: GeoDB reader cache modes (standard / mmap / memory / compiled).
+
+Usage:
+    python benchmarks/bench_geodb_cache_modes.py [--db resource/GeoLiteCity.dat] [--count 100000]
+
+Each mode runs in a fresh child process, so open time and resident memory
+are not skewed by a previous mode. Reported per mode:
+    - open time
+    - mean per-lookup latency (record_by_name)
+    - RSS before open, after open and after the lookups
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app_core import GEODB_READER_MODES, open_geoip_reader
+
+
+def get_rss_bytes() -> int:
+    """
+    Current resident set size of this process (0 when unavailable).
+    """
+    if os.path.exists("/proc/self/status"):
+        with open("/proc/self/status", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+        return 0
+
+    if os.name == "nt":
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD),
+                ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        handle = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+            return int(counters.WorkingSetSize)
+        return 0
+
+    try:
+        import resource
+        # ru_maxrss is a peak value: KiB on Linux, bytes on macOS.
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if sys.platform == "darwin" else max_rss * 1024
+    except ImportError:
+        return 0
+
+
+def run_child(db_path: str, cache_mode: str, count: int, seed: int) -> dict:
+    rnd = random.Random(seed)
+    ip_addrs = [".".join(str(rnd.randint(1, 223)) for _ in range(4)) for _ in range(count)]
+
+    rss_before = get_rss_bytes()
+
+    started = time.perf_counter()
+    reader = open_geoip_reader(db_path, cache_mode)
+    open_seconds = time.perf_counter() - started
+
+    rss_open = get_rss_bytes()
+
+    started = time.perf_counter()
+    for ip_addr in ip_addrs:
+        reader.record_by_name(ip_addr)
+    lookup_seconds = time.perf_counter() - started
+
+    return {
+        "mode": cache_mode,
+        "open_ms": open_seconds * 1000,
+        "lookup_us": lookup_seconds / count * 1e6,
+        "rss_before_mb": rss_before / 2 ** 20,
+        "rss_open_mb": rss_open / 2 ** 20,
+        "rss_after_mb": get_rss_bytes() / 2 ** 20,
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db", default=os.path.join("resource", "GeoLiteCity.dat"))
+    parser.add_argument("--count", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--child", choices=GEODB_READER_MODES, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+
+    if not os.path.isfile(args.db):
+        print(f"GeoDB file not found: {args.db}")
+        return 1
+
+    if args.child:
+        print(json.dumps(run_child(args.db, args.child, args.count, args.seed)))
+        return 0
+
+    print(f"GeoDB : {args.db} ({os.path.getsize(args.db) / 2 ** 20:.1f} MB)   lookups : {args.count}")
+    print(f"{'mode':>9} {'open ms':>9} {'lookup us':>10} {'RSS start':>10} {'RSS open':>9} {'RSS end':>9}")
+
+    for cache_mode in GEODB_READER_MODES:
+        output = subprocess.check_output([
+            sys.executable, os.path.abspath(__file__),
+            "--db", args.db,
+            "--count", str(args.count),
+            "--seed", str(args.seed),
+            "--child", cache_mode,
+        ])
+        result = json.loads(output.decode("utf-8").strip().splitlines()[-1])
+
+        print(
+            f"{result['mode']:>9} {result['open_ms']:>9.2f} {result['lookup_us']:>10.2f} "
+            f"{result['rss_before_mb']:>9.1f}M {result['rss_open_mb']:>8.1f}M {result['rss_after_mb']:>8.1f}M"
+        )
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""
+Benchmark: per-IP `pygeoip.GeoIP.record_by_name` vs vectorized bulk lookup.
+
+Usage:
+    python benchmarks/bench_geoip_bulk.py [--db resource/GeoLiteCity.dat] [--count 200000]
+
+Every sampled address is also checked for identical answers on both paths.
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import pygeoip
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from geoip_bulk import GeoIPBulkReader, uint32_to_ipv4
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db", default=os.path.join("resource", "GeoLiteCity.dat"))
+    parser.add_argument("--count", type=int, default=200000)
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+
+    if not os.path.isfile(args.db):
+        print(f"GeoDB file not found: {args.db}")
+        return 1
+
+    rng = np.random.default_rng(args.seed)
+    ip_nums = rng.integers(0, 2 ** 32, size=args.count, dtype=np.uint64).astype(np.uint32)
+    ip_addrs = [uint32_to_ipv4(ip_num) for ip_num in ip_nums]
+
+    started = time.perf_counter()
+    reader = pygeoip.GeoIP(args.db)
+    per_ip_open = time.perf_counter() - started
+
+    started = time.perf_counter()
+    per_ip_records = [reader.record_by_name(ip_addr) for ip_addr in ip_addrs]
+    per_ip_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    bulk_reader = GeoIPBulkReader.from_geodb(args.db)
+    bulk_open = time.perf_counter() - started
+
+    started = time.perf_counter()
+    result = bulk_reader.lookup_ints(ip_nums)
+    bulk_elapsed = time.perf_counter() - started
+
+    mismatches = sum(
+        1
+        for index, expected in enumerate(per_ip_records)
+        if result.record(index) != expected
+    )
+
+    print(f"addresses           : {args.count}")
+    print(f"found               : {int(result.found.sum())}")
+    print(f"ranges / locations  : {len(bulk_reader)} / {bulk_reader.location_count}")
+    print(f"per-IP  open        : {per_ip_open * 1000:10.1f} ms")
+    print(f"per-IP  lookups     : {per_ip_elapsed * 1000:10.1f} ms  ({args.count / per_ip_elapsed:12.0f} IP/s)")
+    print(f"bulk    build       : {bulk_open * 1000:10.1f} ms")
+    print(f"bulk    lookups     : {bulk_elapsed * 1000:10.1f} ms  ({args.count / bulk_elapsed:12.0f} IP/s)")
+    print(f"speedup (lookups)   : {per_ip_elapsed / bulk_elapsed:10.1f}x")
+    print(f"mismatches          : {mismatches}")
+
+    return 0 if mismatches == 0 else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
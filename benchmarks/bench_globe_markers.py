@@ -0,0 +1,149 @@
+"""
+Benchmark: globe marker layer, one buffered draw call against per-marker
+immediate mode, and incremental appends against full re-uploads.
+
+Usage:
+    python benchmarks/bench_globe_markers.py [--markers 100000,500000] [--frames 100] [--chunk 65536] [--size 1280x720] [--egl]
+
+For each marker count, renders --frames rotating frames of the globe with
+random markers through GlobeMarkerLayer and, for comparison, with one
+glVertex call per marker (fixed function), and reports frame times. Then
+loads the markers in --chunk sized appends, as the GUI does when reading
+a batch result file, and reports the bytes uploaded and the time against
+re-uploading the whole set after every chunk.
+"""
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_globe_render import create_egl_context, create_qt_context
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--markers", default="100000,500000")
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--chunk", type=int, default=65536)
+    parser.add_argument("--size", default="1280x720")
+    parser.add_argument("--egl", action="store_true")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    width, height = (int(value) for value in args.size.lower().split("x"))
+
+    # PyOpenGL picks its platform on first import.
+    if args.egl:
+        os.environ["PYOPENGL_PLATFORM"] = "egl"
+        os.environ.setdefault("EGL_PLATFORM", "surfaceless")
+        keep_alive = create_egl_context(width, height)
+    else:
+        keep_alive = create_qt_context(width, height)
+
+    import numpy as np
+    from OpenGL.GL import (
+        GL_ARRAY_BUFFER, GL_COLOR_BUFFER_BIT, GL_DEPTH_BUFFER_BIT, GL_DEPTH_TEST, GL_DYNAMIC_DRAW, GL_POINTS,
+        GL_RENDERER, GL_VERSION, glBegin, glBindBuffer, glBufferData, glClear, glClearColor, glColor3f,
+        glDeleteBuffers, glEnable, glEnd, glFinish, glGenBuffers, glGetString, glLoadMatrixf, glMatrixMode,
+        glPointSize, glVertex3f, GL_MODELVIEW, GL_PROJECTION,
+    )
+    from globe_markers import MARKER_ALTITUDE, GlobeMarkerLayer, lat_lon_to_globe_points
+    from globe_render import GlobeRenderer, globe_model_view
+
+    glEnable(GL_DEPTH_TEST)
+    glClearColor(0.06, 0.06, 0.06, 1.0)
+    renderer = GlobeRenderer()
+    renderer.initialize()
+    renderer.resize(width, height)
+
+    print(f"OpenGL {glGetString(GL_VERSION).decode()} / {glGetString(GL_RENDERER).decode()}, "
+          f"{width}x{height}, {args.frames} frames")
+
+    rng = np.random.default_rng(0)
+    for count in (int(value) for value in args.markers.split(",")):
+        coordinates = np.stack(
+            [rng.uniform(-90, 90, count), rng.uniform(-180, 180, count)], axis=1
+        ).astype(np.float32)
+        points = lat_lon_to_globe_points(coordinates, MARKER_ALTITUDE).astype(np.float32)
+
+        layer = GlobeMarkerLayer()
+        layer.initialize()
+        layer.add(coordinates)
+
+        def draw_layer(model_view):
+            layer.draw(model_view, renderer.projection)
+
+        def draw_immediate(model_view):
+            glMatrixMode(GL_PROJECTION)
+            glLoadMatrixf(renderer.projection.T.astype(np.float32))
+            glMatrixMode(GL_MODELVIEW)
+            glLoadMatrixf(model_view.T.astype(np.float32))
+            glPointSize(5.0)
+            glColor3f(1.0, 0.45, 0.1)
+            glBegin(GL_POINTS)
+            for x, y, z in points:
+                glVertex3f(x, y, z)
+            glEnd()
+
+        # Per-marker calls are slow in Python; fewer frames keep the run short.
+        for label, draw, frames in (
+            ("buffer + point sprites", draw_layer, args.frames),
+            ("glVertex per marker", draw_immediate, max(3, args.frames // 20)),
+        ):
+            submit_seconds = frame_seconds = 0.0
+            for frame in range(frames + 2):
+                model_view = globe_model_view(-2.8, 110 + frame * 0.2, -75, 40, -90)
+                started = time.perf_counter()
+                glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+                renderer.draw(model_view, None)
+                draw(model_view)
+                submitted = time.perf_counter()
+                glFinish()
+                if frame >= 2:  # warm-up, includes the first upload
+                    submit_seconds += submitted - started
+                    frame_seconds += time.perf_counter() - started
+            print(f"{count:>8} markers, {label:<22}: submit {submit_seconds / frames * 1000:8.2f} ms   "
+                  f"frame {frame_seconds / frames * 1000:8.2f} ms")
+        layer.cleanup()
+
+        # Loading in chunks: appends only write the new rows.
+        layer = GlobeMarkerLayer()
+        layer.initialize()
+        started = time.perf_counter()
+        for start in range(0, count, args.chunk):
+            layer.add(coordinates[start:start + args.chunk])
+            layer.upload_pending()
+        glFinish()
+        append_seconds = time.perf_counter() - started
+        append_bytes = layer.bytes_uploaded
+        layer.cleanup()
+
+        buffer = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, buffer)
+        reupload_bytes = 0
+        started = time.perf_counter()
+        for start in range(0, count, args.chunk):
+            loaded = coordinates[:start + args.chunk]
+            glBufferData(GL_ARRAY_BUFFER, loaded.nbytes, loaded, GL_DYNAMIC_DRAW)
+            reupload_bytes += loaded.nbytes
+        glFinish()
+        reupload_seconds = time.perf_counter() - started
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glDeleteBuffers(1, [buffer])
+
+        print(f"{count:>8} markers, chunked load       : append {append_seconds * 1000:8.2f} ms "
+              f"({append_bytes / 1e6:.1f} MB)   re-upload {reupload_seconds * 1000:8.2f} ms "
+              f"({reupload_bytes / 1e6:.1f} MB)")
+
+    renderer.cleanup()
+    del keep_alive
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+Benchmark: globe frame time, VBO + shader renderer against immediate-mode
+gluSphere.
+
+Usage:
+    python benchmarks/bench_globe_render.py [--frames 300] [--size 1280x720] [--egl]
+
+Renders --frames rotating frames with each path into an offscreen
+framebuffer and reports, per frame, the time spent submitting the draw
+(the GUI thread's cost in paintGL), that thread's CPU time, and the full
+frame time including glFinish. --egl uses a Mesa EGL pbuffer context
+instead of Qt, for machines without a display.
+"""
+
+import os
+import sys
+import time
+import ctypes
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--size", default="1280x720")
+    parser.add_argument("--egl", action="store_true")
+    return parser.parse_args()
+
+
+def create_qt_context(width: int, height: int):
+    from PyQt5.QtGui import QGuiApplication, QOffscreenSurface, QOpenGLContext, QOpenGLFramebufferObject
+
+    app = QGuiApplication.instance() or QGuiApplication(sys.argv[:1])
+    context = QOpenGLContext()
+    if not context.create():
+        raise RuntimeError("Could not create an OpenGL context (try --egl).")
+    surface = QOffscreenSurface()
+    surface.setFormat(context.format())
+    surface.create()
+    if not context.makeCurrent(surface):
+        raise RuntimeError("Could not make the OpenGL context current (try --egl).")
+
+    framebuffer = QOpenGLFramebufferObject(width, height, QOpenGLFramebufferObject.CombinedDepthStencil)
+    framebuffer.bind()
+    return app, context, surface, framebuffer
+
+
+def create_egl_context(width: int, height: int):
+    from OpenGL import EGL
+
+    display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+    major, minor = EGL.EGLint(), EGL.EGLint()
+    if not EGL.eglInitialize(display, ctypes.pointer(major), ctypes.pointer(minor)):
+        raise RuntimeError("eglInitialize failed.")
+
+    config_attribs = (EGL.EGLint * 13)(
+        EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+        EGL.EGL_RED_SIZE, 8, EGL.EGL_GREEN_SIZE, 8, EGL.EGL_BLUE_SIZE, 8,
+        EGL.EGL_DEPTH_SIZE, 24,
+        EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT,
+        EGL.EGL_NONE,
+    )
+    config, config_count = EGL.EGLConfig(), EGL.EGLint()
+    EGL.eglChooseConfig(display, config_attribs, ctypes.pointer(config), 1, ctypes.pointer(config_count))
+    if not config_count.value:
+        raise RuntimeError("No EGL config with desktop OpenGL and a depth buffer.")
+
+    surface_attribs = (EGL.EGLint * 5)(EGL.EGL_WIDTH, width, EGL.EGL_HEIGHT, height, EGL.EGL_NONE)
+    surface = EGL.eglCreatePbufferSurface(display, config, surface_attribs)
+    EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+    context = EGL.eglCreateContext(display, config, EGL.EGL_NO_CONTEXT, None)
+    if not EGL.eglMakeCurrent(display, surface, surface, context):
+        raise RuntimeError("eglMakeCurrent failed.")
+    return display, surface, context
+
+
+def main() -> int:
+    args = parse_args()
+    width, height = (int(value) for value in args.size.lower().split("x"))
+
+    # PyOpenGL picks its platform on first import.
+    if args.egl:
+        os.environ["PYOPENGL_PLATFORM"] = "egl"
+        os.environ.setdefault("EGL_PLATFORM", "surfaceless")
+        keep_alive = create_egl_context(width, height)
+    else:
+        keep_alive = create_qt_context(width, height)
+
+    import numpy as np
+    from OpenGL.GL import (
+        GL_COLOR_BUFFER_BIT, GL_DEPTH_BUFFER_BIT, GL_DEPTH_TEST, GL_LINEAR, GL_LINEAR_MIPMAP_LINEAR, GL_RENDERER,
+        GL_RGB, GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_TEXTURE_MIN_FILTER, GL_UNPACK_ALIGNMENT,
+        GL_UNSIGNED_BYTE, GL_VERSION, glBindTexture, glClear, glClearColor, glEnable, glFinish,
+        glGenerateMipmap, glGenTextures, glGetString, glPixelStorei, glTexImage2D, glTexParameteri,
+    )
+    from globe_render import RENDER_MODE_FIXED, GlobeRenderer, globe_model_view
+
+    glEnable(GL_DEPTH_TEST)
+    glEnable(GL_TEXTURE_2D)
+    glClearColor(0.06, 0.06, 0.06, 1.0)
+
+    # Same size class as the bundled Earth texture.
+    texture = glGenTextures(1)
+    glBindTexture(GL_TEXTURE_2D, texture)
+    rows, cols = np.mgrid[0:1024, 0:2048]
+    pixels = np.stack([cols // 8, rows // 4, (cols ^ rows) & 255], axis=-1).astype(np.uint8)
+    glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+    glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB, 2048, 1024, 0, GL_RGB, GL_UNSIGNED_BYTE, pixels)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR_MIPMAP_LINEAR)
+    glGenerateMipmap(GL_TEXTURE_2D)
+
+    print(f"OpenGL {glGetString(GL_VERSION).decode()} / {glGetString(GL_RENDERER).decode()}, "
+          f"{width}x{height}, {args.frames} frames")
+
+    results = {}
+    for prefer_shaders in (False, True):
+        renderer = GlobeRenderer(prefer_shaders=prefer_shaders)
+        mode = renderer.initialize()
+        renderer.resize(width, height)
+
+        submit_seconds = cpu_seconds = frame_seconds = 0.0
+        for frame in range(args.frames + 10):
+            model_view = globe_model_view(-2.8, 110 + frame * 0.2, -75, 40, -90)
+            frame_started = time.perf_counter()
+            cpu_started = time.thread_time()
+
+            glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+            renderer.draw(model_view, texture)
+            submitted = time.perf_counter()
+            cpu_used = time.thread_time() - cpu_started
+            glFinish()
+
+            if frame >= 10:  # warm-up
+                submit_seconds += submitted - frame_started
+                cpu_seconds += cpu_used
+                frame_seconds += time.perf_counter() - frame_started
+        renderer.cleanup()
+
+        label = "gluSphere (immediate)" if mode == RENDER_MODE_FIXED else "VBO + shader"
+        results[mode] = submit_seconds
+        print(f"{label:<22}: submit {submit_seconds / args.frames * 1000:6.2f} ms   "
+              f"GUI-thread CPU {cpu_seconds / args.frames * 1000:6.2f} ms   "
+              f"frame {frame_seconds / args.frames * 1000:6.2f} ms")
+
+    if len(results) == 2:
+        print(f"submit time ratio     : {results[RENDER_MODE_FIXED] / max(min(results.values()), 1e-9):.1f}x")
+    del keep_alive
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
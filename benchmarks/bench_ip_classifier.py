@@ -0,0 +1,112 @@
+"""
+Benchmark: compiled IPv4 classifier against per-address `ipaddress`
+classification.
+
+Usage:
+    python benchmarks/bench_ip_classifier.py [--count 500000] [--internal 10.0.0.0/8 198.51.100.0/24]
+
+Classifies --count random addresses (plus special-purpose and malformed
+samples) with the previous `ipaddress` based `classify_ip_address`, with
+`IpClassifier.classify` one at a time, and with `classify_many` in
+batch-sized chunks, and checks that all three agree.
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import ipaddress
+from typing import Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ip_classifier import INTERNAL_RESULT, IpClassifier, parse_internal_ranges
+
+CHUNK_SIZE = 4096
+EXTRA_SAMPLES = (
+    "10.1.2.3", "127.0.0.1", "169.254.1.1", "100.64.0.1", "192.0.0.9", "192.168.1.1", "224.0.0.1",
+    "240.0.0.1", "255.255.255.255", "0.0.0.0", "::1", "2001:db8::1", "01.2.3.4", "1.2.3", "300.1.1.1", "",
+)
+
+
+def classify_ip_address_baseline(ip_text: str) -> Tuple[Optional[str], str, Optional[str]]:
+    # The per-address implementation the classifier replaced.
+    try:
+        ip_obj = ipaddress.ip_address(ip_text.strip())
+
+        if ip_obj.version != 4:
+            return None, "UNSUPPORTED", "IPv4 only is currently supported."
+
+        normalized_ip = str(ip_obj)
+
+        if ip_obj.is_private:
+            return normalized_ip, "PRIVATE_IPV4", "Private IPv4 addresses are not supported."
+        if ip_obj.is_loopback:
+            return normalized_ip, "UNSUPPORTED", "Loopback IPv4 addresses are not supported."
+        if ip_obj.is_multicast:
+            return normalized_ip, "UNSUPPORTED", "Multicast IPv4 addresses are not supported."
+        if ip_obj.is_unspecified:
+            return normalized_ip, "UNSUPPORTED", "Unspecified IPv4 addresses are not supported."
+        if ip_obj.is_reserved:
+            return normalized_ip, "UNSUPPORTED", "Reserved IPv4 addresses are not supported."
+
+        return normalized_ip, "PUBLIC_IPV4", None
+
+    except ValueError:
+        return None, "INVALID", "Invalid IP address format."
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=500000)
+    parser.add_argument("--internal", nargs="*", default=[])
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+
+    started = time.perf_counter()
+    classifier = IpClassifier(parse_internal_ranges(args.internal))
+    build_ms = (time.perf_counter() - started) * 1000
+
+    rng = random.Random(args.seed)
+    ip_texts = [str(ipaddress.IPv4Address(rng.getrandbits(32))) for _ in range(args.count)]
+    ip_texts += list(EXTRA_SAMPLES)
+
+    started = time.perf_counter()
+    baseline = [classify_ip_address_baseline(ip_text) for ip_text in ip_texts]
+    baseline_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    scalar = [classifier.classify(ip_text) for ip_text in ip_texts]
+    scalar_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batch = []
+    for offset in range(0, len(ip_texts), CHUNK_SIZE):
+        batch.extend(classifier.classify_many(ip_texts[offset:offset + CHUNK_SIZE]))
+    batch_seconds = time.perf_counter() - started
+
+    # Internal ranges deliberately differ from the baseline.
+    mismatches = sum(
+        expected != found and found[1:] != INTERNAL_RESULT
+        for expected, found in zip(baseline, scalar)
+    )
+
+    print(f"segments             : {len(classifier)} ({classifier.internal_range_count} internal ranges), "
+          f"built in {build_ms:.1f} ms")
+    print(f"ipaddress (baseline) : {len(ip_texts) / baseline_seconds:>12,.0f} addresses / s")
+    print(f"classify             : {len(ip_texts) / scalar_seconds:>12,.0f} addresses / s "
+          f"({baseline_seconds / scalar_seconds:.1f}x)")
+    print(f"classify_many ({CHUNK_SIZE}) : {len(ip_texts) / batch_seconds:>12,.0f} addresses / s "
+          f"({baseline_seconds / batch_seconds:.1f}x)")
+    print(f"classify == classify_many : {scalar == batch}")
+    print(f"mismatches vs baseline    : {mismatches}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
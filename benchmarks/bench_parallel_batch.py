@@ -0,0 +1,88 @@
+"""
+Benchmark: batch throughput for 1..N worker processes.
+
+Usage:
+    python benchmarks/bench_parallel_batch.py [--db resource/GeoLiteCity.dat]
+        [--count 500000] [--max-workers N] [--engine pygeoip|bulk] [--unordered]
+
+The 1-worker row is the in-process path (no pool); every other row shards
+chunks across a process pool whose workers open the GeoDB with MMAP_CACHE.
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_cli import (
+    BATCH_ENGINES,
+    DEFAULT_CHUNK_SIZE,
+    make_record_lookup,
+    iter_batch_rows,
+    iter_parallel_batch_rows,
+)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db", default=os.path.join("resource", "GeoLiteCity.dat"))
+    parser.add_argument("--count", type=int, default=500000)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--engine", choices=BATCH_ENGINES, default="pygeoip")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--unordered", action="store_true")
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+
+    if not os.path.isfile(args.db):
+        print(f"GeoDB file not found: {args.db}")
+        return 1
+
+    rnd = random.Random(args.seed)
+    ip_addrs = [
+        ".".join(str(rnd.randint(1, 223)) for _ in range(4))
+        for _ in range(args.count)
+    ]
+
+    print(f"addresses : {args.count}   engine : {args.engine}   ordered : {not args.unordered}")
+    print(f"{'workers':>8} {'seconds':>10} {'IP/s':>12} {'speedup':>8}")
+
+    baseline = None
+    for workers in range(1, max(1, args.max_workers) + 1):
+        started = time.perf_counter()
+
+        if workers == 1:
+            lookup_records = make_record_lookup(args.db, args.engine)
+            row_chunks = iter_batch_rows(ip_addrs, lookup_records, args.chunk_size)
+        else:
+            row_chunks = iter_parallel_batch_rows(
+                ip_addrs,
+                args.db,
+                args.engine,
+                workers,
+                args.chunk_size,
+                ordered=not args.unordered,
+            )
+
+        rows = sum(len(chunk) for chunk in row_chunks)
+        elapsed = time.perf_counter() - started
+
+        if rows != args.count:
+            print(f"row count mismatch: {rows} != {args.count}")
+            return 2
+
+        baseline = baseline or elapsed
+        print(f"{workers:>8} {elapsed:>10.2f} {args.count / elapsed:>12.0f} {baseline / elapsed:>7.2f}x")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""
+Benchmark: offline RIR delegation index import (full and incremental) and
+lookup throughput.
+
+Usage:
+    python benchmarks/bench_rir_index.py [--dir delegation-files/] [--ranges 60000] [--count 1000000]
+
+Without --dir one synthetic delegated-extended file per registry with
+--ranges IPv4 rows each is generated. Reports a full import, a no-op
+re-import, a re-import after one registry file changed, and lookups in
+batch-sized chunks.
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rir_index import RirIndex, build_rir_index
+from geoip_bulk import uint32_to_ipv4
+
+REGISTRIES = ("afrinic", "apnic", "arin", "lacnic", "ripencc")
+CHUNK_SIZE = 4096
+
+
+def write_synthetic_files(work_dir: str, ranges: int, seed: int) -> None:
+    rng = random.Random(seed)
+    bounds = sorted(rng.sample(range(1 << 24, 0xE0000000), ranges * len(REGISTRIES) * 2))
+    blocks = [(bounds[2 * index], bounds[2 * index + 1]) for index in range(len(bounds) // 2)]
+    rng.shuffle(blocks)
+
+    for number, registry in enumerate(REGISTRIES):
+        path = os.path.join(work_dir, f"delegated-{registry}-extended-latest")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"2.3|{registry}|20240101|{ranges}|19830705|20240101|+0000\n")
+            f.write(f"{registry}|*|ipv4|*|{ranges}|summary\n")
+            for start, end in sorted(blocks[number::len(REGISTRIES)]):
+                date = f"{rng.randint(1990, 2024)}{rng.randint(1, 12):02d}{rng.randint(1, 28):02d}"
+                f.write(f"{registry}|US|ipv4|{uint32_to_ipv4(start)}|{end - start + 1}|{date}|allocated|id\n")
+
+
+def timed(label: str, func):
+    started = time.perf_counter()
+    result = func()
+    print(f"{label:<28}: {time.perf_counter() - started:.2f} s", end="")
+    return result
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dir", default=None)
+    parser.add_argument("--ranges", type=int, default=60000)
+    parser.add_argument("--count", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        source_dir = args.dir
+        if source_dir is None:
+            source_dir = os.path.join(work_dir, "rir")
+            os.makedirs(source_dir)
+            write_synthetic_files(source_dir, args.ranges, args.seed)
+
+        index_path = os.path.join(work_dir, "rir_delegations.idx")
+
+        result = timed("full import", lambda: build_rir_index([source_dir], index_path))
+        print(f"   ({result['ranges']} ranges, {os.path.getsize(index_path) / 1e6:.1f} MB)")
+
+        result = timed("re-import, nothing changed", lambda: build_rir_index([source_dir], index_path))
+        print(f"   (reused: {len(result['reused'])}, written: {result['written']})")
+
+        changed = sorted(os.listdir(source_dir))[0]
+        with open(os.path.join(source_dir, changed), "a", encoding="utf-8") as f:
+            f.write(f"{changed.split('-')[1]}|FR|ipv4|0.0.1.0|256|20240102|allocated|id\n")
+        result = timed("re-import, one file changed", lambda: build_rir_index([source_dir], index_path))
+        print(f"   (parsed: {', '.join(result['parsed'])})")
+
+        started = time.perf_counter()
+        index = RirIndex(index_path)
+        print(f"open (mmap)                 : {(time.perf_counter() - started) * 1000:.2f} ms")
+
+        rng = np.random.default_rng(args.seed)
+        ip_addrs = [uint32_to_ipv4(ip_num) for ip_num in rng.integers(0, 2 ** 32, size=args.count, dtype=np.uint64)]
+
+        started = time.perf_counter()
+        hits = 0
+        for offset in range(0, len(ip_addrs), CHUNK_SIZE):
+            hits += sum(record is not None for record in index.lookup(ip_addrs[offset:offset + CHUNK_SIZE]))
+        bulk_seconds = time.perf_counter() - started
+
+        sample = ip_addrs[:20000]
+        started = time.perf_counter()
+        scalar = [index.lookup_one(ip_addr) for ip_addr in sample]
+        scalar_us = (time.perf_counter() - started) / len(sample) * 1e6
+
+        print(f"lookup ({CHUNK_SIZE} per chunk)     : {len(ip_addrs) / bulk_seconds:,.0f} addresses / s "
+              f"({hits} hits)")
+        print(f"lookup_one                  : {scalar_us:.1f} us / address")
+        print(f"lookup_one == lookup        : {scalar == index.lookup(sample)}")
+
+        index.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""
+Benchmark: Earth texture preparation, JPEG decode against the mipmap cache.
+
+Usage:
+    python benchmarks/bench_texture_cache.py [--texture PATH] [--size 5400x2700] [--repeat 5]
+
+Reports the time to get upload-ready pixels with the previous path (decode,
+two flips, RGB conversion, tobytes; mipmaps were then generated on the GPU),
+the first start (decode + mipmap chain + cache write) and later starts
+(mapping the cache and reading every page of all levels). Without
+--texture a synthetic JPEG of --size is used.
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PIL import Image
+
+from texture_cache import load_or_build_texture_cache
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--texture")
+    parser.add_argument("--size", default="5400x2700")
+    parser.add_argument("--repeat", type=int, default=5)
+    return parser.parse_args()
+
+
+def write_synthetic_texture(path: str, width: int, height: int) -> None:
+    rows, cols = np.mgrid[0:height, 0:width]
+    pixels = np.stack([cols * 255 // width, rows * 255 // height, (cols ^ rows) & 255], axis=-1).astype(np.uint8)
+    Image.fromarray(pixels).save(path, quality=90)
+
+
+def legacy_decode(texture_path: str) -> bytes:
+    image = Image.open(texture_path)
+    image = image.transpose(Image.FLIP_TOP_BOTTOM)
+    image = image.transpose(Image.FLIP_LEFT_RIGHT)
+    image = image.convert("RGB")
+    return image.tobytes()
+
+
+def touch_levels(texture) -> int:
+    # Stand-in for glTexImage2D reading the mapped pages.
+    return sum(int(level.reshape(-1)[::4096].sum()) for level in texture.levels)
+
+
+def best_of(repeat: int, function) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main() -> int:
+    args = parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        texture_path = args.texture
+        if texture_path is None:
+            width, height = (int(value) for value in args.size.lower().split("x"))
+            texture_path = os.path.join(work_dir, "earth_texture.jpg")
+            write_synthetic_texture(texture_path, width, height)
+        cache_path = os.path.join(work_dir, "earth_texture.jpg.mip")
+
+        legacy_ms = best_of(args.repeat, lambda: legacy_decode(texture_path))
+
+        build_ms = float("inf")
+        for _ in range(args.repeat):
+            if os.path.exists(cache_path):
+                os.remove(cache_path)
+            started = time.perf_counter()
+            load_or_build_texture_cache(texture_path, cache_path).close()
+            build_ms = min(build_ms, (time.perf_counter() - started) * 1000)
+
+        def cached_start() -> None:
+            texture = load_or_build_texture_cache(texture_path, cache_path)
+            assert texture.source == "cache"
+            touch_levels(texture)
+            texture.close()
+
+        cached_ms = best_of(args.repeat, cached_start)
+
+        texture = load_or_build_texture_cache(texture_path, cache_path)
+        print(f"texture               : {texture.width}x{texture.height}, {len(texture.levels)} levels, "
+              f"cache {os.path.getsize(cache_path) / 1e6:.1f} MB")
+        texture.close()
+
+    print(f"previous (decode only): {legacy_ms:8.1f} ms  (+ glGenerateMipmap on the GUI thread)")
+    print(f"first start (build)   : {build_ms:8.1f} ms  (worker thread)")
+    print(f"later starts (mapped) : {cached_ms:8.1f} ms  (worker thread)")
+    print(f"speed-up vs previous  : {legacy_ms / max(cached_ms, 1e-9):8.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""
+Benchmark: globe detail tile pyramid, build time, per-frame tile selection
+and GPU memory against one full-resolution texture.
+
+Usage:
+    python benchmarks/bench_tile_pyramid.py [--texture PATH] [--size 10800x5400] [--viewport 1920x1080] [--frames 500]
+
+Builds the tile file (without --texture, from a synthetic JPEG of --size),
+then sweeps --frames random views from the farthest to the nearest zoom
+and reports the time to choose the level and the visible tiles, the
+number of tiles a view needs, and the GPU memory that takes compared with
+uploading the whole image as one mipmapped texture.
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PIL import Image
+
+from tile_pyramid import OVERVIEW_MAX_WIDTH, load_or_build_tile_pyramid, pixels_per_radian
+
+# Same camera as EarthWidget / globe_render, without importing OpenGL.
+FIELD_OF_VIEW = 45.0
+NEAREST_ZOOM, FARTHEST_ZOOM = -1.4, -8.0
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--texture")
+    parser.add_argument("--size", default="10800x5400")
+    parser.add_argument("--viewport", default="1920x1080")
+    parser.add_argument("--frames", type=int, default=500)
+    return parser.parse_args()
+
+
+def write_synthetic_texture(path: str, width: int, height: int) -> None:
+    rows, cols = np.mgrid[0:height, 0:width]
+    pixels = np.stack([cols * 255 // width, rows * 255 // height, (cols ^ rows) & 255], axis=-1).astype(np.uint8)
+    Image.fromarray(pixels).save(path, quality=90)
+
+
+def rotation(angle: float, axis: int) -> np.ndarray:
+    c, s = np.cos(np.radians(angle)), np.sin(np.radians(angle))
+    i, j = [(1, 2), (2, 0), (0, 1)][axis]
+    matrix = np.identity(4)
+    matrix[i, i], matrix[i, j], matrix[j, i], matrix[j, j] = c, -s, s, c
+    return matrix
+
+
+def view(zoom: float, rng: np.random.Generator) -> np.ndarray:
+    translate = np.identity(4)
+    translate[2, 3] = zoom
+    return translate @ rotation(rng.uniform(0, 360), 1) @ rotation(rng.uniform(-90, 90), 0) @ rotation(-90, 2)
+
+
+def perspective(aspect: float, near: float = 0.1, far: float = 100.0) -> np.ndarray:
+    f = 1.0 / np.tan(np.radians(FIELD_OF_VIEW) / 2.0)
+    return np.array([
+        [f / aspect, 0, 0, 0],
+        [0, f, 0, 0],
+        [0, 0, (far + near) / (near - far), 2 * far * near / (near - far)],
+        [0, 0, -1, 0],
+    ])
+
+
+def main() -> int:
+    args = parse_args()
+    viewport = tuple(int(value) for value in args.viewport.lower().split("x"))
+    projection = perspective(viewport[0] / viewport[1])
+    rng = np.random.default_rng(0)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        texture_path = args.texture
+        if texture_path is None:
+            width, height = (int(value) for value in args.size.lower().split("x"))
+            texture_path = os.path.join(work_dir, "earth_texture.jpg")
+            write_synthetic_texture(texture_path, width, height)
+        tiles_path = os.path.join(work_dir, "earth_texture.jpg.tiles")
+
+        started = time.perf_counter()
+        pyramid = load_or_build_tile_pyramid(texture_path, tiles_path)
+        build_seconds = time.perf_counter() - started
+        if pyramid is None:
+            print(f"Image is no wider than {OVERVIEW_MAX_WIDTH} px; nothing to tile.")
+            return 1
+
+        finest = pyramid.levels[-1]
+        print(f"image                 : {finest.width}x{finest.height}, {len(pyramid.levels)} tiled levels, "
+              f"{pyramid.tile_count} tiles of {pyramid.tile_size} px, file {os.path.getsize(tiles_path) / 1e6:.0f} MB")
+        print(f"build                 : {build_seconds * 1000:8.1f} ms (first start only)")
+
+        select_seconds = 0.0
+        counts = []
+        for frame in range(args.frames):
+            zoom = NEAREST_ZOOM + (FARTHEST_ZOOM - NEAREST_ZOOM) * frame / max(args.frames - 1, 1)
+            model_view = view(zoom, rng)
+
+            started = time.perf_counter()
+            camera = np.linalg.inv(model_view)[:3, 3]
+            density = pixels_per_radian(viewport[1], FIELD_OF_VIEW, float(np.linalg.norm(camera)))
+            level = pyramid.select_level(density, OVERVIEW_MAX_WIDTH)
+            tiles = [] if level is None else pyramid.visible_tiles(
+                level, projection @ model_view, camera, viewport, density, OVERVIEW_MAX_WIDTH
+            )
+            select_seconds += time.perf_counter() - started
+            counts.append(len(tiles))
+
+        # Every tile of the finest level once (page cache warm from the build).
+        started = time.perf_counter()
+        for y in range(finest.rows):
+            for x in range(finest.cols):
+                pyramid.read_tile((len(pyramid.levels) - 1, x, y))
+        read_ms = (time.perf_counter() - started) * 1000 / (finest.rows * finest.cols)
+        pyramid.close()
+
+    tile_mb = pyramid.tile_size * pyramid.tile_size * 4 * 4 / 3 / 1e6
+    single_mb = finest.width * finest.height * 4 * 4 / 3 / 1e6
+    print(f"tile selection        : {select_seconds / args.frames * 1000:8.3f} ms per frame")
+    print(f"tile read (worker)    : {read_ms:8.3f} ms per tile")
+    print(f"tiles per view        : median {int(np.median(counts))}, max {max(counts)} "
+          f"(~{max(counts) * tile_mb:.0f} MB on the GPU)")
+    print(f"single texture        : ~{single_mb:.0f} MB on the GPU")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
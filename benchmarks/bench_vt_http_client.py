@@ -0,0 +1,179 @@
+"""
+Benchmark: per-request `urlopen` vs the pooled keep-alive VirusTotal client.
+
+Usage:
+    python benchmarks/bench_vt_http_client.py [--count 200] [--no-tls] [--delay-ms 0]
+
+Both clients fetch a VT-sized IP report from a local stand-in server
+(HTTP/1.1 keep-alive, gzip). With TLS (default, needs the `openssl` CLI for
+a throwaway self-signed certificate) every `urlopen` pays a full TCP + TLS
+handshake, which is what the pooled client avoids.
+"""
+
+import os
+import ssl
+import sys
+import gzip
+import json
+import time
+import asyncio
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.request import Request, urlopen
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vt_client import PooledHttpClient
+
+
+def make_report_payload() -> bytes:
+    engines = {
+        f"engine-{index}": {"category": "harmless", "result": "clean", "method": "blacklist"}
+        for index in range(90)
+    }
+    return json.dumps({
+        "data": {
+            "id": "203.0.113.7",
+            "type": "ip_address",
+            "attributes": {
+                "as_owner": "EXAMPLE-AS",
+                "last_analysis_stats": {"harmless": 80, "malicious": 1, "suspicious": 0, "undetected": 9},
+                "last_analysis_results": engines,
+                "last_analysis_date": 1700000000,
+            },
+        },
+    }).encode("utf-8")
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    payload = make_report_payload()
+    payload_gzip = gzip.compress(payload)
+    delay_seconds = 0.0
+
+    def do_GET(self) -> None:
+        if self.delay_seconds:
+            time.sleep(self.delay_seconds)
+
+        body = self.payload
+        use_gzip = "gzip" in self.headers.get("Accept-Encoding", "")
+        if use_gzip:
+            body = self.payload_gzip
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if use_gzip:
+            self.send_header("Content-Encoding", "gzip")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+def make_self_signed_cert(cert_dir: str):
+    cert_path = os.path.join(cert_dir, "cert.pem")
+    key_path = os.path.join(cert_dir, "key.pem")
+    subprocess.run(
+        [
+            "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+            "-keyout", key_path, "-out", cert_path, "-days", "1",
+            "-subj", "/CN=localhost", "-addext", "subjectAltName=DNS:localhost",
+        ],
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    return cert_path, key_path
+
+
+def percentile(samples: list, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def report(label: str, samples: list, total_seconds: float) -> None:
+    print(
+        f"{label:>8} {len(samples):>6} {sum(samples) / len(samples) * 1000:>9.2f} "
+        f"{percentile(samples, 0.5) * 1000:>9.2f} {percentile(samples, 0.95) * 1000:>9.2f} "
+        f"{len(samples) / total_seconds:>9.0f}"
+    )
+
+
+async def fetch_pooled(client: PooledHttpClient, path: str, headers: dict, count: int, samples: list) -> None:
+    for _ in range(count):
+        request_started = time.perf_counter()
+        (await client.get(path, headers=headers)).json()
+        samples.append(time.perf_counter() - request_started)
+    client.close()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=200)
+    parser.add_argument("--no-tls", action="store_true", help="plain HTTP stand-in server")
+    parser.add_argument("--delay-ms", type=float, default=0.0, help="server think time per request")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    StandInHandler.delay_seconds = args.delay_ms / 1000
+
+    use_tls = not args.no_tls
+    if use_tls and shutil.which("openssl") is None:
+        print("openssl not found, falling back to plain HTTP (--no-tls).")
+        use_tls = False
+
+    server = ThreadingHTTPServer(("localhost", 0), StandInHandler)
+    server.daemon_threads = True
+    client_context = None
+
+    with tempfile.TemporaryDirectory() as cert_dir:
+        if use_tls:
+            cert_path, key_path = make_self_signed_cert(cert_dir)
+            server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            server_context.load_cert_chain(cert_path, key_path)
+            server.socket = server_context.wrap_socket(server.socket, server_side=True)
+            client_context = ssl.create_default_context(cafile=cert_path)
+
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        scheme = "https" if use_tls else "http"
+        base_url = f"{scheme}://localhost:{server.server_port}/api/v3"
+        path = "/ip_addresses/203.0.113.7"
+        headers = {"x-apikey": "bench", "accept": "application/json"}
+
+        print(f"stand-in : {base_url}   requests : {args.count}   server delay : {args.delay_ms} ms")
+        print(f"{'client':>8} {'reqs':>6} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'req/s':>9}")
+
+        samples = []
+        started = time.perf_counter()
+        for _ in range(args.count):
+            request_started = time.perf_counter()
+            with urlopen(Request(base_url + path, headers=headers), timeout=10, context=client_context) as resp:
+                json.loads(resp.read().decode("utf-8"))
+            samples.append(time.perf_counter() - request_started)
+        report("urlopen", samples, time.perf_counter() - started)
+
+        client = PooledHttpClient(base_url, 5, 10, name="bench", ssl_context=client_context)
+        samples = []
+        started = time.perf_counter()
+        asyncio.run(fetch_pooled(client, path, headers, args.count, samples))
+        report("pooled", samples, time.perf_counter() - started)
+
+        stats = client.latency_stats()
+        print(f"pooled connections opened / reused : {stats['connections_opened']} / {stats['connections_reused']}")
+
+    server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,477 @@
+"""
+Local threat-intel blocklists.
+
+IPv4 blocklists (FireHOL-style .netset / .ipset, plain text lists such as
+Spamhaus DROP, or CSV files) placed in the `blocklists` directory next to
+GeoLiteCity.dat are compiled into one memory-mapped interval index in the
+app cache directory. All lists are flattened into sorted, disjoint
+segments that each carry the set of lists covering them, so one binary
+search answers "which lists contain this address" regardless of how many
+lists or overlapping entries there are.
+
+The index records the size, mtime and SHA-256 of every list and is rebuilt
+automatically when a list is added, removed or changed.
+"""
+
+import os
+import csv
+import sys
+import json
+import socket
+import struct
+import logging
+import argparse
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app_core import get_app_dir, get_geo_db_file_path, load_app_settings, setup_logging
+from geoip_bulk import ipv4_to_uint32
+from range_index import (
+    INDEX_CACHE_DIR_NAME,
+    NO_RANGE,
+    file_sha256,
+    lookup_range_slot,
+    lookup_range_slots,
+    map_index_file,
+    open_dataset,
+    parse_ipv4_range,
+    read_header_bytes,
+    write_index_file,
+)
+
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+BLOCKLIST_INDEX_MAGIC = b"BLKIDX\0\0"
+BLOCKLIST_INDEX_VERSION = 1
+BLOCKLIST_INDEX_FILE_NAME = "blocklists.idx"
+BLOCKLIST_DIR_NAME = "blocklists"
+
+BLOCKLIST_DIR_SETTING_KEY = "blocklist_dir"
+
+# magic, version, segment_count, set_count, mask_words, manifest_size
+BLOCKLIST_INDEX_HEADER = struct.Struct("<8sIIIII")
+
+BLOCKLIST_FILE_SUFFIXES = (".netset", ".ipset", ".txt", ".list", ".csv", ".gz")
+
+NO_LISTS: Tuple[str, ...] = ()
+
+
+def get_blocklist_dir() -> str:
+    return load_app_settings().get(BLOCKLIST_DIR_SETTING_KEY) or os.path.join(
+        os.path.dirname(get_geo_db_file_path()), BLOCKLIST_DIR_NAME
+    )
+
+
+def get_default_blocklist_index_path() -> str:
+    return os.path.join(get_app_dir(), INDEX_CACHE_DIR_NAME, BLOCKLIST_INDEX_FILE_NAME)
+
+
+def blocklist_index_sections(
+    segment_count: int,
+    set_count: int,
+    mask_words: int,
+    manifest_size: int,
+) -> List[Tuple[str, str, int]]:
+    return [
+        ("starts", "<u4", segment_count),
+        ("ends", "<u4", segment_count),
+        ("set_id", "<u4", segment_count),
+        ("set_masks", "<u8", set_count * mask_words),
+        ("manifest", "u1", manifest_size),
+    ]
+
+
+def blocklist_name(path: str) -> str:
+    name = os.path.basename(path)
+    if name.endswith(".gz"):
+        name = name[:-3]
+    return os.path.splitext(name)[0]
+
+
+# =============================================================================
+# List files
+# =============================================================================
+
+def iter_blocklist_entries(lines: Iterable[str], is_csv: bool = False) -> Iterator[Tuple[int, int]]:
+    """
+    Text lists: the first token of each line, after stripping "#" / ";"
+    comments. CSV lists: the first cell of each row that is an address,
+    CIDR or range.
+    """
+    if is_csv:
+        for row in csv.reader(lines):
+            for cell in row:
+                entry = parse_ipv4_range(cell.strip())
+                if entry is not None:
+                    yield entry
+                    break
+        return
+
+    for line in lines:
+        if "#" in line or ";" in line:
+            line = line.split("#", 1)[0].split(";", 1)[0]
+        tokens = line.split(None, 1)
+        if not tokens:
+            continue
+        entry = parse_ipv4_range(tokens[0])
+        if entry is not None:
+            yield entry
+
+
+def read_blocklist_file(path: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The list's entries as sorted, merged (start, end) int64 arrays.
+    """
+    with open_dataset(path) as f:
+        entries = iter_blocklist_entries(f, is_csv=path.endswith((".csv", ".csv.gz")))
+        entries = np.asarray(list(entries), dtype=np.int64).reshape(-1, 2)
+
+    if not len(entries):
+        return entries[:, 0], entries[:, 1]
+
+    entries = entries[np.argsort(entries[:, 0], kind="stable")]
+    starts, ends = entries[:, 0], entries[:, 1]
+
+    # A new run starts where an entry neither overlaps nor touches the
+    # furthest end seen so far.
+    reach = np.maximum.accumulate(ends)
+    new_run = np.ones(len(starts), dtype=bool)
+    new_run[1:] = starts[1:] > reach[:-1] + 1
+    run_ids = np.cumsum(new_run) - 1
+
+    merged_ends = np.zeros(run_ids[-1] + 1, dtype=np.int64)
+    np.maximum.at(merged_ends, run_ids, ends)
+    return starts[new_run], merged_ends
+
+
+def find_blocklist_files(paths: Iterable[str]) -> List[str]:
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(
+                os.path.join(path, name)
+                for name in sorted(os.listdir(path))
+                if not name.startswith(".") and name.endswith(BLOCKLIST_FILE_SUFFIXES)
+            )
+        elif os.path.isfile(path):
+            files.append(path)
+    return [os.path.abspath(path) for path in files]
+
+
+# =============================================================================
+# Compile
+# =============================================================================
+
+def mask_word_count(list_count: int) -> int:
+    return max(1, (list_count + 63) // 64)
+
+
+def build_blocklist_segments(lists: List[Tuple[np.ndarray, np.ndarray]]) -> Dict[str, np.ndarray]:
+    """
+    Flattens per-list merged ranges into disjoint segments.
+
+    Every list toggles its own bit at `start` and `end + 1`; a running XOR
+    over the sorted boundaries is the membership mask of the segment that
+    begins there. Distinct masks are stored once ("set_masks", one row of
+    64-bit words per set) and referenced by "set_id".
+    """
+    words = mask_word_count(len(lists))
+
+    positions = []
+    toggles = []
+    for list_number, (starts, ends) in enumerate(lists):
+        bits = np.zeros((1, words), dtype=np.uint64)
+        bits[0, list_number // 64] = np.uint64(1) << np.uint64(list_number % 64)
+        positions.extend((starts, ends + 1))
+        toggles.append(np.repeat(bits, 2 * len(starts), axis=0))
+
+    if not toggles or not sum(len(toggle) for toggle in toggles):
+        return {
+            "starts": np.zeros(0, np.int64),
+            "ends": np.zeros(0, np.int64),
+            "set_id": np.zeros(0, np.uint32),
+            "set_masks": np.zeros((0, words), np.uint64),
+        }
+
+    positions = np.concatenate(positions)
+    toggles = np.concatenate(toggles)
+
+    order = np.argsort(positions, kind="stable")
+    positions = positions[order]
+    masks = np.bitwise_xor.accumulate(toggles[order], axis=0)
+
+    # The mask after the last toggle at each boundary holds until the next one.
+    last_at_position = np.ones(len(positions), dtype=bool)
+    last_at_position[:-1] = positions[1:] != positions[:-1]
+    positions = positions[last_at_position]
+    masks = masks[last_at_position]
+
+    covered = masks[:-1].any(axis=1)
+    masks = masks[:-1][covered]
+
+    if words == 1:
+        # 1-D unique is a plain sort; the row-wise variant is much slower.
+        set_masks, set_ids = np.unique(masks[:, 0], return_inverse=True)
+        set_masks = set_masks.reshape(-1, 1)
+    else:
+        set_masks, set_ids = np.unique(masks, axis=0, return_inverse=True)
+
+    return {
+        "starts": positions[:-1][covered],
+        "ends": positions[1:][covered] - 1,
+        "set_id": set_ids.reshape(-1).astype(np.uint32),
+        "set_masks": set_masks,
+    }
+
+
+def compile_blocklists(list_paths: List[str]) -> Tuple[Dict[str, np.ndarray], dict]:
+    """
+    Parses `list_paths` into segment columns plus the manifest that is
+    stored with them.
+    """
+    sources = []
+    lists = []
+    for path in list_paths:
+        starts, ends = read_blocklist_file(path)
+        stat = os.stat(path)
+        sources.append({
+            "name": blocklist_name(path),
+            "path": path,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": file_sha256(path).hex(),
+            "entries": int(len(starts)),
+            "addresses": int((ends - starts + 1).sum()),
+        })
+        lists.append((starts, ends))
+
+    return build_blocklist_segments(lists), {"lists": sources}
+
+
+def write_blocklist_index(index_path: str, columns: Dict[str, np.ndarray], manifest: dict) -> None:
+    manifest_blob = json.dumps(manifest, sort_keys=True).encode("utf-8")
+    segment_count = len(columns["starts"])
+    set_count, mask_words = columns["set_masks"].shape
+
+    write_index_file(
+        index_path,
+        BLOCKLIST_INDEX_HEADER.pack(
+            BLOCKLIST_INDEX_MAGIC,
+            BLOCKLIST_INDEX_VERSION,
+            segment_count,
+            set_count,
+            mask_words,
+            len(manifest_blob),
+        ),
+        blocklist_index_sections(segment_count, set_count, mask_words, len(manifest_blob)),
+        dict(columns, set_masks=columns["set_masks"].reshape(-1), manifest=np.frombuffer(manifest_blob, dtype="u1")),
+    )
+
+
+def read_blocklist_index_header(index_path: str) -> Optional[dict]:
+    fields = read_header_bytes(index_path, BLOCKLIST_INDEX_HEADER)
+    if fields is None:
+        return None
+
+    magic, version, segment_count, set_count, mask_words, manifest_size = fields
+    if magic != BLOCKLIST_INDEX_MAGIC or version != BLOCKLIST_INDEX_VERSION:
+        return None
+
+    return {
+        "segment_count": segment_count,
+        "set_count": set_count,
+        "mask_words": mask_words,
+        "manifest_size": manifest_size,
+    }
+
+
+def is_blocklist_index_current(matcher: "BlocklistMatcher", list_paths: List[str]) -> bool:
+    """
+    Same list files, each unchanged by size + mtime (or, on an mtime
+    change, by SHA-256).
+    """
+    sources = matcher.manifest["lists"]
+    if [source["path"] for source in sources] != list_paths:
+        return False
+
+    for source in sources:
+        stat = os.stat(source["path"])
+        if stat.st_size != source["size"]:
+            return False
+        if stat.st_mtime_ns != source["mtime_ns"] and file_sha256(source["path"]).hex() != source["sha256"]:
+            return False
+    return True
+
+
+# =============================================================================
+# Matcher
+# =============================================================================
+
+class BlocklistMatcher:
+    def __init__(self, columns: Dict[str, np.ndarray], manifest: dict, mapped=None):
+        self.starts = columns["starts"]
+        self.ends = columns["ends"]
+        self.set_ids = columns["set_id"]
+        self.set_masks = columns["set_masks"]
+        self.manifest = manifest
+        self.index_path: Optional[str] = None
+        self._mmap = mapped
+
+        self.list_names = [source["name"] for source in manifest["lists"]]
+        self._set_names: Dict[int, Tuple[str, ...]] = {}
+
+    @property
+    def set_count(self) -> int:
+        return len(self.set_masks)
+
+    @classmethod
+    def from_index_file(cls, index_path: str) -> "BlocklistMatcher":
+        header = read_blocklist_index_header(index_path)
+        if header is None:
+            raise ValueError(f"Not a compatible blocklist index: {index_path}")
+
+        mapped, views = map_index_file(
+            index_path,
+            BLOCKLIST_INDEX_HEADER,
+            blocklist_index_sections(
+                header["segment_count"], header["set_count"], header["mask_words"], header["manifest_size"]
+            ),
+        )
+        manifest = json.loads(views["manifest"].tobytes().decode("utf-8"))
+        views["set_masks"] = views["set_masks"].reshape(header["set_count"], header["mask_words"])
+
+        matcher = cls(views, manifest, mapped)
+        matcher.index_path = index_path
+        return matcher
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self.starts = self.ends = self.set_ids = self.set_masks = None
+            self._mmap.close()
+            self._mmap = None
+
+    def set_names(self, set_id: int) -> Tuple[str, ...]:
+        """
+        Names of the lists in one set (decoded once per set).
+        """
+        names = self._set_names.get(set_id)
+        if names is None:
+            mask = self.set_masks[set_id]
+            names = self._set_names[set_id] = tuple(
+                name for number, name in enumerate(self.list_names)
+                if int(mask[number // 64]) >> (number % 64) & 1
+            )
+        return names
+
+    def match_uint32(self, ip_nums: np.ndarray) -> np.ndarray:
+        """
+        Set id per address (see `set_names`), NO_RANGE when unlisted.
+        """
+        slots = lookup_range_slots(self.starts, self.ends, ip_nums)
+        return np.where(slots != NO_RANGE, self.set_ids[np.maximum(slots, 0)].astype(np.int64), NO_RANGE)
+
+    def match_one(self, ip_addr: str) -> Tuple[str, ...]:
+        """
+        Names of the lists containing `ip_addr`; empty when none do.
+        """
+        try:
+            ip_num = int.from_bytes(socket.inet_aton(ip_addr), "big")
+        except OSError:
+            return NO_LISTS
+
+        slot = lookup_range_slot(self.starts, self.ends, ip_num)
+        return self.set_names(int(self.set_ids[slot])) if slot != NO_RANGE else NO_LISTS
+
+    def match(self, ip_addrs: List[str]) -> List[Tuple[str, ...]]:
+        """
+        Vectorized `match_one` over a list of IPv4 strings.
+        """
+        ip_nums, valid = ipv4_to_uint32(ip_addrs)
+        set_ids = self.match_uint32(ip_nums)
+        set_ids[~valid] = NO_RANGE
+
+        set_names = self.set_names
+        return [set_names(set_id) if set_id != NO_RANGE else NO_LISTS for set_id in set_ids.tolist()]
+
+    def lookup(self, ip_addrs: List[str]) -> List[dict]:
+        """
+        `match` as batch rows ({"blocklists": "a;b"}, "" when unlisted).
+        """
+        return [{"blocklists": ";".join(names)} for names in self.match(ip_addrs)]
+
+
+def load_or_compile_blocklists(
+    list_paths: Optional[List[str]] = None,
+    index_path: Optional[str] = None,
+) -> Optional[BlocklistMatcher]:
+    """
+    Matcher over the blocklist directory (or `list_paths`), recompiling the
+    index when lists changed. None when there are no lists. Falls back to
+    in-memory segments when the index cannot be written.
+    """
+    list_paths = find_blocklist_files(list_paths or [get_blocklist_dir()])
+    if not list_paths:
+        logging.info("No local blocklists found.")
+        return None
+
+    index_path = index_path or get_default_blocklist_index_path()
+
+    if read_blocklist_index_header(index_path) is not None:
+        try:
+            matcher = BlocklistMatcher.from_index_file(index_path)
+            if is_blocklist_index_current(matcher, list_paths):
+                logging.info("Blocklist index opened: %s (%d lists)", index_path, len(matcher.list_names))
+                return matcher
+            matcher.close()
+        except (OSError, ValueError):
+            logging.exception("Failed to open blocklist index: %s", index_path)
+
+    logging.info("Blocklist index missing or stale, compiling %d lists: %s", len(list_paths), index_path)
+    columns, manifest = compile_blocklists(list_paths)
+
+    try:
+        write_blocklist_index(index_path, columns, manifest)
+        return BlocklistMatcher.from_index_file(index_path)
+    except OSError:
+        logging.exception("Blocklist index unavailable, matching from memory.")
+        return BlocklistMatcher(
+            dict(columns, starts=columns["starts"].astype(np.uint32), ends=columns["ends"].astype(np.uint32)),
+            manifest,
+        )
+
+
+# =============================================================================
+# Entrypoint (`python main.py compile-blocklists`)
+# =============================================================================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="main.py compile-blocklists",
+        description="Compile local IPv4 blocklists (.netset/.ipset/.txt/.list/.csv, optionally .gz) "
+                    "into the blocklist index and print per-list statistics.",
+    )
+    parser.add_argument(
+        "paths", nargs="*",
+        help="List files or directories (default: the `blocklists` directory next to GeoLiteCity.dat).",
+    )
+    parser.add_argument("-o", "--output", default=None, help="Index path (default: <app dir>/cache/blocklists.idx).")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+
+    matcher = load_or_compile_blocklists(args.paths or None, args.output)
+    if matcher is None:
+        print(f"No blocklists found in: {', '.join(args.paths or [get_blocklist_dir()])}", file=sys.stderr)
+        return 1
+
+    for source in matcher.manifest["lists"]:
+        print(f"{source['name']:<32} {source['entries']:>9} entries {source['addresses']:>12} addresses")
+    print(f"Blocklist index: {matcher.index_path or '(in memory)'} ({len(matcher)} segments)")
+    return 0
@@ -0,0 +1,503 @@
+"""
+Enrichment engine: one asyncio event loop on one background thread runs every
+GeoIP / RDAP / VirusTotal lookup as a coroutine.
+
+Concurrency is bounded per service by semaphores, so hundreds of pending
+lookups cost coroutines, not OS threads. Libraries without an asyncio API
+(ipwhois) run on a small fixed executor; loading local assets (textures,
+tiles, markers, blocklists) has its own, so it never holds up RDAP.
+Results are handed to an `emit` callback, which the GUI connects to a Qt
+signal.
+"""
+
+import asyncio
+import logging
+import threading
+import concurrent.futures
+from typing import Any, Awaitable, Callable, Dict, Optional
+from urllib.error import HTTPError, URLError
+
+from ipwhois import IPWhois
+from ipwhois.exceptions import (
+    ASNLookupError,
+    ASNRegistryError,
+    HostLookupError,
+    HTTPLookupError,
+    NetError,
+    WhoisLookupError,
+)
+
+from service_health import (
+    SERVICE_GEOIP,
+    SERVICE_RDAP,
+    SERVICE_VT,
+    ServiceUnavailableError,
+    get_circuit_breaker,
+    set_service_probe,
+)
+from vt_scheduler import PRIORITY_INTERACTIVE
+from vt_client import (
+    fetch_ip_report,
+    format_vt_http_error,
+    has_usable_vt_api_keys,
+    has_vt_api_keys,
+    parse_vt_owner,
+    parse_vt_status,
+)
+
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+# Loading and building local assets; not a remote service.
+SERVICE_BACKGROUND = "background"
+
+# Maximum number of lookups running at once per service; the rest wait.
+SERVICE_CONCURRENCY = {
+    SERVICE_GEOIP: 64,
+    SERVICE_RDAP: 8,
+    SERVICE_VT: 16,
+    SERVICE_BACKGROUND: 4,
+}
+
+# Threads for blocking library calls (ipwhois); matches the RDAP limit.
+BLOCKING_EXECUTOR_WORKERS = SERVICE_CONCURRENCY[SERVICE_RDAP]
+
+# Threads for asset loading (`run_background`); matches its limit.
+BACKGROUND_EXECUTOR_WORKERS = SERVICE_CONCURRENCY[SERVICE_BACKGROUND]
+
+# Threads for "standard" mode GeoIP reads (`run_geoip`); pygeoip serializes
+# them on one file lock, so more threads would only wait on it.
+GEOIP_EXECUTOR_WORKERS = 2
+
+# pygeoip's `_type` for a reader that seeks and reads the .dat file per lookup.
+GEOIP_FILE_READER_TYPE = "STANDARD"
+
+# ipwhois starts every lookup with an RDAP bootstrap query to ARIN.
+RDAP_PROBE_HOST = "rdap.arin.net"
+RDAP_PROBE_PORT = 443
+
+# ipwhois errors that mean the registry could not be reached at all.
+RDAP_NETWORK_ERRORS = (
+    NetError,
+    ASNLookupError,
+    ASNRegistryError,
+    HostLookupError,
+    HTTPLookupError,
+    WhoisLookupError,
+    OSError,
+)
+
+EmitCallback = Callable[[dict], None]
+
+
+# =============================================================================
+# Engine
+# =============================================================================
+
+class EnrichmentEngine:
+    def __init__(self, concurrency: Optional[Dict[str, int]] = None):
+        self.concurrency = dict(concurrency or SERVICE_CONCURRENCY)
+
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._background_executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._geoip_executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._started = threading.Event()
+
+    @property
+    def is_running(self) -> bool:
+        return self.loop is not None and self.loop.is_running()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=BLOCKING_EXECUTOR_WORKERS, thread_name_prefix="enrichment-blocking"
+        )
+        self._background_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=BACKGROUND_EXECUTOR_WORKERS, thread_name_prefix="enrichment-background"
+        )
+        self._geoip_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=GEOIP_EXECUTOR_WORKERS, thread_name_prefix="enrichment-geoip"
+        )
+        set_service_probe(SERVICE_RDAP, probe_rdap)
+        self._thread = threading.Thread(target=self._run_loop, name="enrichment-loop", daemon=True)
+        self._thread.start()
+        self._started.wait()
+        logging.info("Enrichment engine started (limits: %s)", self.concurrency)
+
+    def _run_loop(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self._semaphores = {
+            service: asyncio.Semaphore(limit) for service, limit in self.concurrency.items()
+        }
+        self.loop.call_soon(self._started.set)
+
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+
+    def stop(self, timeout: float = 1.0) -> None:
+        """
+        Cancels every pending lookup and stops the loop thread.
+        """
+        if self.loop is None or self._thread is None:
+            return
+
+        async def cancel_all() -> None:
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        try:
+            asyncio.run_coroutine_threadsafe(cancel_all(), self.loop).result(timeout)
+        except Exception:
+            logging.warning("Enrichment engine did not cancel all lookups in time.")
+
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._background_executor.shutdown(wait=False, cancel_futures=True)
+        self._geoip_executor.shutdown(wait=False, cancel_futures=True)
+        self._thread = None
+        logging.info("Enrichment engine stopped.")
+
+    # -------------------------------------------------------------------------
+    # Scheduling
+    # -------------------------------------------------------------------------
+
+    async def _bounded(self, service: str, coro: Awaitable[Any]) -> Any:
+        async with self._semaphores[service]:
+            return await coro
+
+    def submit(self, service: str, coro: Awaitable[Any]) -> concurrent.futures.Future:
+        """
+        Schedules `coro` on the loop (thread-safe). At most
+        `concurrency[service]` coroutines of one service run at once.
+        """
+        return asyncio.run_coroutine_threadsafe(self._bounded(service, coro), self.loop)
+
+    def run_sync(self, service: str, coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+        """
+        Runs `coro` on the loop and blocks the calling thread for its result.
+        """
+        return self.submit(service, coro).result(timeout)
+
+    def call_soon(self, fn: Callable[..., Any], *args) -> None:
+        """
+        Runs a plain function on the loop thread (thread-safe).
+        """
+        self.loop.call_soon_threadsafe(fn, *args)
+
+    async def run_blocking(self, fn: Callable[..., Any], *args) -> Any:
+        return await self.loop.run_in_executor(self._executor, fn, *args)
+
+    async def run_background(self, fn: Callable[..., Any], *args) -> Any:
+        """
+        `run_blocking` for local file work submitted as SERVICE_BACKGROUND.
+        """
+        return await self.loop.run_in_executor(self._background_executor, fn, *args)
+
+    async def run_geoip(self, fn: Callable[..., Any], *args) -> Any:
+        """
+        `run_blocking` for GeoIP reads that touch the disk.
+        """
+        return await self.loop.run_in_executor(self._geoip_executor, fn, *args)
+
+
+_engine: Optional[EnrichmentEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_enrichment_engine() -> EnrichmentEngine:
+    """
+    Process-wide engine, started on first use.
+    """
+    global _engine
+
+    with _engine_lock:
+        if _engine is None:
+            _engine = EnrichmentEngine()
+            _engine.start()
+        return _engine
+
+
+# =============================================================================
+# Lookups
+# =============================================================================
+
+async def lookup_geoip(engine: EnrichmentEngine, geoip_reader, ip_addr: str, emit: EmitCallback) -> None:
+    """
+    mmap, memory and compiled readers answer from memory in microseconds and
+    run inline on the loop thread. A "standard" mode reader seeks and reads
+    the .dat file per lookup, so it runs on the GeoIP executor; neither
+    shares threads with RDAP, whose calls cannot be aborted once started.
+    """
+    try:
+        if getattr(geoip_reader, "_type", None) == GEOIP_FILE_READER_TYPE:
+            rec = await engine.run_geoip(geoip_reader.record_by_name, ip_addr)
+        else:
+            rec = geoip_reader.record_by_name(ip_addr)
+    except Exception:
+        logging.exception("GeoIP lookup failed.")
+        rec = None
+
+    emit({"record": rec})
+
+
+async def probe_rdap() -> None:
+    _, writer = await asyncio.open_connection(RDAP_PROBE_HOST, RDAP_PROBE_PORT)
+    writer.close()
+
+
+def _lookup_rdap_blocking(ip_addr: str) -> dict:
+    whois_res = IPWhois(ip_addr).lookup_rdap()
+    network = whois_res.get("network") or {}
+
+    return {
+        "asn_description": whois_res.get("asn_description", "No data"),
+        "ip_version": network.get("ip_version", "No data"),
+        "asn_registry": whois_res.get("asn_registry", "No data"),
+        "asn_cidr": whois_res.get("asn_cidr", "No data"),
+        "asn_date": whois_res.get("asn_date", "No data"),
+    }
+
+
+async def lookup_rdap(
+    engine: EnrichmentEngine,
+    ip_addr: str,
+    rdap_cache,
+    emit: EmitCallback,
+    asn_index=None,
+    rdap_fallback: bool = True,
+    rir_index=None,
+) -> None:
+    """
+    Network details from, in order: the RDAP prefix cache, the offline ASN
+    index, and (if `rdap_fallback`) a live RDAP query. The offline RIR index
+    supplies registry and allocation date whenever RDAP does not answer.
+    """
+    cached = rdap_cache.lookup(ip_addr) if rdap_cache is not None else None
+    if cached is not None:
+        cached["ok"] = True
+        emit(cached)
+        return
+
+    failure = {
+        "ok": False,
+        "asn_description": "No data",
+        "ip_version": "No data",
+        "asn_registry": "No data",
+        "asn_cidr": "No data",
+        "asn_date": "No data",
+    }
+
+    delegation = rir_index.lookup_one(ip_addr) if rir_index is not None else None
+    if delegation is not None:
+        failure["asn_registry"] = delegation["asn_registry"]
+        failure["asn_date"] = delegation["asn_date"] or "No data"
+
+    if asn_index is not None:
+        local = asn_index.lookup_one(ip_addr)
+        if local is not None:
+            emit(dict(failure, ok=True, ip_version="4", source="asn_index", **local))
+            return
+        if not rdap_fallback:
+            emit(dict(failure, asn_description="Not routed"))
+            return
+
+    breaker = get_circuit_breaker(SERVICE_RDAP)
+
+    try:
+        breaker.check()
+        result = await engine.run_blocking(_lookup_rdap_blocking, ip_addr)
+
+    except ServiceUnavailableError:
+        emit(dict(failure, asn_description="RDAP offline"))
+        return
+
+    except asyncio.CancelledError:
+        breaker.record_cancelled()
+        raise
+
+    except RDAP_NETWORK_ERRORS:
+        logging.exception("RDAP lookup failed.")
+        breaker.record_failure()
+        emit(failure)
+        return
+
+    except Exception:
+        logging.exception("RDAP lookup failed.")
+        breaker.record_success()
+        emit(failure)
+        return
+
+    breaker.record_success()
+
+    if rdap_cache is not None:
+        rdap_cache.store(result["asn_cidr"], result)
+
+    emit(dict(result, ok=True))
+
+
+def _queue_wait_reporter(emit: EmitCallback) -> Callable[[float], None]:
+    def on_wait(wait_seconds: float) -> None:
+        emit({"queued": True, "wait_seconds": wait_seconds})
+
+    return on_wait
+
+
+async def lookup_vt_status(
+    ip_addr: str,
+    vt_cache,
+    emit: EmitCallback,
+    priority: int = PRIORITY_INTERACTIVE,
+) -> None:
+    # A cached result is shown right away. A stale one is then refreshed
+    # and replaced only if the refresh succeeds.
+    cached = vt_cache.get(ip_addr) if vt_cache is not None else None
+    if cached is not None:
+        result, is_stale = cached
+        emit(dict(result))
+        if not is_stale:
+            return
+
+    if not has_vt_api_keys():
+        if cached is None:
+            emit({
+                "status_text": "No API key",
+                "detect_name": "No data",
+                "recent_activity": "No data",
+            })
+        return
+
+    if not has_usable_vt_api_keys():
+        if cached is None:
+            emit(format_vt_http_error(401))
+        return
+
+    try:
+        # A stale cached verdict stays on screen while the refresh is queued.
+        on_wait = _queue_wait_reporter(emit) if cached is None else None
+        data = await fetch_ip_report(ip_addr, priority, on_wait)
+
+    except HTTPError as e:
+        if e.code == 404:
+            # "Not known to VirusTotal" is a real answer worth caching.
+            result = format_vt_http_error(e.code)
+            if vt_cache is not None:
+                vt_cache.put(ip_addr, result)
+            emit(dict(result))
+        elif cached is None:
+            emit(format_vt_http_error(e.code))
+        return
+
+    except ServiceUnavailableError as e:
+        if cached is None:
+            emit({
+                "status_text": f"Offline (retry in {e.retry_in:.0f} s)",
+                "detect_name": "No data",
+                "recent_activity": "No data",
+            })
+        return
+
+    except URLError:
+        if cached is None:
+            emit({
+                "status_text": "Network error",
+                "detect_name": "No data",
+                "recent_activity": "No data",
+            })
+        return
+
+    except Exception:
+        logging.exception("VirusTotal lookup failed.")
+        if cached is None:
+            emit({
+                "status_text": "Lookup failed",
+                "detect_name": "No data",
+                "recent_activity": "No data",
+            })
+        return
+
+    result = parse_vt_status(data)
+    if vt_cache is not None:
+        vt_cache.put(ip_addr, result)
+    emit(dict(result))
+
+
+async def lookup_vt_owner(
+    ip_addr: str,
+    emit: EmitCallback,
+    priority: int = PRIORITY_INTERACTIVE,
+) -> None:
+    if not has_vt_api_keys():
+        emit({
+            "ok": False,
+            "owner": "No API key",
+            "message": "VirusTotal API key is not configured.",
+        })
+        return
+
+    if not has_usable_vt_api_keys():
+        emit({
+            "ok": False,
+            "owner": "Invalid API key",
+            "message": "Every VirusTotal API key was rejected (HTTP 401).",
+        })
+        return
+
+    try:
+        data = await fetch_ip_report(ip_addr, priority, _queue_wait_reporter(emit))
+
+        emit({
+            "ok": True,
+            "owner": parse_vt_owner(data),
+            "message": "OK",
+        })
+
+    except HTTPError as e:
+        if e.code == 401:
+            owner = "Invalid API key"
+        elif e.code == 404:
+            owner = "No data"
+        elif e.code == 429:
+            owner = "Rate limited"
+        else:
+            owner = f"HTTP {e.code}"
+
+        emit({
+            "ok": False,
+            "owner": owner,
+            "message": f"VirusTotal lookup failed: HTTP {e.code}",
+        })
+
+    except ServiceUnavailableError:
+        emit({
+            "ok": False,
+            "owner": "VirusTotal offline",
+            "message": "VirusTotal is unreachable; it is re-checked in the background.",
+        })
+
+    except URLError:
+        emit({
+            "ok": False,
+            "owner": "Network error",
+            "message": "Cannot connect to VirusTotal.",
+        })
+
+    except Exception:
+        logging.exception("VirusTotal IP owner lookup failed.")
+        emit({
+            "ok": False,
+            "owner": "Lookup failed",
+            "message": "VirusTotal lookup failed.",
+        })
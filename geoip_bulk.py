@@ -0,0 +1,384 @@
+"""
+Vectorized bulk GeoIP lookup over the legacy GeoLiteCity.dat (City edition).
+
+The binary search tree of the database is flattened once into sorted IPv4
+interval arrays (start/end/location id) plus a table of decoded location
+records. A whole array of IPv4 integers is then resolved with a single
+`numpy.searchsorted` pass, returning columnar results.
+
+The answers are identical to `pygeoip.GeoIP.record_by_name` for every IPv4
+address in the database.
+"""
+
+import os
+import socket
+import logging
+from dataclasses import dataclass
+from math import floor
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pygeoip
+from pygeoip import const as geoip_const
+from pygeoip.timezone import time_zone_by_country_and_region
+
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+GEODB_ENCODING = geoip_const.ENCODING
+
+SUPPORTED_CITY_EDITIONS = (
+    geoip_const.CITY_EDITION_REV0,
+    geoip_const.CITY_EDITION_REV1,
+)
+
+STRING_COLUMNS = (
+    "country_code",
+    "country_code3",
+    "country_name",
+    "continent",
+    "region_code",
+    "city",
+    "postal_code",
+    "time_zone",
+)
+
+NO_LOCATION = -1
+
+
+# =============================================================================
+# GeoDB parsing
+# =============================================================================
+
+def read_database_info(data: bytes) -> Tuple[int, int]:
+    """
+    Returns (database_type, database_segments) from the structure info block
+    at the end of a legacy GeoIP database, like pygeoip does on open.
+    """
+    database_type = geoip_const.COUNTRY_EDITION
+    database_segments = geoip_const.COUNTRY_BEGIN
+
+    pos = len(data) - 3
+    for _ in range(geoip_const.STRUCTURE_INFO_MAX_SIZE):
+        if pos < 0:
+            break
+
+        if data[pos:pos + 3] == b"\xff\xff\xff":
+            database_type = data[pos + 3]
+            if database_type >= 106:
+                database_type -= 105
+
+            if database_type in SUPPORTED_CITY_EDITIONS:
+                segment_bytes = data[pos + 4:pos + 4 + geoip_const.SEGMENT_RECORD_LENGTH]
+                database_segments = int.from_bytes(segment_bytes, "little")
+            break
+
+        pos -= 1
+
+    return database_type, database_segments
+
+
+def flatten_search_tree(data: bytes, segments: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Walks the 32-level binary tree once and returns sorted, merged IPv4
+    intervals as (starts, ends, pointers). Pointers are the raw leaf values;
+    intervals pointing at the "no record" leaf are dropped.
+    """
+    record_length = geoip_const.STANDARD_RECORD_LENGTH
+    node_bytes = np.frombuffer(data, dtype=np.uint8, count=segments * 2 * record_length)
+    node_bytes = node_bytes.reshape(segments, 2 * record_length).astype(np.uint32)
+
+    left = (node_bytes[:, 0] | (node_bytes[:, 1] << 8) | (node_bytes[:, 2] << 16)).tolist()
+    right = (node_bytes[:, 3] | (node_bytes[:, 4] << 8) | (node_bytes[:, 5] << 16)).tolist()
+
+    starts: List[int] = []
+    ends: List[int] = []
+    pointers: List[int] = []
+
+    # Depth-first with the left child on top of the stack, so leaves are
+    # visited in ascending address order. Entries are (value, bit, prefix).
+    stack = [(0, 31, 0)]
+    while stack:
+        value, bit, prefix = stack.pop()
+
+        if value < segments:
+            if bit < 0:
+                raise pygeoip.GeoIPError("Corrupt database")
+            stack.append((right[value], bit - 1, prefix | (1 << bit)))
+            stack.append((left[value], bit - 1, prefix))
+            continue
+
+        if value == segments:
+            continue
+
+        leaf_end = prefix + (1 << (bit + 1)) - 1
+
+        if pointers and pointers[-1] == value and ends[-1] + 1 == prefix:
+            ends[-1] = leaf_end
+            continue
+
+        starts.append(prefix)
+        ends.append(leaf_end)
+        pointers.append(value)
+
+    return (
+        np.asarray(starts, dtype=np.uint32),
+        np.asarray(ends, dtype=np.uint32),
+        np.asarray(pointers, dtype=np.int64),
+    )
+
+
+def parse_location_record(data: bytes, pointer: int, segments: int, database_type: int) -> dict:
+    """
+    Decodes one City record exactly like `pygeoip.GeoIP._get_record`.
+    """
+    record_length = geoip_const.STANDARD_RECORD_LENGTH
+    record_pos = pointer + (2 * record_length - 1) * segments
+    buf = data[record_pos:record_pos + geoip_const.FULL_RECORD_LENGTH].decode(GEODB_ENCODING)
+
+    record = {
+        "dma_code": 0,
+        "area_code": 0,
+        "metro_code": None,
+        "postal_code": None,
+    }
+
+    char = ord(buf[0])
+    record["country_code"] = geoip_const.COUNTRY_CODES[char]
+    record["country_code3"] = geoip_const.COUNTRY_CODES3[char]
+    record["country_name"] = geoip_const.COUNTRY_NAMES[char]
+    record["continent"] = geoip_const.CONTINENT_NAMES[char]
+
+    def read_data(pos: int) -> Tuple[int, Optional[str]]:
+        cur = buf.index("\0", pos)
+        return cur, buf[pos:cur] if cur > pos else None
+
+    offset, record["region_code"] = read_data(1)
+    offset, record["city"] = read_data(offset + 1)
+    offset, record["postal_code"] = read_data(offset + 1)
+    offset += 1
+
+    latitude = int.from_bytes(buf[offset:offset + 3].encode(GEODB_ENCODING), "little")
+    longitude = int.from_bytes(buf[offset + 3:offset + 6].encode(GEODB_ENCODING), "little")
+
+    record["latitude"] = (latitude / 10000.0) - 180.0
+    record["longitude"] = (longitude / 10000.0) - 180.0
+
+    if database_type == geoip_const.CITY_EDITION_REV1 and record["country_code"] == "US":
+        dma_area = int.from_bytes(buf[offset + 6:offset + 9].encode(GEODB_ENCODING), "little")
+        record["dma_code"] = int(floor(dma_area / 1000))
+        record["area_code"] = dma_area % 1000
+        record["metro_code"] = geoip_const.DMA_MAP.get(record["dma_code"])
+
+    record["time_zone"] = time_zone_by_country_and_region(
+        record["country_code"],
+        record["region_code"],
+    )
+
+    return record
+
+
+def build_geodb_tables(geo_db_path: str) -> Tuple[int, np.ndarray, np.ndarray, np.ndarray, List[dict]]:
+    """
+    Parses a City database into lookup tables.
+
+    Returns:
+        (database_type, starts, ends, location_ids, locations)
+    """
+    with open(geo_db_path, "rb") as f:
+        data = f.read()
+
+    database_type, segments = read_database_info(data)
+    if database_type not in SUPPORTED_CITY_EDITIONS:
+        raise pygeoip.GeoIPError("Invalid database type, expected IPv4 City")
+
+    starts, ends, pointers = flatten_search_tree(data, segments)
+
+    unique_pointers, location_ids = np.unique(pointers, return_inverse=True)
+    locations = [
+        parse_location_record(data, int(pointer), segments, database_type)
+        for pointer in unique_pointers
+    ]
+
+    logging.info(
+        "GeoIP tables built from %s: %d ranges, %d locations.",
+        os.path.basename(geo_db_path),
+        len(starts),
+        len(locations),
+    )
+
+    return database_type, starts, ends, location_ids.astype(np.int32), locations
+
+
+# =============================================================================
+# Address conversion
+# =============================================================================
+
+def ipv4_to_uint32(ip_addrs: Iterable[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Converts IPv4 strings to a uint32 array.
+
+    Returns:
+        (ip_nums, valid_mask) - invalid entries are 0 and False in the mask.
+    """
+    packed = []
+    valid = []
+
+    for ip_addr in ip_addrs:
+        try:
+            packed.append(socket.inet_aton(ip_addr.strip()))
+            valid.append(True)
+        except (OSError, AttributeError):
+            packed.append(b"\0\0\0\0")
+            valid.append(False)
+
+    ip_nums = np.frombuffer(b"".join(packed), dtype=">u4").astype(np.uint32)
+    return ip_nums, np.asarray(valid, dtype=bool)
+
+
+def uint32_to_ipv4(ip_num: int) -> str:
+    return socket.inet_ntoa(int(ip_num).to_bytes(4, "big"))
+
+
+# =============================================================================
+# Bulk reader
+# =============================================================================
+
+@dataclass
+class BulkLookupResult:
+    """
+    Columnar lookup result. Row i describes ip_nums[i].
+    Coordinates are NaN and string columns are None when not found.
+    """
+    ip_nums: np.ndarray
+    location_ids: np.ndarray
+    found: np.ndarray
+    latitude: np.ndarray
+    longitude: np.ndarray
+    country_code: np.ndarray
+    country_code3: np.ndarray
+    country_name: np.ndarray
+    continent: np.ndarray
+    region_code: np.ndarray
+    city: np.ndarray
+    postal_code: np.ndarray
+    time_zone: np.ndarray
+    reader: "GeoIPBulkReader"
+
+    def __len__(self) -> int:
+        return len(self.ip_nums)
+
+    def record(self, index: int) -> Optional[dict]:
+        """
+        Returns the same dict `record_by_name` would return for row `index`.
+        """
+        return self.reader.location_record(int(self.location_ids[index]))
+
+    def records(self) -> Iterator[Optional[dict]]:
+        for index in range(len(self)):
+            yield self.record(index)
+
+
+class GeoIPBulkReader:
+    def __init__(
+        self,
+        starts: np.ndarray,
+        ends: np.ndarray,
+        location_ids: np.ndarray,
+        locations: List[dict],
+    ):
+        self.starts = starts
+        self.ends = ends
+        self.location_ids = location_ids
+        self.locations = locations
+
+        # Every column carries one trailing NaN / None slot, so that
+        # NO_LOCATION (-1) indexes "not found" without extra masking.
+        self.latitude = np.asarray([loc["latitude"] for loc in locations] + [np.nan], dtype=np.float64)
+        self.longitude = np.asarray([loc["longitude"] for loc in locations] + [np.nan], dtype=np.float64)
+
+        self.string_columns = {}
+        for column in STRING_COLUMNS:
+            values = np.empty(len(locations) + 1, dtype=object)
+            values[:-1] = [loc.get(column) for loc in locations]
+            values[-1] = None
+            self.string_columns[column] = values
+
+    @classmethod
+    def from_geodb(cls, geo_db_path: str) -> "GeoIPBulkReader":
+        _, starts, ends, location_ids, locations = build_geodb_tables(geo_db_path)
+        return cls(starts, ends, location_ids, locations)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    @property
+    def location_count(self) -> int:
+        return len(self.locations)
+
+    def location_record(self, location_id: int) -> Optional[dict]:
+        if location_id == NO_LOCATION:
+            return None
+        return dict(self.locations[location_id])
+
+    def string_column(self, column: str, location_ids: np.ndarray) -> np.ndarray:
+        return self.string_columns[column][location_ids]
+
+    def lookup_location_ids(self, ip_nums: np.ndarray) -> np.ndarray:
+        """
+        Resolves an array of IPv4 integers to location ids (-1 = no record).
+        """
+        ip_nums = np.asarray(ip_nums, dtype=np.uint32)
+
+        if not len(self.starts):
+            return np.full(len(ip_nums), NO_LOCATION, dtype=np.int32)
+
+        slots = np.searchsorted(self.starts, ip_nums, side="right") - 1
+        slots_clipped = np.maximum(slots, 0)
+        hit = (slots >= 0) & (ip_nums <= self.ends[slots_clipped])
+
+        return np.where(hit, self.location_ids[slots_clipped], NO_LOCATION).astype(np.int32)
+
+    def lookup_ints(self, ip_nums: np.ndarray) -> BulkLookupResult:
+        ip_nums = np.asarray(ip_nums, dtype=np.uint32)
+        return self._build_result(ip_nums, self.lookup_location_ids(ip_nums))
+
+    def lookup(self, ip_addrs: Iterable[str]) -> BulkLookupResult:
+        """
+        Resolves IPv4 strings. Unparseable addresses are reported as not found.
+        """
+        ip_nums, valid = ipv4_to_uint32(ip_addrs)
+        location_ids = self.lookup_location_ids(ip_nums)
+        location_ids[~valid] = NO_LOCATION
+        return self._build_result(ip_nums, location_ids)
+
+    def _build_result(self, ip_nums: np.ndarray, location_ids: np.ndarray) -> BulkLookupResult:
+        columns = {
+            column: self.string_column(column, location_ids)
+            for column in STRING_COLUMNS
+        }
+
+        return BulkLookupResult(
+            ip_nums=ip_nums,
+            location_ids=location_ids,
+            found=location_ids != NO_LOCATION,
+            latitude=self.latitude[location_ids],
+            longitude=self.longitude[location_ids],
+            reader=self,
+            **columns,
+        )
+
+    def record_by_addr(self, ip_addr: str) -> Optional[dict]:
+        """
+        Single-address lookup with `record_by_addr` semantics (scalar fast path).
+        """
+        ip_num = int.from_bytes(socket.inet_aton(ip_addr), "big")
+
+        # A Python int needle would make numpy promote (copy) the whole array.
+        slot = int(np.searchsorted(self.starts, np.uint32(ip_num), side="right")) - 1
+        if slot < 0 or ip_num > int(self.ends[slot]):
+            return None
+
+        return self.location_record(int(self.location_ids[slot]))
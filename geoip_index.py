@@ -0,0 +1,389 @@
+"""
+Precompiled, memory-mappable GeoIP index.
+
+`python main.py compile-geodb` turns GeoLiteCity.dat into a compact columnar
+file (see `index_sections`) holding:
+    - range starts / ends / location ids as uint32 arrays
+    - a deduplicated location table (numeric columns + interned string ids)
+    - one interned UTF-8 string table
+
+The header records the index format version and the size, mtime and
+SHA-256 of the source .dat. Opening maps the file and wraps the sections
+with numpy views, so startup costs milliseconds and no legacy record is
+parsed per query. A stale or foreign index is rebuilt automatically by
+`load_or_compile_geoip_index`.
+"""
+
+import os
+import sys
+import socket
+import struct
+import logging
+import argparse
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app_core import get_app_dir, get_geo_db_file_path, setup_logging
+from geoip_bulk import STRING_COLUMNS, GeoIPBulkReader, build_geodb_tables
+from range_index import (
+    INDEX_CACHE_DIR_NAME,
+    NONE_STRING_ID,
+    file_sha256,
+    map_index_file,
+    read_header_bytes,
+    string_table_sections,
+    write_index_file,
+)
+
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+INDEX_MAGIC = b"GEOIPIDX"
+INDEX_VERSION = 1
+INDEX_FILE_SUFFIX = ".idx"
+
+# magic, version, database_type, source_sha256, source_size, source_mtime_ns,
+# range_count, location_count, string_count, string_blob_size
+INDEX_HEADER = struct.Struct("<8sII32sQqIIIQ")
+
+INDEX_STRING_COLUMNS = STRING_COLUMNS + ("metro_code",)
+
+
+# =============================================================================
+# Layout
+# =============================================================================
+
+def index_sections(range_count: int, location_count: int, string_count: int, blob_size: int) -> List[Tuple[str, str, int]]:
+    """
+    (name, dtype, item count) for every section, in file order. Location
+    columns carry one trailing "not found" slot (NaN / None), so location
+    id -1 needs no masking.
+    """
+    location_slots = location_count + 1
+
+    sections = [
+        ("starts", "<u4", range_count),
+        ("ends", "<u4", range_count),
+        ("range_locations", "<i4", range_count),
+        ("latitude", "<f8", location_slots),
+        ("longitude", "<f8", location_slots),
+        ("dma_code", "<i4", location_slots),
+        ("area_code", "<i4", location_slots),
+    ]
+    sections += [(f"str_{column}", "<u4", location_slots) for column in INDEX_STRING_COLUMNS]
+    sections += string_table_sections(string_count, blob_size)
+    return sections
+
+
+# =============================================================================
+# Source identity
+# =============================================================================
+
+def get_default_index_path(geo_db_path: str) -> str:
+    return os.path.join(
+        get_app_dir(),
+        INDEX_CACHE_DIR_NAME,
+        os.path.basename(geo_db_path) + INDEX_FILE_SUFFIX,
+    )
+
+
+def read_index_header(index_path: str) -> Optional[dict]:
+    fields = read_header_bytes(index_path, INDEX_HEADER)
+    if fields is None:
+        return None
+
+    (
+        magic, version, database_type, source_sha256, source_size, source_mtime_ns,
+        range_count, location_count, string_count, blob_size,
+    ) = fields
+
+    if magic != INDEX_MAGIC or version != INDEX_VERSION:
+        return None
+
+    return {
+        "database_type": database_type,
+        "source_sha256": source_sha256,
+        "source_size": source_size,
+        "source_mtime_ns": source_mtime_ns,
+        "range_count": range_count,
+        "location_count": location_count,
+        "string_count": string_count,
+        "blob_size": blob_size,
+    }
+
+
+def is_index_current(header: Optional[dict], geo_db_path: str) -> bool:
+    """
+    Size + mtime is the fast path; on an mtime change (e.g. a fresh
+    PyInstaller extraction) the SHA-256 of the source decides.
+    """
+    if header is None:
+        return False
+
+    stat = os.stat(geo_db_path)
+    if header["source_size"] != stat.st_size:
+        return False
+    if header["source_mtime_ns"] == stat.st_mtime_ns:
+        return True
+
+    return header["source_sha256"] == file_sha256(geo_db_path)
+
+
+# =============================================================================
+# Compile
+# =============================================================================
+
+def compile_geoip_index(geo_db_path: str, index_path: str) -> dict:
+    """
+    Builds the index for `geo_db_path` and atomically writes it to `index_path`.
+    Returns the written header.
+    """
+    stat = os.stat(geo_db_path)
+    source_sha256 = file_sha256(geo_db_path)
+
+    database_type, starts, ends, pointer_location_ids, locations = build_geodb_tables(geo_db_path)
+
+    # Deduplicate locations by content (distinct records can be identical).
+    location_keys: Dict[tuple, int] = {}
+    unique_locations: List[dict] = []
+    remap = np.empty(len(locations), dtype=np.int32)
+
+    for pointer_location_id, location in enumerate(locations):
+        key = tuple(sorted(location.items()))
+        if key not in location_keys:
+            location_keys[key] = len(unique_locations)
+            unique_locations.append(location)
+        remap[pointer_location_id] = location_keys[key]
+
+    # Intern every string; id 0 stands for None.
+    string_ids: Dict[str, int] = {}
+    strings: List[bytes] = [b""]
+
+    def intern(value: Optional[str]) -> int:
+        if value is None:
+            return NONE_STRING_ID
+        string_id = string_ids.get(value)
+        if string_id is None:
+            string_id = string_ids[value] = len(strings)
+            strings.append(value.encode("utf-8"))
+        return string_id
+
+    def location_column(key: str, dtype: str, pad) -> np.ndarray:
+        return np.asarray([loc[key] for loc in unique_locations] + [pad], dtype=dtype)
+
+    arrays = {
+        "starts": starts,
+        "ends": ends,
+        "range_locations": remap[pointer_location_ids],
+        "latitude": location_column("latitude", "<f8", np.nan),
+        "longitude": location_column("longitude", "<f8", np.nan),
+        "dma_code": location_column("dma_code", "<i4", 0),
+        "area_code": location_column("area_code", "<i4", 0),
+    }
+    for column in INDEX_STRING_COLUMNS:
+        arrays[f"str_{column}"] = np.asarray(
+            [intern(loc.get(column)) for loc in unique_locations] + [NONE_STRING_ID],
+            dtype="<u4",
+        )
+
+    arrays["string_offsets"] = np.concatenate(([0], np.cumsum([len(raw) for raw in strings]))).astype("<u8")
+    arrays["string_blob"] = np.frombuffer(b"".join(strings), dtype="u1")
+
+    header = {
+        "database_type": database_type,
+        "source_sha256": source_sha256,
+        "source_size": stat.st_size,
+        "source_mtime_ns": stat.st_mtime_ns,
+        "range_count": len(starts),
+        "location_count": len(unique_locations),
+        "string_count": len(strings),
+        "blob_size": len(arrays["string_blob"]),
+    }
+
+    sections = index_sections(
+        header["range_count"],
+        header["location_count"],
+        header["string_count"],
+        header["blob_size"],
+    )
+
+    write_index_file(
+        index_path,
+        INDEX_HEADER.pack(
+            INDEX_MAGIC,
+            INDEX_VERSION,
+            header["database_type"],
+            header["source_sha256"],
+            header["source_size"],
+            header["source_mtime_ns"],
+            header["range_count"],
+            header["location_count"],
+            header["string_count"],
+            header["blob_size"],
+        ),
+        sections,
+        arrays,
+    )
+
+    logging.info(
+        "GeoIP index compiled: %s (%d ranges, %d locations, %d strings)",
+        index_path,
+        header["range_count"],
+        header["location_count"],
+        header["string_count"],
+    )
+
+    return header
+
+
+# =============================================================================
+# Reader
+# =============================================================================
+
+class CompiledGeoIPIndex(GeoIPBulkReader):
+    """
+    Bulk reader backed by a memory-mapped compiled index. Strings are decoded
+    lazily, once per interned id, the first time a result needs them.
+    """
+
+    def __init__(self, index_path: str):
+        header = read_index_header(index_path)
+        if header is None:
+            raise ValueError(f"Not a compatible GeoIP index: {index_path}")
+
+        self.index_path = index_path
+        self.header = header
+
+        self._mmap, views = map_index_file(
+            index_path,
+            INDEX_HEADER,
+            index_sections(
+                header["range_count"],
+                header["location_count"],
+                header["string_count"],
+                header["blob_size"],
+            ),
+        )
+
+        self.starts = views["starts"]
+        self.ends = views["ends"]
+        self.location_ids = views["range_locations"]
+        self.latitude = views["latitude"]
+        self.longitude = views["longitude"]
+        self.dma_code = views["dma_code"]
+        self.area_code = views["area_code"]
+        self.string_ids = {column: views[f"str_{column}"] for column in INDEX_STRING_COLUMNS}
+        self.string_offsets = views["string_offsets"]
+        self.string_blob = views["string_blob"]
+
+        self._strings = np.empty(header["string_count"], dtype=object)
+        self._decoded = np.zeros(header["string_count"], dtype=bool)
+        self._decoded[NONE_STRING_ID] = True
+
+    @property
+    def location_count(self) -> int:
+        return self.header["location_count"]
+
+    def _decode_string(self, string_id: int) -> Optional[str]:
+        if not self._decoded[string_id]:
+            start, end = self.string_offsets[string_id], self.string_offsets[string_id + 1]
+            self._strings[string_id] = self.string_blob[start:end].tobytes().decode("utf-8")
+            self._decoded[string_id] = True
+        return self._strings[string_id]
+
+    def _decode_strings(self, string_ids: np.ndarray) -> np.ndarray:
+        pending = np.unique(string_ids)
+        pending = pending[~self._decoded[pending]]
+
+        for string_id in pending.tolist():
+            self._decode_string(string_id)
+
+        return self._strings[string_ids]
+
+    def string_column(self, column: str, location_ids: np.ndarray) -> np.ndarray:
+        return self._decode_strings(self.string_ids[column][location_ids])
+
+    def location_record(self, location_id: int) -> Optional[dict]:
+        if location_id < 0:
+            return None
+
+        record = {
+            column: self._decode_string(int(self.string_ids[column][location_id]))
+            for column in INDEX_STRING_COLUMNS
+        }
+        record["latitude"] = float(self.latitude[location_id])
+        record["longitude"] = float(self.longitude[location_id])
+        record["dma_code"] = int(self.dma_code[location_id])
+        record["area_code"] = int(self.area_code[location_id])
+        return record
+
+    def record_by_name(self, hostname: str) -> Optional[dict]:
+        """
+        Drop-in for `pygeoip.GeoIP.record_by_name`.
+        """
+        return self.record_by_addr(socket.gethostbyname(hostname))
+
+
+def load_or_compile_geoip_index(geo_db_path: str, index_path: Optional[str] = None) -> CompiledGeoIPIndex:
+    """
+    Opens the compiled index for `geo_db_path`, (re)compiling it first when it
+    is missing, from an older format version or built from another source.
+    """
+    index_path = index_path or get_default_index_path(geo_db_path)
+
+    if not is_index_current(read_index_header(index_path), geo_db_path):
+        logging.info("GeoIP index missing or stale, compiling: %s", index_path)
+        compile_geoip_index(geo_db_path, index_path)
+
+    return CompiledGeoIPIndex(index_path)
+
+
+def open_bulk_reader(geo_db_path: str) -> GeoIPBulkReader:
+    """
+    Compiled index when possible; falls back to building the tables in
+    memory when the index cannot be written (e.g. read-only app dir).
+    """
+    try:
+        return load_or_compile_geoip_index(geo_db_path)
+    except OSError:
+        logging.exception("GeoIP index unavailable, building in-memory tables.")
+        return GeoIPBulkReader.from_geodb(geo_db_path)
+
+
+# =============================================================================
+# Entrypoint (`python main.py compile-geodb`)
+# =============================================================================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="main.py compile-geodb",
+        description="Compile GeoLiteCity.dat into a memory-mappable index.",
+    )
+    parser.add_argument("--geodb", default=None, help="Path to GeoLiteCity.dat (default: bundled resource).")
+    parser.add_argument("-o", "--output", default=None, help="Index path (default: <app dir>/cache/<db>.idx).")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the index is current.")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+
+    geo_db_path = args.geodb or get_geo_db_file_path()
+    index_path = args.output or get_default_index_path(geo_db_path)
+
+    if not os.path.isfile(geo_db_path):
+        print(f"GeoDB file not found: {geo_db_path}", file=sys.stderr)
+        return 1
+
+    if not args.force and is_index_current(read_index_header(index_path), geo_db_path):
+        print(f"GeoIP index is up to date: {index_path}")
+        return 0
+
+    header = compile_geoip_index(geo_db_path, index_path)
+    print(
+        f"GeoIP index written: {index_path} "
+        f"({header['range_count']} ranges, {header['location_count']} locations, "
+        f"{header['string_count']} strings)"
+    )
+    return 0
@@ -0,0 +1,277 @@
+"""
+Marker layer of the globe: geolocated points drawn as point sprites.
+
+Markers are kept as (latitude, longitude) float32 pairs in one vertex
+buffer and drawn with a single glDrawArrays(GL_POINTS); the vertex shader
+places each point on the globe with the same mapping as the Earth
+texture. Markers behind the horizon are dropped in the shader, and the
+depth test against the globe handles the rest. `add` only queues points;
+the next `draw` writes them behind the existing ones with
+glBufferSubData. The buffer grows by doubling, copying its contents on
+the GPU (glCopyBufferSubData) where available, so appending never
+re-uploads what is already there.
+
+Needs the shader renderer; with the gluSphere fallback no markers are
+drawn.
+"""
+
+import ctypes
+import logging
+from typing import List, Tuple
+
+import numpy as np
+from OpenGL.GL import *
+
+from globe_render import link_program
+
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+INITIAL_MARKER_CAPACITY = 4096
+MARKER_BYTES = 8  # latitude, longitude as float32
+
+MARKER_POINT_SIZE = 5.0
+MARKER_COLOR = (1.0, 0.45, 0.1)
+
+# Slightly above the surface, so markers win the depth test against it.
+MARKER_ALTITUDE = 1.003
+
+MARKER_VERTEX_SHADER = """
+#version 120
+attribute vec2 a_lat_lon;
+uniform mat4 u_mvp;
+uniform vec3 u_camera;
+uniform float u_point_size;
+
+const float PI = 3.14159265358979;
+const float ALTITUDE = %r;
+
+void main() {
+    // Texture coordinates of the (flipped) equirectangular Earth texture.
+    float s = (180.0 - a_lat_lon.y) / 360.0;
+    float t = (a_lat_lon.x + 90.0) / 180.0;
+    float theta = 2.0 * PI * s;
+    float rho = PI * (1.0 - t);
+    vec3 normal = vec3(-sin(theta) * sin(rho), cos(theta) * sin(rho), cos(rho));
+    vec3 position = ALTITUDE * normal;
+    gl_PointSize = u_point_size;
+    if (dot(normal, u_camera - position) < 0.0) {
+        // Behind the horizon: the depth test alone would let the part of
+        // the sprite beyond the globe's outline through.
+        gl_Position = vec4(2.0, 2.0, 2.0, 1.0);
+    } else {
+        gl_Position = u_mvp * vec4(position, 1.0);
+    }
+}
+""" % MARKER_ALTITUDE
+
+MARKER_FRAGMENT_SHADER = """
+#version 120
+uniform vec3 u_color;
+
+void main() {
+    // Round dots with a soft edge instead of square points.
+    float radius = length(gl_PointCoord - vec2(0.5)) * 2.0;
+    if (radius > 1.0) {
+        discard;
+    }
+    gl_FragColor = vec4(u_color, 1.0 - smoothstep(0.6, 1.0, radius));
+}
+"""
+
+
+def lat_lon_to_globe_points(coordinates: np.ndarray, altitude: float = 1.0) -> np.ndarray:
+    """
+    Model-space positions of (latitude, longitude) rows, as the marker
+    shader computes them.
+    """
+    coordinates = np.asarray(coordinates, dtype=np.float64)
+    theta = 2.0 * np.pi * (180.0 - coordinates[:, 1]) / 360.0
+    rho = np.pi * (1.0 - (coordinates[:, 0] + 90.0) / 180.0)
+    return altitude * np.stack([-np.sin(theta) * np.sin(rho), np.cos(theta) * np.sin(rho), np.cos(rho)], axis=1)
+
+
+# =============================================================================
+# Marker layer
+# =============================================================================
+
+class GlobeMarkerLayer:
+    """
+    `initialize`, `draw` and `cleanup` need the globe's OpenGL context
+    current; `add` and `clear` can be called at any time on the GUI thread.
+    """
+
+    def __init__(self, point_size: float = MARKER_POINT_SIZE, color: Tuple[float, float, float] = MARKER_COLOR):
+        self.point_size = point_size
+        self.color = color
+
+        self.pending: List[np.ndarray] = []
+        self.count = 0
+        self.capacity = 0
+        self.clear_requested = False
+
+        self.program = None
+        self.buffer = None
+        self.locations = {}
+
+        self.bytes_uploaded = 0
+        self.growths = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.program is not None
+
+    @property
+    def marker_count(self) -> int:
+        return self.count + sum(len(chunk) for chunk in self.pending)
+
+    def initialize(self) -> bool:
+        """
+        Builds the program; call only with the shader renderer.
+        """
+        try:
+            self.program = link_program(MARKER_VERTEX_SHADER, MARKER_FRAGMENT_SHADER)
+        except Exception:
+            logging.exception("Globe markers unavailable.")
+            self.program = None
+            return False
+
+        self.locations = {
+            "a_lat_lon": glGetAttribLocation(self.program, "a_lat_lon"),
+            "u_mvp": glGetUniformLocation(self.program, "u_mvp"),
+            "u_camera": glGetUniformLocation(self.program, "u_camera"),
+            "u_point_size": glGetUniformLocation(self.program, "u_point_size"),
+            "u_color": glGetUniformLocation(self.program, "u_color"),
+        }
+        self.buffer = glGenBuffers(1)
+        return True
+
+    # -------------------------------------------------------------------------
+    # Markers
+    # -------------------------------------------------------------------------
+
+    def add(self, coordinates: np.ndarray) -> None:
+        """
+        Queues (latitude, longitude) rows, uploaded on the next draw.
+        """
+        coordinates = np.ascontiguousarray(coordinates, dtype=np.float32).reshape(-1, 2)
+        if len(coordinates):
+            self.pending.append(coordinates)
+
+    def clear(self) -> None:
+        self.pending.clear()
+        self.clear_requested = True
+
+    def upload_pending(self) -> None:
+        """
+        Writes queued markers behind the uploaded ones (called by `draw`).
+        """
+        if self.clear_requested:
+            self.count = 0
+            self.clear_requested = False
+        if not self.pending:
+            return
+
+        added = np.concatenate(self.pending) if len(self.pending) > 1 else self.pending[0]
+        self.pending.clear()
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.buffer)
+        if self.count + len(added) > self.capacity:
+            self._grow(self.count + len(added))
+        glBufferSubData(GL_ARRAY_BUFFER, self.count * MARKER_BYTES, added.nbytes, added)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+        self.count += len(added)
+        self.bytes_uploaded += added.nbytes
+
+    def _grow(self, needed: int) -> None:
+        """
+        Reallocates the (bound) buffer with at least twice the capacity,
+        keeping the markers already in it.
+        """
+        capacity = max(INITIAL_MARKER_CAPACITY, self.capacity * 2)
+        while capacity < needed:
+            capacity *= 2
+
+        if self.count and bool(glCopyBufferSubData):
+            new_buffer = glGenBuffers(1)
+            glBindBuffer(GL_COPY_WRITE_BUFFER, new_buffer)
+            glBufferData(GL_COPY_WRITE_BUFFER, capacity * MARKER_BYTES, None, GL_DYNAMIC_DRAW)
+            glBindBuffer(GL_COPY_READ_BUFFER, self.buffer)
+            glCopyBufferSubData(GL_COPY_READ_BUFFER, GL_COPY_WRITE_BUFFER, 0, 0, self.count * MARKER_BYTES)
+            glBindBuffer(GL_COPY_READ_BUFFER, 0)
+            glBindBuffer(GL_COPY_WRITE_BUFFER, 0)
+            glDeleteBuffers(1, [self.buffer])
+            self.buffer = new_buffer
+            glBindBuffer(GL_ARRAY_BUFFER, self.buffer)
+        else:
+            kept = None
+            if self.count:
+                # No buffer copies before OpenGL 3.1: read the markers back once.
+                kept = glGetBufferSubData(GL_ARRAY_BUFFER, 0, self.count * MARKER_BYTES)
+            glBufferData(GL_ARRAY_BUFFER, capacity * MARKER_BYTES, None, GL_DYNAMIC_DRAW)
+            if kept is not None:
+                glBufferSubData(GL_ARRAY_BUFFER, 0, self.count * MARKER_BYTES, kept)
+
+        self.capacity = capacity
+        self.growths += 1
+
+    # -------------------------------------------------------------------------
+    # Drawing
+    # -------------------------------------------------------------------------
+
+    def draw(self, model_view: np.ndarray, projection: np.ndarray) -> None:
+        if not self.enabled:
+            return
+        self.upload_pending()
+        if not self.count:
+            return
+
+        mvp = projection @ model_view
+        camera = np.linalg.inv(model_view)[:3, 3]
+
+        glUseProgram(self.program)
+        glUniformMatrix4fv(self.locations["u_mvp"], 1, GL_TRUE, mvp.astype(np.float32))
+        glUniform3f(self.locations["u_camera"], *camera)
+        glUniform1f(self.locations["u_point_size"], self.point_size)
+        glUniform3f(self.locations["u_color"], *self.color)
+
+        glEnable(GL_VERTEX_PROGRAM_POINT_SIZE)
+        glEnable(GL_POINT_SPRITE)
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        # Test against the globe, but do not let markers hide each other's soft edges.
+        glDepthMask(GL_FALSE)
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.buffer)
+        glEnableVertexAttribArray(self.locations["a_lat_lon"])
+        glVertexAttribPointer(self.locations["a_lat_lon"], 2, GL_FLOAT, GL_FALSE, MARKER_BYTES, ctypes.c_void_p(0))
+        glDrawArrays(GL_POINTS, 0, self.count)
+        glDisableVertexAttribArray(self.locations["a_lat_lon"])
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+        glDepthMask(GL_TRUE)
+        glDisable(GL_BLEND)
+        glDisable(GL_POINT_SPRITE)
+        glDisable(GL_VERTEX_PROGRAM_POINT_SIZE)
+        glUseProgram(0)
+
+    def cleanup(self) -> None:
+        try:
+            if self.buffer:
+                glDeleteBuffers(1, [self.buffer])
+            if self.program:
+                glDeleteProgram(self.program)
+        except Exception:
+            logging.exception("Failed to release globe markers.")
+        self.buffer = self.program = None
+        self.count = self.capacity = 0
+
+    def log_stats(self) -> None:
+        if self.growths or self.marker_count:
+            logging.info(
+                "Globe marker stats: markers=%d capacity=%d uploaded=%.1f MB growths=%d",
+                self.marker_count, self.capacity, self.bytes_uploaded / 1048576, self.growths,
+            )
@@ -0,0 +1,416 @@
+"""
+Globe rendering for EarthWidget.
+
+The sphere is tessellated once, with the same vertices and texture
+coordinates as `gluSphere(quadric, 1.0, 100, 100)`, into a vertex and an
+index buffer and drawn by a small GLSL 1.20 program. Per frame only the
+model-view-projection matrix (view and rotation, computed with numpy) is
+uploaded as a uniform, instead of re-tessellating and submitting ~20k
+vertices in immediate mode.
+
+Contexts without shaders or buffer objects (OpenGL < 2.0, e.g. some remote
+desktop software renderers) keep the immediate-mode gluSphere path.
+
+Until the Earth texture is ready the sphere is drawn in a flat placeholder
+colour; `upload_texture_levels` then takes the prepared mipmap chain from
+texture_cache as is.
+"""
+
+import math
+import ctypes
+import logging
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+from OpenGL.GL import *
+from OpenGL.GLU import *
+
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+SPHERE_SLICES = 100
+SPHERE_STACKS = 100
+
+FIELD_OF_VIEW = 45.0
+# Close enough for the nearest zoom with detail tiles (0.4 above the surface).
+NEAR_PLANE = 0.1
+FAR_PLANE = 100.0
+
+RENDER_MODE_SHADER = "shader"
+RENDER_MODE_FIXED = "fixed"
+
+# Untextured sphere while the Earth texture loads (dim ocean blue).
+PLACEHOLDER_COLOR = (0.10, 0.20, 0.35)
+
+# x, y, z, s, t
+VERTEX_FLOATS = 5
+VERTEX_STRIDE = VERTEX_FLOATS * 4
+
+GLOBE_VERTEX_SHADER = """
+#version 120
+attribute vec3 a_position;
+attribute vec2 a_texcoord;
+uniform mat4 u_mvp;
+varying vec2 v_texcoord;
+
+void main() {
+    v_texcoord = a_texcoord;
+    gl_Position = u_mvp * vec4(a_position, 1.0);
+}
+"""
+
+GLOBE_FRAGMENT_SHADER = """
+#version 120
+uniform sampler2D u_texture;
+uniform bool u_textured;
+uniform vec3 u_placeholder_color;
+varying vec2 v_texcoord;
+
+void main() {
+    gl_FragColor = u_textured ? texture2D(u_texture, v_texcoord) : vec4(u_placeholder_color, 1.0);
+}
+"""
+
+
+# =============================================================================
+# Mesh
+# =============================================================================
+
+def build_sphere_mesh(slices: int = SPHERE_SLICES, stacks: int = SPHERE_STACKS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (vertices, indices) of a unit sphere laid out like gluSphere: the
+    poles on the z axis, s = slice / slices, t = 1 at +z down to 0 at -z.
+    The seam column is duplicated so s runs to 1.0.
+    """
+    rho = np.arange(stacks + 1, dtype=np.float64) * (math.pi / stacks)
+    theta = np.arange(slices + 1, dtype=np.float64) * (2.0 * math.pi / slices)
+    theta[-1] = 0.0  # gluSphere closes the seam on the exact first column
+    sin_rho, sin_theta = np.sin(rho)[:, None], np.sin(theta)[None, :]
+
+    vertices = np.empty((stacks + 1, slices + 1, VERTEX_FLOATS), dtype=np.float32)
+    vertices[..., 0] = -sin_theta * sin_rho
+    vertices[..., 1] = np.cos(theta)[None, :] * sin_rho
+    vertices[..., 2] = np.cos(rho)[:, None]
+    vertices[..., 3] = (np.arange(slices + 1) / slices)[None, :]
+    vertices[..., 4] = (1.0 - np.arange(stacks + 1) / stacks)[:, None]
+
+    row = slices + 1
+    top = (np.arange(stacks)[:, None] * row + np.arange(slices)[None, :]).ravel()
+    bottom = top + row
+    indices = np.stack([top, bottom, top + 1, top + 1, bottom, bottom + 1], axis=1).ravel()
+    index_dtype = np.uint16 if vertices.shape[0] * row <= 0x10000 else np.uint32
+    return vertices.reshape(-1, VERTEX_FLOATS), indices.astype(index_dtype)
+
+
+# =============================================================================
+# Matrices (row-major, column vectors, as glRotatef / gluLookAt build them)
+# =============================================================================
+
+def perspective_matrix(fovy: float, aspect: float, near: float, far: float) -> np.ndarray:
+    f = 1.0 / math.tan(math.radians(fovy) / 2.0)
+    return np.array([
+        [f / aspect, 0.0, 0.0, 0.0],
+        [0.0, f, 0.0, 0.0],
+        [0.0, 0.0, (far + near) / (near - far), 2.0 * far * near / (near - far)],
+        [0.0, 0.0, -1.0, 0.0],
+    ])
+
+
+def look_at_matrix(eye: Tuple[float, float, float], center: Tuple[float, float, float],
+                   up: Tuple[float, float, float]) -> np.ndarray:
+    forward = np.subtract(center, eye, dtype=np.float64)
+    forward /= np.linalg.norm(forward)
+    side = np.cross(forward, up)
+    side /= np.linalg.norm(side)
+    up = np.cross(side, forward)
+
+    matrix = np.identity(4)
+    matrix[0, :3], matrix[1, :3], matrix[2, :3] = side, up, -forward
+    matrix[:3, 3] = -matrix[:3, :3] @ np.asarray(eye, dtype=np.float64)
+    return matrix
+
+
+def rotation_matrix(angle: float, x: float, y: float, z: float) -> np.ndarray:
+    """
+    glRotatef(angle, x, y, z) for a unit axis.
+    """
+    c, s = math.cos(math.radians(angle)), math.sin(math.radians(angle))
+    t = 1.0 - c
+    matrix = np.identity(4)
+    matrix[:3, :3] = [
+        [t * x * x + c, t * x * y - s * z, t * x * z + s * y],
+        [t * x * y + s * z, t * y * y + c, t * y * z - s * x],
+        [t * x * z - s * y, t * y * z + s * x, t * z * z + c],
+    ]
+    return matrix
+
+
+def globe_model_view(zoom_level: float, rotation: float, rotation_x: float, rotation_y: float,
+                     rotation_z: float) -> np.ndarray:
+    """
+    The camera and globe rotation EarthWidget applies before drawing.
+    """
+    return (
+        look_at_matrix((0.0, 0.0, zoom_level), (0.0, 0.0, 0.0), (0.0, 1.0, 0.0))
+        @ rotation_matrix(rotation, 0.0, 1.0, 0.0)
+        @ rotation_matrix(rotation_x, 1.0, 0.0, 0.0)
+        @ rotation_matrix(rotation_y, 0.0, 1.0, 0.0)
+        @ rotation_matrix(rotation_z, 0.0, 0.0, 1.0)
+    )
+
+
+# =============================================================================
+# Shaders
+# =============================================================================
+
+def _compile_shader(source: str, shader_type) -> int:
+    shader = glCreateShader(shader_type)
+    glShaderSource(shader, source)
+    glCompileShader(shader)
+    if not glGetShaderiv(shader, GL_COMPILE_STATUS):
+        log = glGetShaderInfoLog(shader)
+        glDeleteShader(shader)
+        raise RuntimeError(f"Shader compile failed: {log!r}")
+    return shader
+
+
+def link_program(vertex_source: str, fragment_source: str) -> int:
+    """
+    Compiles and links a vertex + fragment program; RuntimeError with the
+    driver log on failure.
+    """
+    shaders = [
+        _compile_shader(vertex_source, GL_VERTEX_SHADER),
+        _compile_shader(fragment_source, GL_FRAGMENT_SHADER),
+    ]
+    program = glCreateProgram()
+    for shader in shaders:
+        glAttachShader(program, shader)
+    glLinkProgram(program)
+    for shader in shaders:
+        glDetachShader(program, shader)
+        glDeleteShader(shader)
+
+    if not glGetProgramiv(program, GL_LINK_STATUS):
+        log = glGetProgramInfoLog(program)
+        glDeleteProgram(program)
+        raise RuntimeError(f"Shader link failed: {log!r}")
+    return program
+
+
+def has_shader_support() -> bool:
+    version = glGetString(GL_VERSION) or b""
+    try:
+        major = int(version.split(b".", 1)[0])
+    except ValueError:
+        return False
+    return major >= 2 and bool(glCreateShader)
+
+
+# =============================================================================
+# Texture
+# =============================================================================
+
+def upload_texture_levels(levels: Sequence[np.ndarray]) -> int:
+    """
+    Creates a mipmapped RGB texture from a complete chain of (height, width, 3)
+    uint8 levels, level 0 first, without glGenerateMipmap. Returns the
+    texture name, left bound.
+    """
+    texture = glGenTextures(1)
+    glBindTexture(GL_TEXTURE_2D, texture)
+    glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+    for number, level in enumerate(levels):
+        height, width = level.shape[:2]
+        glTexImage2D(GL_TEXTURE_2D, number, GL_RGB, width, height, 0, GL_RGB, GL_UNSIGNED_BYTE, level)
+
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAX_LEVEL, len(levels) - 1)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR_MIPMAP_LINEAR)
+    return texture
+
+
+# =============================================================================
+# Renderer
+# =============================================================================
+
+class GlobeRenderer:
+    """
+    Draws the textured globe in the current OpenGL context. `initialize`,
+    `resize`, `draw` and `cleanup` must be called with that context current
+    (EarthWidget's initializeGL / resizeGL / paintGL).
+    """
+
+    def __init__(self, prefer_shaders: bool = True, slices: int = SPHERE_SLICES, stacks: int = SPHERE_STACKS):
+        self.prefer_shaders = prefer_shaders
+        self.slices = slices
+        self.stacks = stacks
+
+        self.mode: Optional[str] = None
+        self.projection = perspective_matrix(FIELD_OF_VIEW, 1.0, NEAR_PLANE, FAR_PLANE)
+        self.viewport = (1, 1)
+
+        self.program = None
+        self.vertex_buffer = None
+        self.index_buffer = None
+        self.index_count = 0
+        self.index_type = GL_UNSIGNED_SHORT
+        self.vertex_array = None
+        self.locations = {}
+
+        self.quadric = None
+
+    def initialize(self) -> str:
+        """
+        Builds the buffers and program, falling back to gluSphere when the
+        context cannot run them. Returns the render mode.
+        """
+        if self.prefer_shaders and has_shader_support():
+            try:
+                self._initialize_shader_path()
+                self.mode = RENDER_MODE_SHADER
+            except Exception:
+                logging.exception("Shader globe renderer unavailable, using gluSphere.")
+                self._release_shader_path()
+
+        if self.mode is None:
+            self.quadric = gluNewQuadric()
+            gluQuadricTexture(self.quadric, GL_TRUE)
+            self.mode = RENDER_MODE_FIXED
+
+        logging.info("Globe renderer: %s (OpenGL %s)", self.mode, (glGetString(GL_VERSION) or b"?").decode())
+        return self.mode
+
+    def _initialize_shader_path(self) -> None:
+        self.program = link_program(GLOBE_VERTEX_SHADER, GLOBE_FRAGMENT_SHADER)
+        self.locations = {
+            "a_position": glGetAttribLocation(self.program, "a_position"),
+            "a_texcoord": glGetAttribLocation(self.program, "a_texcoord"),
+            "u_mvp": glGetUniformLocation(self.program, "u_mvp"),
+            "u_texture": glGetUniformLocation(self.program, "u_texture"),
+            "u_textured": glGetUniformLocation(self.program, "u_textured"),
+            "u_placeholder_color": glGetUniformLocation(self.program, "u_placeholder_color"),
+        }
+        glUseProgram(self.program)
+        glUniform1i(self.locations["u_texture"], 0)
+        glUniform3f(self.locations["u_placeholder_color"], *PLACEHOLDER_COLOR)
+        glUseProgram(0)
+
+        vertices, indices = build_sphere_mesh(self.slices, self.stacks)
+        self.vertex_buffer, self.index_buffer = glGenBuffers(2)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vertex_buffer)
+        glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.index_buffer)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, GL_STATIC_DRAW)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+        self.index_count = len(indices)
+        self.index_type = GL_UNSIGNED_SHORT if indices.dtype == np.uint16 else GL_UNSIGNED_INT
+
+        # A vertex array object (OpenGL 3.0+) records the bindings below once.
+        if bool(glGenVertexArrays):
+            self.vertex_array = glGenVertexArrays(1)
+            glBindVertexArray(self.vertex_array)
+            self._bind_vertex_attributes()
+            glBindVertexArray(0)
+            glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+            glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def _bind_vertex_attributes(self) -> None:
+        locations = self.locations
+        glBindBuffer(GL_ARRAY_BUFFER, self.vertex_buffer)
+        glEnableVertexAttribArray(locations["a_position"])
+        glVertexAttribPointer(locations["a_position"], 3, GL_FLOAT, GL_FALSE, VERTEX_STRIDE, ctypes.c_void_p(0))
+        glEnableVertexAttribArray(locations["a_texcoord"])
+        glVertexAttribPointer(locations["a_texcoord"], 2, GL_FLOAT, GL_FALSE, VERTEX_STRIDE, ctypes.c_void_p(12))
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.index_buffer)
+
+    def _unbind_vertex_attributes(self) -> None:
+        glDisableVertexAttribArray(self.locations["a_position"])
+        glDisableVertexAttribArray(self.locations["a_texcoord"])
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def resize(self, width: int, height: int) -> None:
+        aspect = width / height if height != 0 else 1
+        glViewport(0, 0, width, height)
+        self.viewport = (width, height)
+        self.projection = perspective_matrix(FIELD_OF_VIEW, aspect, NEAR_PLANE, FAR_PLANE)
+
+        if self.mode == RENDER_MODE_FIXED:
+            glMatrixMode(GL_PROJECTION)
+            glLoadIdentity()
+            gluPerspective(FIELD_OF_VIEW, aspect, NEAR_PLANE, FAR_PLANE)
+            glMatrixMode(GL_MODELVIEW)
+
+    def draw(self, model_view: np.ndarray, texture: Optional[int]) -> None:
+        # The camera is always outside the sphere, so its far half is hidden.
+        glEnable(GL_CULL_FACE)
+        if self.mode == RENDER_MODE_SHADER:
+            self._draw_shader(model_view, texture)
+        elif self.mode == RENDER_MODE_FIXED:
+            self._draw_fixed(model_view, texture)
+        glDisable(GL_CULL_FACE)
+
+    def _draw_shader(self, model_view: np.ndarray, texture: Optional[int]) -> None:
+        mvp = (self.projection @ model_view).astype(np.float32)
+
+        glUseProgram(self.program)
+        glUniformMatrix4fv(self.locations["u_mvp"], 1, GL_TRUE, mvp)
+        glUniform1i(self.locations["u_textured"], 1 if texture else 0)
+        if texture:
+            glBindTexture(GL_TEXTURE_2D, texture)
+
+        if self.vertex_array:
+            glBindVertexArray(self.vertex_array)
+            glDrawElements(GL_TRIANGLES, self.index_count, self.index_type, ctypes.c_void_p(0))
+            glBindVertexArray(0)
+        else:
+            self._bind_vertex_attributes()
+            glDrawElements(GL_TRIANGLES, self.index_count, self.index_type, ctypes.c_void_p(0))
+            self._unbind_vertex_attributes()
+        glUseProgram(0)
+
+    def _draw_fixed(self, model_view: np.ndarray, texture: Optional[int]) -> None:
+        glLoadMatrixf(model_view.T.astype(np.float32))
+        if texture:
+            glBindTexture(GL_TEXTURE_2D, texture)
+            glColor3f(1.0, 1.0, 1.0)
+            gluSphere(self.quadric, 1.0, self.slices, self.stacks)
+        else:
+            # Texturing off so the flat colour is not modulated by an empty texture.
+            glDisable(GL_TEXTURE_2D)
+            glColor3f(*PLACEHOLDER_COLOR)
+            gluSphere(self.quadric, 1.0, self.slices, self.stacks)
+            glColor3f(1.0, 1.0, 1.0)
+            glEnable(GL_TEXTURE_2D)
+
+    def _release_shader_path(self) -> None:
+        if self.vertex_array:
+            glDeleteVertexArrays(1, [self.vertex_array])
+            self.vertex_array = None
+        if self.program:
+            glDeleteProgram(self.program)
+            self.program = None
+        buffers = [buffer for buffer in (self.vertex_buffer, self.index_buffer) if buffer]
+        if buffers:
+            glDeleteBuffers(len(buffers), buffers)
+        self.vertex_buffer = self.index_buffer = None
+
+    def cleanup(self) -> None:
+        try:
+            self._release_shader_path()
+        except Exception:
+            logging.exception("Failed to release globe buffers.")
+        if self.quadric:
+            try:
+                gluDeleteQuadric(self.quadric)
+            except Exception:
+                logging.exception("Failed to delete OpenGL quadric.")
+            self.quadric = None
+        self.mode = None
@@ -0,0 +1,402 @@
+"""
+GPU side of the tiled Earth texture (see tile_pyramid).
+
+Detail tiles are drawn over the overview globe as sphere patches: one
+shared grid mesh whose positions the vertex shader computes from each
+tile's rectangle on the globe texture, so a tile costs one texture bind
+and one draw call. Tile textures are kept in an LRU under a fixed GPU
+memory budget. Missing tiles are read from the tile file on a worker
+thread (the `load_tile` callback) and uploaded a few per frame; until
+then the nearest resident coarser tile, or the overview texture, shows.
+
+Needs the shader renderer; with the gluSphere fallback the globe keeps
+its single texture.
+"""
+
+import ctypes
+import logging
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Set, Tuple
+
+import numpy as np
+from OpenGL.GL import *
+
+from globe_render import link_program
+from tile_pyramid import TileKey, TilePyramid, pixels_per_radian
+
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+TILE_PATCH_SEGMENTS = 16
+
+# Bounds the GUI-thread cost of streaming per painted frame.
+TILE_UPLOADS_PER_FRAME = 4
+MAX_TILE_REQUESTS = 8
+
+TILE_VERTEX_SHADER = """
+#version 120
+attribute vec2 a_patch;
+uniform mat4 u_mvp;
+uniform vec4 u_tile_rect;
+uniform vec2 u_tile_extent;
+varying vec2 v_texcoord;
+
+const float PI = 3.14159265358979;
+
+void main() {
+    vec2 st = mix(u_tile_rect.xy, u_tile_rect.zw, a_patch);
+    float theta = 2.0 * PI * st.x;
+    float rho = PI * (1.0 - st.y);
+    vec3 position = vec3(-sin(theta) * sin(rho), cos(theta) * sin(rho), cos(rho));
+    v_texcoord = a_patch * u_tile_extent;
+    gl_Position = u_mvp * vec4(position, 1.0);
+}
+"""
+
+TILE_FRAGMENT_SHADER = """
+#version 120
+uniform sampler2D u_texture;
+varying vec2 v_texcoord;
+
+void main() {
+    gl_FragColor = texture2D(u_texture, v_texcoord);
+}
+"""
+
+
+def build_patch_mesh(segments: int = TILE_PATCH_SEGMENTS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (vertices, indices) of a unit grid in tile coordinates, rows from the
+    tile's t1 edge down to t0 so triangles wind like the globe mesh.
+    """
+    steps = np.arange(segments + 1) / segments
+    vertices = np.empty((segments + 1, segments + 1, 2), dtype=np.float32)
+    vertices[..., 0] = steps[None, :]
+    vertices[..., 1] = (1.0 - steps)[:, None]
+
+    row = segments + 1
+    top = (np.arange(segments)[:, None] * row + np.arange(segments)[None, :]).ravel()
+    bottom = top + row
+    indices = np.stack([top, bottom, top + 1, top + 1, bottom, bottom + 1], axis=1).ravel()
+    return vertices.reshape(-1, 2), indices.astype(np.uint16)
+
+
+def tile_texture_bytes(tile_size: int) -> int:
+    # Drivers commonly store RGB as RGBA; the mipmaps add a third.
+    return tile_size * tile_size * 4 * 4 // 3
+
+
+# =============================================================================
+# GPU tile cache
+# =============================================================================
+
+class GpuTileCache:
+    """
+    Tile textures by key, least recently drawn first, within `budget_bytes`.
+    """
+
+    def __init__(self, budget_bytes: int, tile_bytes: int):
+        self.tile_bytes = tile_bytes
+        self.capacity = max(0, budget_bytes // tile_bytes)
+        self._textures: "OrderedDict[TileKey, int]" = OrderedDict()
+
+        self.uploads = 0
+        self.evictions = 0
+        self.peak_tiles = 0
+
+    def __contains__(self, key: TileKey) -> bool:
+        return key in self._textures
+
+    def __len__(self) -> int:
+        return len(self._textures)
+
+    @property
+    def bytes_used(self) -> int:
+        return len(self._textures) * self.tile_bytes
+
+    def get(self, key: TileKey) -> Optional[int]:
+        texture = self._textures.get(key)
+        if texture is not None:
+            self._textures.move_to_end(key)
+        return texture
+
+    def upload(self, key: TileKey, pixels: np.ndarray, keep: Set[TileKey]) -> bool:
+        """
+        Uploads a tile, evicting least recently drawn tiles outside `keep`;
+        False when the budget is taken by tiles in `keep`.
+        """
+        while len(self._textures) >= self.capacity:
+            victim = next((candidate for candidate in self._textures if candidate not in keep), None)
+            if victim is None:
+                return False
+            glDeleteTextures([self._textures.pop(victim)])
+            self.evictions += 1
+
+        texture = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, texture)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+        height, width = pixels.shape[:2]
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB, width, height, 0, GL_RGB, GL_UNSIGNED_BYTE, pixels)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR_MIPMAP_LINEAR)
+        glGenerateMipmap(GL_TEXTURE_2D)
+
+        self._textures[key] = texture
+        self.uploads += 1
+        self.peak_tiles = max(self.peak_tiles, len(self._textures))
+        return True
+
+    def clear(self) -> None:
+        if self._textures:
+            glDeleteTextures(list(self._textures.values()))
+        self._textures.clear()
+
+
+# =============================================================================
+# Tile layer
+# =============================================================================
+
+class GlobeTileLayer:
+    """
+    Streams and draws detail tiles. `initialize`, `draw` and `cleanup` need
+    the globe's OpenGL context current; the rest runs on the GUI thread.
+    """
+
+    def __init__(self, budget_bytes: int):
+        self.budget_bytes = budget_bytes
+        self.pyramid: Optional[TilePyramid] = None
+        self.load_tile: Optional[Callable[[TileKey], None]] = None
+        self.cache: Optional[GpuTileCache] = None
+
+        # Width of the overview texture under the tiles (0 = none yet).
+        self.overview_width = 0
+
+        self.requested: Set[TileKey] = set()
+        self.ready: Dict[TileKey, np.ndarray] = {}
+        self.failed: Set[TileKey] = set()
+        self.wanted: Set[TileKey] = set()
+        self.tiles_read = 0
+
+        self.program = None
+        self.vertex_buffer = None
+        self.index_buffer = None
+        self.index_count = 0
+        self.vertex_array = None
+        self.locations = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.program is not None
+
+    def initialize(self) -> bool:
+        """
+        Builds the tile program and patch mesh; call only with the shader
+        renderer. False when tiles are disabled or unsupported.
+        """
+        if self.budget_bytes <= 0:
+            return False
+        try:
+            self._initialize_gl()
+        except Exception:
+            logging.exception("Globe detail tiles unavailable.")
+            self._release_gl()
+            return False
+        return True
+
+    def _initialize_gl(self) -> None:
+        self.program = link_program(TILE_VERTEX_SHADER, TILE_FRAGMENT_SHADER)
+        self.locations = {
+            name: glGetUniformLocation(self.program, name)
+            for name in ("u_mvp", "u_tile_rect", "u_tile_extent", "u_texture")
+        }
+        self.locations["a_patch"] = glGetAttribLocation(self.program, "a_patch")
+        glUseProgram(self.program)
+        glUniform1i(self.locations["u_texture"], 0)
+        glUseProgram(0)
+
+        vertices, indices = build_patch_mesh()
+        self.vertex_buffer, self.index_buffer = glGenBuffers(2)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vertex_buffer)
+        glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.index_buffer)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, GL_STATIC_DRAW)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        self.index_count = len(indices)
+
+        if bool(glGenVertexArrays):
+            self.vertex_array = glGenVertexArrays(1)
+            glBindVertexArray(self.vertex_array)
+            self._bind_vertex_attributes()
+            glBindVertexArray(0)
+            glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+            glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def _bind_vertex_attributes(self) -> None:
+        glBindBuffer(GL_ARRAY_BUFFER, self.vertex_buffer)
+        glEnableVertexAttribArray(self.locations["a_patch"])
+        glVertexAttribPointer(self.locations["a_patch"], 2, GL_FLOAT, GL_FALSE, 8, ctypes.c_void_p(0))
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.index_buffer)
+
+    def _unbind_vertex_attributes(self) -> None:
+        glDisableVertexAttribArray(self.locations["a_patch"])
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    # -------------------------------------------------------------------------
+    # Streaming
+    # -------------------------------------------------------------------------
+
+    def set_pyramid(self, pyramid: TilePyramid, load_tile: Callable[[TileKey], None]) -> None:
+        if self.cache is not None:
+            self.cache.clear()
+        self.pyramid = pyramid
+        self.load_tile = load_tile
+        self.cache = GpuTileCache(self.budget_bytes, tile_texture_bytes(pyramid.tile_size))
+        self.requested.clear()
+        self.ready.clear()
+        self.failed.clear()
+
+    def on_tile_loaded(self, key: TileKey, pixels: Optional[np.ndarray]) -> None:
+        self.requested.discard(key)
+        if pixels is None:
+            self.failed.add(key)
+        elif key in self.wanted:
+            self.ready[key] = pixels
+            self.tiles_read += 1
+
+    def _request_missing(self, visible) -> None:
+        for key in visible:
+            if len(self.requested) >= MAX_TILE_REQUESTS:
+                break
+            if key in self.cache or key in self.requested or key in self.ready or key in self.failed:
+                continue
+            self.requested.add(key)
+            self.load_tile(key)
+
+    def _upload_ready(self, visible) -> None:
+        keep = set(visible)
+        uploaded = 0
+        for key in visible:
+            if uploaded >= TILE_UPLOADS_PER_FRAME:
+                break
+            pixels = self.ready.pop(key, None)
+            if pixels is None:
+                continue
+            if not self.cache.upload(key, pixels, keep):
+                break
+            uploaded += 1
+
+        for key in [key for key in self.ready if key not in self.wanted]:
+            del self.ready[key]
+
+    # -------------------------------------------------------------------------
+    # Drawing
+    # -------------------------------------------------------------------------
+
+    def draw(self, model_view: np.ndarray, projection: np.ndarray, viewport: Tuple[int, int],
+             field_of_view: float) -> bool:
+        """
+        Streams and draws the tiles the view needs over the already drawn
+        globe. Returns True while read tiles still wait for upload.
+        """
+        if not self.enabled or self.pyramid is None:
+            return False
+
+        camera = np.linalg.inv(model_view)[:3, 3]
+        density = pixels_per_radian(viewport[1], field_of_view, float(np.linalg.norm(camera)))
+        level = self.pyramid.select_level(density, self.overview_width)
+        if level is None:
+            self.wanted.clear()
+            self.ready.clear()
+            return False
+
+        mvp = projection @ model_view
+        visible = self.pyramid.visible_tiles(level, mvp, camera, viewport, density, self.overview_width)
+        # Nearest first; never more than the budget holds, or tiles would evict each other.
+        visible = visible[:self.cache.capacity]
+        self.wanted = set(visible)
+
+        self._upload_ready(visible)
+        self._request_missing(visible)
+
+        # Each visible tile, or its nearest resident ancestor, coarse to fine.
+        draws = set()
+        for key in visible:
+            tile = key
+            while tile is not None and tile not in self.cache:
+                tile = self.pyramid.parent(tile)
+            if tile is not None:
+                draws.add(tile)
+        if draws:
+            self._draw_tiles(sorted(draws), mvp)
+
+        return bool(self.ready)
+
+    def _draw_tiles(self, keys, mvp: np.ndarray) -> None:
+        glUseProgram(self.program)
+        glUniformMatrix4fv(self.locations["u_mvp"], 1, GL_TRUE, mvp.astype(np.float32))
+        if self.vertex_array:
+            glBindVertexArray(self.vertex_array)
+        else:
+            self._bind_vertex_attributes()
+
+        # Patches lie on the globe just drawn: paint over it in order (the
+        # sphere is convex, so culling alone hides the far side).
+        glEnable(GL_CULL_FACE)
+        glDisable(GL_DEPTH_TEST)
+        for key in keys:
+            rect, extent = self.pyramid.tile_rect(key)
+            glBindTexture(GL_TEXTURE_2D, self.cache.get(key))
+            glUniform4f(self.locations["u_tile_rect"], *rect)
+            glUniform2f(self.locations["u_tile_extent"], *extent)
+            glDrawElements(GL_TRIANGLES, self.index_count, GL_UNSIGNED_SHORT, ctypes.c_void_p(0))
+        glEnable(GL_DEPTH_TEST)
+        glDisable(GL_CULL_FACE)
+
+        if self.vertex_array:
+            glBindVertexArray(0)
+        else:
+            self._unbind_vertex_attributes()
+        glUseProgram(0)
+
+    # -------------------------------------------------------------------------
+    # Cleanup
+    # -------------------------------------------------------------------------
+
+    def _release_gl(self) -> None:
+        if self.cache is not None:
+            self.cache.clear()
+        if self.vertex_array:
+            glDeleteVertexArrays(1, [self.vertex_array])
+            self.vertex_array = None
+        if self.program:
+            glDeleteProgram(self.program)
+            self.program = None
+        buffers = [buffer for buffer in (self.vertex_buffer, self.index_buffer) if buffer]
+        if buffers:
+            glDeleteBuffers(len(buffers), buffers)
+        self.vertex_buffer = self.index_buffer = None
+
+    def cleanup(self) -> None:
+        try:
+            self._release_gl()
+        except Exception:
+            logging.exception("Failed to release globe tile textures.")
+        if self.pyramid is not None:
+            self.pyramid.close()
+            self.pyramid = None
+        self.ready.clear()
+
+    def log_stats(self) -> None:
+        if self.cache is None:
+            return
+        logging.info(
+            "Globe tile stats: read=%d uploads=%d evictions=%d resident=%d peak=%d (%.1f of %.1f MB)",
+            self.tiles_read, self.cache.uploads, self.cache.evictions, len(self.cache), self.cache.peak_tiles,
+            self.cache.peak_tiles * self.cache.tile_bytes / 1048576, self.budget_bytes / 1048576,
+        )
@@ -0,0 +1,227 @@
+"""
+Compiled IPv4 address classifier behind `classify_ip_address`.
+
+The special-purpose blocks that `ipaddress` reports through is_private /
+is_loopback / is_multicast / is_unspecified / is_reserved, plus the
+user-defined internal ranges ("internal_ip_ranges" in the settings file),
+are flattened once into sorted, disjoint segments that each carry their
+(status_code, message). Classifying an address is then a dotted-quad
+parse and one binary search instead of an `ipaddress` object and a walk
+over its properties; `classify_many` searches a whole batch with numpy.
+
+Segment answers are taken from `ipaddress` itself when the table is built,
+so the result codes and messages are the same as the per-address
+classification, for whichever Python version is running.
+"""
+
+import socket
+import logging
+import ipaddress
+from bisect import bisect_right
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from range_index import parse_ipv4_range
+
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+ClassifiedAddress = Tuple[Optional[str], str, Optional[str]]
+SegmentResult = Tuple[str, Optional[str]]
+
+INVALID_RESULT: ClassifiedAddress = (None, "INVALID", "Invalid IP address format.")
+NOT_IPV4_RESULT: ClassifiedAddress = (None, "UNSUPPORTED", "IPv4 only is currently supported.")
+INTERNAL_RESULT: SegmentResult = ("PRIVATE_IPV4", "Internal IPv4 addresses are not supported.")
+
+# IANA IPv4 special-purpose registry (RFC 6890 and updates). Only used as
+# segment boundaries; every segment is classified by `ipaddress`, so a
+# block listed here that `ipaddress` treats as public stays public.
+SPECIAL_PURPOSE_NETWORKS = (
+    "0.0.0.0/8",
+    "0.0.0.0/32",
+    "10.0.0.0/8",
+    "100.64.0.0/10",
+    "127.0.0.0/8",
+    "169.254.0.0/16",
+    "172.16.0.0/12",
+    "192.0.0.0/24",
+    "192.0.0.0/29",
+    "192.0.0.8/32",
+    "192.0.0.9/32",
+    "192.0.0.10/32",
+    "192.0.0.170/31",
+    "192.0.2.0/24",
+    "192.31.196.0/24",
+    "192.52.193.0/24",
+    "192.88.99.0/24",
+    "192.168.0.0/16",
+    "192.175.48.0/24",
+    "198.18.0.0/15",
+    "198.51.100.0/24",
+    "203.0.113.0/24",
+    "224.0.0.0/4",
+    "233.252.0.0/24",
+    "240.0.0.0/4",
+    "255.255.255.255/32",
+)
+
+
+# =============================================================================
+# Reference classification
+# =============================================================================
+
+def classify_ipv4_object(ip_obj: ipaddress.IPv4Address) -> SegmentResult:
+    """
+    (status_code, message) from the `ipaddress` properties.
+    """
+    if ip_obj.is_private:
+        return "PRIVATE_IPV4", "Private IPv4 addresses are not supported."
+    if ip_obj.is_loopback:
+        return "UNSUPPORTED", "Loopback IPv4 addresses are not supported."
+    if ip_obj.is_multicast:
+        return "UNSUPPORTED", "Multicast IPv4 addresses are not supported."
+    if ip_obj.is_unspecified:
+        return "UNSUPPORTED", "Unspecified IPv4 addresses are not supported."
+    if ip_obj.is_reserved:
+        return "UNSUPPORTED", "Reserved IPv4 addresses are not supported."
+    return "PUBLIC_IPV4", None
+
+
+def _ipaddress_networks() -> List[ipaddress.IPv4Network]:
+    # The networks behind the `ipaddress` properties, so that a Python
+    # release adding a block does not straddle a segment. Private API,
+    # hence the SPECIAL_PURPOSE_NETWORKS superset above.
+    networks = []
+    for value in vars(getattr(ipaddress, "_IPv4Constants", object)).values():
+        for network in value if isinstance(value, (list, tuple)) else (value,):
+            if isinstance(network, ipaddress.IPv4Network):
+                networks.append(network)
+            elif isinstance(network, ipaddress.IPv4Address):
+                networks.append(ipaddress.IPv4Network(network))
+    return networks
+
+
+# =============================================================================
+# Internal ranges
+# =============================================================================
+
+def parse_internal_ranges(entries: Iterable[str]) -> List[Tuple[int, int]]:
+    """
+    (start, end) for every "a.b.c.d", "a.b.c.d/nn" or "a.b.c.d-e.f.g.h"
+    entry; invalid entries are logged and skipped.
+    """
+    ranges = []
+    for entry in entries:
+        parsed = parse_ipv4_range(str(entry).strip())
+        if parsed is None:
+            logging.warning("Ignoring invalid internal IP range: %r", entry)
+            continue
+        ranges.append(parsed)
+    return ranges
+
+
+# =============================================================================
+# Classifier
+# =============================================================================
+
+class IpClassifier:
+    """
+    Sorted segment table over the IPv4 space; `results[segment]` is the
+    (status_code, message) of every address in the segment.
+    """
+
+    def __init__(self, internal_ranges: Sequence[Tuple[int, int]] = ()):
+        internal = sorted(internal_ranges)
+
+        boundaries = {0}
+        networks = [ipaddress.IPv4Network(text) for text in SPECIAL_PURPOSE_NETWORKS] + _ipaddress_networks()
+        for start, end in [(int(net.network_address), int(net.broadcast_address)) for net in networks] + internal:
+            boundaries.add(start)
+            if end < 0xFFFFFFFF:
+                boundaries.add(end + 1)
+
+        starts: List[int] = []
+        results: List[SegmentResult] = []
+        for start in sorted(boundaries):
+            if self._is_internal(internal, start):
+                result = INTERNAL_RESULT
+            else:
+                result = classify_ipv4_object(ipaddress.IPv4Address(start))
+            if not results or results[-1] != result:
+                starts.append(start)
+                results.append(result)
+
+        self.starts = np.asarray(starts, dtype=np.uint32)
+        self.results = results
+        self.internal_range_count = len(internal)
+        self._start_list = starts
+
+    @staticmethod
+    def _is_internal(internal: List[Tuple[int, int]], ip_num: int) -> bool:
+        return any(start <= ip_num <= end for start, end in internal)
+
+    def __len__(self) -> int:
+        return len(self._start_list)
+
+    def _classify_fallback(self, ip_text: str) -> ClassifiedAddress:
+        # Anything that is not a canonical dotted quad: IPv6, invalid input.
+        try:
+            ip_obj = ipaddress.ip_address(ip_text)
+        except ValueError:
+            return INVALID_RESULT
+        if ip_obj.version != 4:
+            return NOT_IPV4_RESULT
+        return (str(ip_obj),) + self.results[bisect_right(self._start_list, int(ip_obj)) - 1]
+
+    @staticmethod
+    def _pack(ip_text: str) -> Optional[bytes]:
+        try:
+            packed = socket.inet_pton(socket.AF_INET, ip_text)
+        except (OSError, ValueError):
+            return None
+        # Some platforms accept leading zeros, which `ipaddress` rejects.
+        if (ip_text[0] == "0" or ".0" in ip_text) and socket.inet_ntop(socket.AF_INET, packed) != ip_text:
+            return None
+        return packed
+
+    def classify(self, ip_text: str) -> ClassifiedAddress:
+        """
+        (normalized_ip, status_code, message), as `classify_ip_address`.
+        """
+        ip_text = ip_text.strip()
+        packed = self._pack(ip_text) if ip_text else None
+        if packed is None:
+            return self._classify_fallback(ip_text)
+        return (ip_text,) + self.results[bisect_right(self._start_list, int.from_bytes(packed, "big")) - 1]
+
+    def classify_many(self, ip_texts: Iterable[str]) -> List[ClassifiedAddress]:
+        """
+        `classify` for every input, in order, with one vectorized search.
+        """
+        texts = [ip_text.strip() for ip_text in ip_texts]
+        classified: List[Optional[ClassifiedAddress]] = [None] * len(texts)
+
+        packed_addrs = []
+        positions = []
+        inet_pton, af_inet = socket.inet_pton, socket.AF_INET
+        for position, ip_text in enumerate(texts):
+            try:
+                packed = inet_pton(af_inet, ip_text)
+            except (OSError, ValueError):
+                packed = None
+            if packed is None or ((ip_text[0] == "0" or ".0" in ip_text) and self._pack(ip_text) is None):
+                classified[position] = self._classify_fallback(ip_text)
+            else:
+                packed_addrs.append(packed)
+                positions.append(position)
+
+        if positions:
+            ip_nums = np.frombuffer(b"".join(packed_addrs), dtype=">u4").astype(np.uint32)
+            segments = np.searchsorted(self.starts, ip_nums, side="right") - 1
+            results = self.results
+            for position, segment in zip(positions, segments.tolist()):
+                classified[position] = (texts[position],) + results[segment]
+        return classified
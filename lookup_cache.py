@@ -0,0 +1,143 @@
+"""
+Bounded LRU + TTL cache with hit/miss/eviction counters, and a caching
+wrapper around GeoIP readers. Shared by the GUI and the batch mode.
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+_MISSING = object()
+
+
+# =============================================================================
+# LRU / TTL cache
+# =============================================================================
+
+class LruTtlCache:
+    """
+    Thread-safe LRU cache. `max_size` <= 0 disables caching; `ttl_seconds`
+    <= 0 keeps entries until they are evicted.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float = 0, name: str = "cache"):
+        self.max_size = max(0, int(max_size))
+        self.ttl_seconds = max(0.0, float(ttl_seconds or 0))
+        self.name = name
+
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        value = self._lookup(key)
+        return default if value is _MISSING else value
+
+    def _lookup(self, key: Hashable) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return _MISSING
+
+            value, expires_at = entry
+            if expires_at and expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return _MISSING
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.max_size <= 0:
+            return
+
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else 0.0
+
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Returns the cached value, or calls `loader()` and caches its result
+        (None results are cached too, so repeated unknown IPs stay cheap).
+        """
+        value = self._lookup(key)
+        if value is _MISSING:
+            value = loader()
+            self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "name": self.name,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": (self.hits / requests) if requests else 0.0,
+            }
+
+    def log_stats(self) -> None:
+        stats = self.stats()
+        logging.info(
+            "%s stats: size=%d/%d hits=%d misses=%d evictions=%d expirations=%d hit_rate=%.1f%%",
+            stats["name"],
+            stats["size"],
+            stats["max_size"],
+            stats["hits"],
+            stats["misses"],
+            stats["evictions"],
+            stats["expirations"],
+            stats["hit_rate"] * 100,
+        )
+
+
+# =============================================================================
+# GeoIP reader wrapper
+# =============================================================================
+
+class CachedGeoIPReader:
+    """
+    Wraps any reader with `record_by_name` (pygeoip.GeoIP, compiled index)
+    and memoizes its records per address. Cached records are shared, so
+    callers must treat them as read-only.
+    """
+
+    def __init__(self, reader, cache: LruTtlCache):
+        self.reader = reader
+        self.cache = cache
+
+    def record_by_name(self, ip_addr: str) -> Optional[dict]:
+        return self.cache.get_or_load(ip_addr, lambda: self.reader.record_by_name(ip_addr))
+
+    def stats(self) -> dict:
+        return self.cache.stats()
@@ -1,18 +1,45 @@
 import os
 import sys
+import multiprocessing
+
+if __name__ == "__main__":
+    # Frozen batch worker processes re-enter here and must not start the GUI.
+    multiprocessing.freeze_support()
+
+    # Headless subcommands: dispatch before PyQt5/OpenGL are imported so
+    # they also start on display-less servers.
+    if sys.argv[1:2] == ["batch"]:
+        from batch_cli import main as batch_main
+        sys.exit(batch_main(sys.argv[2:]))
+
+    if sys.argv[1:2] == ["compile-geodb"]:
+        from geoip_index import main as compile_geodb_main
+        sys.exit(compile_geodb_main(sys.argv[2:]))
+
+    if sys.argv[1:2] == ["import-asn"]:
+        from asn_index import main as import_asn_main
+        sys.exit(import_asn_main(sys.argv[2:]))
+
+    if sys.argv[1:2] == ["import-rir"]:
+        from rir_index import main as import_rir_main
+        sys.exit(import_rir_main(sys.argv[2:]))
+
+    if sys.argv[1:2] == ["compile-blocklists"]:
+        from blocklist_index import main as compile_blocklists_main
+        sys.exit(compile_blocklists_main(sys.argv[2:]))
+
+import re
 import json
+import asyncio
 import ctypes
-import pygeoip
+import argparse
 import tempfile
 import webbrowser
-import ipaddress
 import subprocess
 import logging
 import shutil
-from dataclasses import dataclass
-from datetime import datetime, timezone
-from typing import Optional, Tuple
-from urllib.request import Request, urlopen
+import concurrent.futures
+from typing import Callable, Dict, List, Optional, Set, Tuple
 from urllib.error import HTTPError, URLError
 
 try:
@@ -25,30 +52,99 @@ from PyQt5.QtWidgets import (
     QLabel, QLineEdit, QPushButton, QMessageBox, QHBoxLayout, QDialog,
     QFileDialog
 )
-from PyQt5.QtCore import Qt, QTimer, QPoint, QThread, pyqtSignal
+from PyQt5.QtCore import Qt, QTimer, QPoint, QObject, pyqtSignal
 from PyQt5.QtGui import QIcon
 from OpenGL.GL import *
 from OpenGL.GLU import *
-from PIL import Image
-from ipwhois import IPWhois
+
+from app_core import (
+    SOFTWARE_VERSION,
+    GEODB_VERSION,
+    AppConfig,
+    resource_path,
+    get_geo_db_file_path,
+    get_legacy_vt_api_key_file_path,
+    load_app_settings,
+    save_app_settings,
+    setup_logging,
+    ensure_geodb_exists_or_exit,
+    classify_ip_address,
+    GEODB_READER_MODES,
+    resolve_geodb_cache_mode,
+    open_geoip_reader,
+    load_geoip_cache_settings,
+    load_vt_cache_ttl,
+    load_rdap_fallback_enabled,
+    load_vt_lookup_policy,
+    load_globe_frame_rates,
+)
+from lookup_cache import LruTtlCache, CachedGeoIPReader
+from vt_cache import open_vt_result_cache
+from globe_render import FIELD_OF_VIEW, RENDER_MODE_SHADER, GlobeRenderer, globe_model_view, upload_texture_levels
+from batch_cli import read_batch_coordinates
+from globe_markers import GlobeMarkerLayer
+from globe_tiles import GlobeTileLayer
+from render_scheduler import RenderScheduler
+from texture_cache import TextureLevels, load_or_build_texture_cache
+from tile_pyramid import (
+    OVERVIEW_MAX_WIDTH,
+    get_detail_texture_path,
+    load_or_build_tile_pyramid,
+    load_tile_memory_budget,
+)
+from rdap_cache import open_rdap_prefix_cache
+from asn_index import open_asn_index
+from rir_index import open_rir_index
+from blocklist_index import load_or_compile_blocklists
+from vt_client import get_validation_response, log_request_stats, set_vt_api_keys
+from service_health import (
+    SERVICE_DISPLAY_NAMES,
+    STATE_CLOSED,
+    add_health_listener,
+    log_health_stats,
+)
+from enrichment import (
+    SERVICE_BACKGROUND,
+    SERVICE_GEOIP,
+    SERVICE_RDAP,
+    SERVICE_VT,
+    get_enrichment_engine,
+    lookup_geoip,
+    lookup_rdap,
+    lookup_vt_owner,
+    lookup_vt_status,
+)
 
 
 # =============================================================================
 # Constants
 # =============================================================================
 
-SOFTWARE_VERSION = "v0.3.4"
-GEODB_VERSION = "v0.0.1"
-
 APP_USER_MODEL_ID = "aoi.geoipaddrtracker.v033"
 
-VT_API_BASE_URL = "https://www.virustotal.com/api/v3"
 VT_API_VALIDATION_TARGET_IP = "8.8.8.8"
 
+# VirusTotal key setup runs after the window is shown.
+VT_KEYS_PENDING = "pending"
+VT_KEYS_READY = "ready"
+VT_KEYS_MISSING = "missing"
+
+# Globe auto-rotation, independent of the frame rate (0.2 degrees per 20 ms frame).
+GLOBE_ROTATION_DEGREES_PER_SECOND = 10.0
+
+EARTH_TEXTURE_PATH = "resource/earth_texture.jpg"
+
+# Nearest camera distance (as zoom_level); detail tiles allow a closer look.
+GLOBE_NEAREST_ZOOM = -2.2
+GLOBE_NEAREST_ZOOM_WITH_TILES = -1.4
+GLOBE_FARTHEST_ZOOM = -8.0
+
+# Rows of a batch result file read per worker call when loading markers.
+MARKER_LOAD_CHUNK_SIZE = 65536
+
 KEYRING_SERVICE_NAME = "GeoIpAddrTracker"
 KEYRING_USERNAME = "virustotal_api_key"
-
-APP_SETTINGS_FILE_NAME = "geo_ip_tracker_settings.json"
+KEYRING_POOL_USERNAME = "virustotal_api_key_pool"  # JSON list of additional keys
 
 GOOGLE_EARTH_DEFAULT_PATHS = [
     r"C:\Program Files\Google\Google Earth Pro\client\googleearth.exe",
@@ -72,165 +168,72 @@ CURRENCY_MAP = {
 
 
 # =============================================================================
-# App Config / Path helpers
+# Secure API key storage
 # =============================================================================
 
-@dataclass(frozen=True)
-class AppConfig:
-    vt_api_key: str
-    geo_db_path: str
-    kml_file_path: str
-    software_version: str
-    geodb_version: str
-
-
-def get_app_dir() -> str:
-    if getattr(sys, "frozen", False):
-        return os.path.dirname(sys.executable)
-    return os.path.dirname(os.path.abspath(__file__))
-
-
-def resource_path(file_path: str) -> str:
-    if hasattr(sys, "_MEIPASS"):
-        return os.path.join(sys._MEIPASS, file_path)
-    return os.path.join(os.path.abspath("."), file_path)
-
-
-def get_geo_db_file_path() -> str:
-    return resource_path("resource/GeoLiteCity.dat")
-
-
-def get_legacy_vt_api_key_file_path() -> str:
-    return os.path.join(get_app_dir(), "user_vt_api.key")
-
-
-def get_app_settings_file_path() -> str:
-    return os.path.join(get_app_dir(), APP_SETTINGS_FILE_NAME)
-
-
-def load_app_settings() -> dict:
-    settings_path = get_app_settings_file_path()
-
-    if not os.path.exists(settings_path):
-        return {}
+def load_vt_api_key_from_secure_store() -> str:
+    if keyring is None:
+        return ""
 
     try:
-        with open(settings_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
-        if isinstance(data, dict):
-            return data
-
+        return keyring.get_password(KEYRING_SERVICE_NAME, KEYRING_USERNAME) or ""
     except Exception:
-        logging.exception("Failed to load app settings file.")
-
-    return {}
+        logging.exception("Failed to load VirusTotal API key from keyring.")
+        return ""
 
 
-def save_app_settings(settings: dict) -> bool:
-    settings_path = get_app_settings_file_path()
+def save_vt_api_key_to_secure_store(api_key: str) -> bool:
+    if keyring is None:
+        return False
 
     try:
-        with open(settings_path, "w", encoding="utf-8") as f:
-            json.dump(settings, f, indent=4, ensure_ascii=False)
+        keyring.set_password(KEYRING_SERVICE_NAME, KEYRING_USERNAME, api_key)
         return True
-
     except Exception:
-        logging.exception("Failed to save app settings file.")
+        logging.exception("Failed to save VirusTotal API key to keyring.")
         return False
 
 
-def setup_logging() -> None:
-    try:
-        log_path = os.path.join(get_app_dir(), "geo_ip_tracker.log")
-        logging.basicConfig(
-            filename=log_path,
-            level=logging.INFO,
-            format="%(asctime)s [%(levelname)s] %(message)s",
-            encoding="utf-8",
-        )
-    except Exception:
-        logging.basicConfig(level=logging.INFO)
-
-
-def ensure_geodb_exists_or_exit(geo_db_path: str) -> None:
-    if not os.path.isfile(geo_db_path):
-        logging.error("GeoDB file not found: %s", geo_db_path)
-        sys.exit(1)
-
-
-# =============================================================================
-# Validation / Secure API key storage
-# =============================================================================
-
-def classify_ip_address(ip_text: str) -> Tuple[Optional[str], str, Optional[str]]:
+def parse_vt_api_keys(text: str) -> List[str]:
     """
-    Classify user input as public/private/unsupported IPv4.
-
-    Returns:
-        (normalized_ip, status_code, message)
-
-    status_code values:
-        - PUBLIC_IPV4
-        - PRIVATE_IPV4
-        - INVALID
-        - UNSUPPORTED
+    Splits comma / whitespace separated keys, dropping duplicates.
     """
-    try:
-        ip_obj = ipaddress.ip_address(ip_text.strip())
+    keys = []
+    for api_key in re.split(r"[\s,;]+", text or ""):
+        if api_key and api_key not in keys:
+            keys.append(api_key)
+    return keys
 
-        if ip_obj.version != 4:
-            return None, "UNSUPPORTED", "IPv4 only is currently supported."
 
-        normalized_ip = str(ip_obj)
-
-        if ip_obj.is_private:
-            return normalized_ip, "PRIVATE_IPV4", "Private IPv4 addresses are not supported."
-        if ip_obj.is_loopback:
-            return normalized_ip, "UNSUPPORTED", "Loopback IPv4 addresses are not supported."
-        if ip_obj.is_multicast:
-            return normalized_ip, "UNSUPPORTED", "Multicast IPv4 addresses are not supported."
-        if ip_obj.is_unspecified:
-            return normalized_ip, "UNSUPPORTED", "Unspecified IPv4 addresses are not supported."
-        if ip_obj.is_reserved:
-            return normalized_ip, "UNSUPPORTED", "Reserved IPv4 addresses are not supported."
-
-        return normalized_ip, "PUBLIC_IPV4", None
-
-    except ValueError:
-        return None, "INVALID", "Invalid IP address format."
-
-
-def parse_ip_address(ip_text: str) -> Tuple[Optional[str], Optional[str]]:
+def load_vt_api_keys_from_secure_store() -> List[str]:
     """
-    Backward-compatible public IPv4 validator.
+    Returns the key pool: the primary key first, then any additional keys.
     """
-    ip_addr, status_code, message = classify_ip_address(ip_text)
-    if status_code == "PUBLIC_IPV4":
-        return ip_addr, None
-    return None, message
+    api_keys = parse_vt_api_keys(load_vt_api_key_from_secure_store())
 
-
-def load_vt_api_key_from_secure_store() -> str:
-    if keyring is None:
-        return ""
+    if keyring is None or not api_keys:
+        return api_keys
 
     try:
-        return keyring.get_password(KEYRING_SERVICE_NAME, KEYRING_USERNAME) or ""
+        pool_json = keyring.get_password(KEYRING_SERVICE_NAME, KEYRING_POOL_USERNAME)
+        for api_key in json.loads(pool_json) if pool_json else []:
+            if isinstance(api_key, str) and api_key and api_key not in api_keys:
+                api_keys.append(api_key)
     except Exception:
-        logging.exception("Failed to load VirusTotal API key from keyring.")
-        return ""
+        logging.exception("Failed to load VirusTotal API key pool from keyring.")
 
+    return api_keys
 
-def save_vt_api_key_to_secure_store(api_key: str) -> bool:
-    if keyring is None:
+
+def save_vt_api_keys_to_secure_store(api_keys: List[str]) -> bool:
+    if not api_keys or not save_vt_api_key_to_secure_store(api_keys[0]):
         return False
 
     try:
-        keyring.set_password(KEYRING_SERVICE_NAME, KEYRING_USERNAME, api_key)
+        keyring.set_password(KEYRING_SERVICE_NAME, KEYRING_POOL_USERNAME, json.dumps(api_keys[1:]))
         return True
     except Exception:
-        logging.exception("Failed to save VirusTotal API key to keyring.")
+        logging.exception("Failed to save VirusTotal API key pool to keyring.")
         return False
 
 
@@ -264,21 +267,27 @@ def migrate_legacy_api_key_to_keyring() -> str:
     return ""
 
 
-def validate_vt_api_key(
+def load_stored_vt_api_keys() -> List[str]:
+    """
+    Blocking (keyring backends may wait on D-Bus): run it off the GUI thread.
+    """
+    api_keys = load_vt_api_keys_from_secure_store()
+    if api_keys:
+        return api_keys
+
+    api_key = migrate_legacy_api_key_to_keyring()
+    return [api_key] if api_key else []
+
+
+async def validate_vt_api_key(
     api_key: str,
     test_ip: str = VT_API_VALIDATION_TARGET_IP,
 ) -> Tuple[bool, str]:
-    url = f"{VT_API_BASE_URL}/ip_addresses/{test_ip}"
-    req = Request(url, headers={
-        "x-apikey": api_key,
-        "accept": "application/json",
-    })
-
     try:
-        with urlopen(req, timeout=10) as resp:
-            if resp.status == 200:
-                return True, "Valid API key"
-            return False, f"Unexpected response: HTTP {resp.status}"
+        resp = await get_validation_response(test_ip, api_key)
+        if resp.status == 200:
+            return True, "Valid API key"
+        return False, f"Unexpected response: HTTP {resp.status}"
 
     except HTTPError as e:
         if e.code == 401:
@@ -297,6 +306,97 @@ def validate_vt_api_key(
         return False, f"VirusTotal API check failed.\n\n{e}"
 
 
+async def load_vt_api_keys_in_background(engine, emit: Callable[[dict], None]) -> None:
+    emit({"api_keys": await engine.run_background(load_stored_vt_api_keys)})
+
+
+async def load_blocklists_in_background(engine, emit: Callable[[dict], None]) -> None:
+    """
+    Opens (compiling first if lists changed) the local blocklist index.
+    """
+    try:
+        matcher = await engine.run_background(load_or_compile_blocklists)
+    except Exception:
+        logging.exception("Failed to load local blocklists.")
+        matcher = None
+    emit({"blocklists": matcher})
+
+
+async def load_earth_texture_in_background(engine, emit: Callable[[dict], None]) -> None:
+    """
+    Maps the cached mipmap chain of the Earth texture (decoding and caching
+    the JPEG first if needed).
+    """
+    try:
+        texture = await engine.run_background(load_or_build_texture_cache, resource_path(EARTH_TEXTURE_PATH))
+    except Exception:
+        logging.exception("Failed to load earth texture.")
+        texture = None
+    emit({"texture": texture})
+
+
+async def load_tile_pyramid_in_background(engine, emit: Callable[[dict], None]) -> None:
+    """
+    Maps the detail tile pyramid (building it first if the image changed).
+    """
+    try:
+        detail_path = get_detail_texture_path(resource_path(EARTH_TEXTURE_PATH))
+        pyramid = await engine.run_background(load_or_build_tile_pyramid, detail_path)
+    except Exception:
+        logging.exception("Failed to load globe detail tiles.")
+        pyramid = None
+    emit({"tile_pyramid": pyramid})
+
+
+async def read_tile_in_background(engine, pyramid, key, emit: Callable[[dict], None]) -> None:
+    try:
+        pixels = await engine.run_background(pyramid.read_tile, key)
+    except Exception:
+        logging.exception("Failed to read globe tile %s.", key)
+        pixels = None
+    emit({"tile": key, "pixels": pixels})
+
+
+async def load_markers_in_background(engine, path: str, emit: Callable[[dict], None]) -> None:
+    """
+    Streams the coordinates of a batch result file to the globe, one chunk
+    per emit, so markers appear while the rest is still being read.
+    """
+    total = 0
+    try:
+        chunks = read_batch_coordinates(path, MARKER_LOAD_CHUNK_SIZE)
+        while True:
+            coordinates = await engine.run_background(next, chunks, None)
+            if coordinates is None:
+                break
+            total += len(coordinates)
+            emit({"markers": coordinates})
+    except Exception:
+        logging.exception("Failed to read markers from %s.", path)
+    logging.info("Loaded %d globe markers from %s.", total, path)
+
+
+async def validate_and_save_vt_api_keys(engine, api_keys: List[str], emit: Callable[[dict], None]) -> None:
+    """
+    Validates every key concurrently, then stores the valid ones.
+    """
+    results = await asyncio.gather(*(validate_vt_api_key(api_key) for api_key in api_keys))
+
+    valid_keys = []
+    failures = []
+    for index, (api_key, (is_valid, validation_message)) in enumerate(zip(api_keys, results), start=1):
+        if is_valid:
+            valid_keys.append(api_key)
+        else:
+            failures.append(f"Key {index}: {validation_message}")
+
+    saved = False
+    if valid_keys:
+        saved = await engine.run_blocking(save_vt_api_keys_to_secure_store, valid_keys)
+
+    emit({"valid_keys": valid_keys, "failures": failures, "saved": saved})
+
+
 # =============================================================================
 # Dialog
 # =============================================================================
@@ -369,11 +469,11 @@ class VtApiKeyDialog(QDialog):
         root_layout.setContentsMargins(18, 18, 18, 18)
         root_layout.setSpacing(12)
 
-        self.label = QLabel("Enter your VirusTotal API key:", self)
+        self.label = QLabel("Enter your VirusTotal API key(s), comma-separated:", self)
 
         self.api_key_input = QLineEdit(self)
         self.api_key_input.setEchoMode(QLineEdit.Password)
-        self.api_key_input.setPlaceholderText("VirusTotal API Key")
+        self.api_key_input.setPlaceholderText("VirusTotal API Key[, Key 2, ...]")
 
         self.cancel_button = QPushButton("Cancel", self)
         self.ok_button = QPushButton("OK", self)
@@ -392,358 +492,32 @@ class VtApiKeyDialog(QDialog):
         root_layout.addWidget(self.api_key_input)
         root_layout.addLayout(button_layout)
 
-    def get_api_key(self) -> str:
-        return self.api_key_input.text().strip()
-
-
-def load_or_prompt_vt_api_key(parent=None) -> str:
-    api_key = load_vt_api_key_from_secure_store()
-    if api_key:
-        return api_key
-
-    api_key = migrate_legacy_api_key_to_keyring()
-    if api_key:
-        return api_key
-
-    if keyring is None:
-        QMessageBox.warning(
-            parent,
-            "Keyring Module Missing",
-            "The 'keyring' module is not installed.\n\n"
-            "VirusTotal API key will not be saved in plaintext.\n"
-            "Install it with: pip install keyring"
-        )
-
-    while True:
-        dialog = VtApiKeyDialog(parent)
-
-        if dialog.exec_() != QDialog.Accepted:
-            QMessageBox.warning(
-                parent,
-                "VirusTotal API Key",
-                "VirusTotal API key was not entered. VirusTotal lookup will be disabled.",
-            )
-            return ""
-
-        api_key = dialog.get_api_key()
-
-        if not api_key:
-            QMessageBox.warning(parent, "VirusTotal API Key", "API key cannot be empty.")
-            continue
-
-        is_valid, validation_message = validate_vt_api_key(api_key)
-
-        if not is_valid:
-            QMessageBox.warning(
-                parent,
-                "VirusTotal API Key Validation Failed",
-                validation_message,
-            )
-            continue
-
-        if save_vt_api_key_to_secure_store(api_key):
-            QMessageBox.information(
-                parent,
-                "VirusTotal API Key",
-                "VirusTotal API key has been validated and saved securely.",
-            )
-        else:
-            QMessageBox.warning(
-                parent,
-                "VirusTotal API Key",
-                "VirusTotal API key has been validated, but it could not be saved securely.\n"
-                "It will be used for this session only.",
-            )
-
-        return api_key
+    def get_api_keys(self) -> List[str]:
+        return parse_vt_api_keys(self.api_key_input.text())
 
 
 # =============================================================================
-# Workers
+# Enrichment bridge
 # =============================================================================
 
-class VirusTotalWorker(QThread):
-    result_ready = pyqtSignal(dict)
-
-    def __init__(self, ip_addr: str, vt_api_key: str, request_id: int, parent=None):
-        super().__init__(parent)
-        self.ip_addr = ip_addr
-        self.vt_api_key = vt_api_key
-        self.request_id = request_id
-
-    def _emit_result(self, payload: dict) -> None:
-        payload["request_id"] = self.request_id
-        payload["ip_addr"] = self.ip_addr
-        self.result_ready.emit(payload)
-
-    @staticmethod
-    def _format_vt_date(ts) -> str:
-        if not ts:
-            return "No data"
-        try:
-            return datetime.fromtimestamp(int(ts), timezone.utc).strftime("%Y.%m.%d")
-        except Exception:
-            return "No data"
-
-    def run(self) -> None:
-        if not self.vt_api_key or self.vt_api_key == "YOUR_VIRUSTOTAL_API_KEY":
-            self._emit_result({
-                "status_text": "No API key",
-                "detect_name": "No data",
-                "recent_activity": "No data",
-            })
-            return
-
-        url = f"{VT_API_BASE_URL}/ip_addresses/{self.ip_addr}"
-        req = Request(url, headers={
-            "x-apikey": self.vt_api_key,
-            "accept": "application/json",
-        })
-
-        try:
-            with urlopen(req, timeout=10) as resp:
-                data = json.loads(resp.read().decode("utf-8"))
-
-        except HTTPError as e:
-            self._emit_result(self._format_http_error(e))
-            return
-
-        except URLError:
-            self._emit_result({
-                "status_text": "Network error",
-                "detect_name": "No data",
-                "recent_activity": "No data",
-            })
-            return
-
-        except Exception:
-            logging.exception("VirusTotal lookup failed.")
-            self._emit_result({
-                "status_text": "Lookup failed",
-                "detect_name": "No data",
-                "recent_activity": "No data",
-            })
-            return
-
-        self._emit_result(self._parse_vt_response(data))
-
-    @staticmethod
-    def _format_http_error(error: HTTPError) -> dict:
-        if error.code == 401:
-            return {
-                "status_text": "Unauthorized",
-                "detect_name": "Invalid API key",
-                "recent_activity": "No data",
-            }
-        if error.code == 404:
-            return {
-                "status_text": "0/0 (VirusTotal)",
-                "detect_name": "No data",
-                "recent_activity": "No data",
-            }
-        if error.code == 429:
-            return {
-                "status_text": "Rate limited",
-                "detect_name": "Try again later",
-                "recent_activity": "No data",
-            }
-
-        return {
-            "status_text": "Error",
-            "detect_name": f"HTTP {error.code}",
-            "recent_activity": "No data",
-        }
-
-    def _parse_vt_response(self, data: dict) -> dict:
-        attributes = data.get("data", {}).get("attributes", {})
-        stats = attributes.get("last_analysis_stats", {})
-        results = attributes.get("last_analysis_results", {})
-
-        harmless = int(stats.get("harmless", 0))
-        malicious = int(stats.get("malicious", 0))
-        suspicious = int(stats.get("suspicious", 0))
-        undetected = int(stats.get("undetected", 0))
-        timeout = int(stats.get("timeout", 0))
-
-        total = harmless + malicious + suspicious + undetected + timeout
-        detected = malicious + suspicious
-
-        detect_name = "No data"
-        for result_obj in results.values():
-            category = str(result_obj.get("category", "")).lower()
-            result_name = result_obj.get("result")
-            if category in ("malicious", "suspicious") and result_name:
-                detect_name = str(result_name)
-                break
-
-        recent_ts = attributes.get("last_analysis_date") or attributes.get("last_modification_date")
-
-        return {
-            "status_text": f"{detected}/{total} (VirusTotal)",
-            "detect_name": detect_name,
-            "recent_activity": self._format_vt_date(recent_ts),
-        }
-
-
-class VirusTotalIpOwnerWorker(QThread):
-    result_ready = pyqtSignal(dict)
-
-    def __init__(self, ip_addr: str, vt_api_key: str, request_id: int, parent=None):
-        super().__init__(parent)
-        self.ip_addr = ip_addr
-        self.vt_api_key = vt_api_key
-        self.request_id = request_id
-
-    def _emit_result(self, payload: dict) -> None:
-        payload["request_id"] = self.request_id
-        payload["ip_addr"] = self.ip_addr
-        self.result_ready.emit(payload)
-
-    @staticmethod
-    def _extract_owner_from_whois_text(whois_text: str) -> str:
-        if not whois_text:
-            return ""
-
-        preferred_keys = (
-            "OrgName",
-            "org-name",
-            "Organization",
-            "owner",
-            "descr",
-            "netname",
-        )
-
-        for line in whois_text.splitlines():
-            if ":" not in line:
-                continue
-
-            key, value = line.split(":", 1)
-            key = key.strip()
-            value = value.strip()
-
-            if key in preferred_keys and value:
-                return value
-
-        return ""
-
-    def _parse_owner(self, data: dict) -> str:
-        attributes = data.get("data", {}).get("attributes", {})
-
-        owner = (
-            attributes.get("as_owner")
-            or attributes.get("owner")
-            or attributes.get("network_owner")
-            or ""
-        )
-
-        if owner:
-            return str(owner)
-
-        whois_owner = self._extract_owner_from_whois_text(str(attributes.get("whois") or ""))
-        if whois_owner:
-            return whois_owner
-
-        registry = attributes.get("regional_internet_registry")
-        if registry:
-            return f"No owner data / RIR: {registry}"
-
-        return "No data"
-
-    def run(self) -> None:
-        if not self.vt_api_key or self.vt_api_key == "YOUR_VIRUSTOTAL_API_KEY":
-            self._emit_result({
-                "ok": False,
-                "owner": "No API key",
-                "message": "VirusTotal API key is not configured.",
-            })
-            return
-
-        url = f"{VT_API_BASE_URL}/ip_addresses/{self.ip_addr}"
-        req = Request(url, headers={
-            "x-apikey": self.vt_api_key,
-            "accept": "application/json",
-        })
-
-        try:
-            with urlopen(req, timeout=10) as resp:
-                data = json.loads(resp.read().decode("utf-8"))
-
-            self._emit_result({
-                "ok": True,
-                "owner": self._parse_owner(data),
-                "message": "OK",
-            })
-
-        except HTTPError as e:
-            if e.code == 401:
-                owner = "Invalid API key"
-            elif e.code == 404:
-                owner = "No data"
-            elif e.code == 429:
-                owner = "Rate limited"
-            else:
-                owner = f"HTTP {e.code}"
-
-            self._emit_result({
-                "ok": False,
-                "owner": owner,
-                "message": f"VirusTotal lookup failed: HTTP {e.code}",
-            })
-
-        except URLError:
-            self._emit_result({
-                "ok": False,
-                "owner": "Network error",
-                "message": "Cannot connect to VirusTotal.",
-            })
-
-        except Exception:
-            logging.exception("VirusTotal IP owner lookup failed.")
-            self._emit_result({
-                "ok": False,
-                "owner": "Lookup failed",
-                "message": "VirusTotal lookup failed.",
-            })
-
+class EnrichmentBridge(QObject):
+    """
+    Delivers lookup results from the enrichment loop thread to the GUI
+    thread (queued signal).
+    """
 
-class WhoisWorker(QThread):
     result_ready = pyqtSignal(dict)
+    health_changed = pyqtSignal(dict)
 
-    def __init__(self, ip_addr: str, request_id: int, parent=None):
-        super().__init__(parent)
-        self.ip_addr = ip_addr
-        self.request_id = request_id
-
-    def _emit_result(self, payload: dict) -> None:
-        payload["request_id"] = self.request_id
-        payload["ip_addr"] = self.ip_addr
-        self.result_ready.emit(payload)
-
-    def run(self) -> None:
-        try:
-            whois_obj = IPWhois(self.ip_addr)
-            whois_res = whois_obj.lookup_rdap()
-            network = whois_res.get("network") or {}
-
-            self._emit_result({
-                "ok": True,
-                "asn_description": whois_res.get("asn_description", "No data"),
-                "ip_version": network.get("ip_version", "No data"),
-                "asn_registry": whois_res.get("asn_registry", "No data"),
-                "asn_cidr": whois_res.get("asn_cidr", "No data"),
-                "asn_date": whois_res.get("asn_date", "No data"),
-            })
+    def emitter(self, kind: str, request_id: int, ip_addr: str, **extra) -> Callable[[dict], None]:
+        def emit(payload: dict) -> None:
+            payload.update(extra)
+            payload["kind"] = kind
+            payload["request_id"] = request_id
+            payload["ip_addr"] = ip_addr
+            self.result_ready.emit(payload)
 
-        except Exception:
-            logging.exception("RDAP lookup failed.")
-            self._emit_result({
-                "ok": False,
-                "asn_description": "No data",
-                "ip_version": "No data",
-                "asn_registry": "No data",
-                "asn_cidr": "No data",
-                "asn_date": "No data",
-            })
+        return emit
 
 
 # =============================================================================
@@ -763,14 +537,30 @@ class EarthWidget(QOpenGLWidget):
         self.zoom_level = -2.8
 
         self.texture = None
-        self.quadric = None
+        self.pending_texture: Optional[TextureLevels] = None
+        self.globe_renderer = GlobeRenderer()
+        self.tile_layer = GlobeTileLayer(load_tile_memory_budget())
+        self.marker_layer = GlobeMarkerLayer()
+        # (latitude, longitude) of looked-up addresses already on the globe.
+        self.interactive_markers: Set[Tuple[float, float]] = set()
 
         self.raw_lat = ""
         self.raw_lon = ""
 
+        # Frames are timed by the scheduler: full rate while interacting,
+        # idle rate otherwise, none while hidden or minimized.
+        self.render_scheduler = RenderScheduler(*load_globe_frame_rates())
+        self.render_scheduler.set_visible(False)
+        self.watched_window = None
+
         self.timer = QTimer(self)
         self.timer.timeout.connect(self.update_rotation)
-        self.timer.start(20)
+
+        QApplication.instance().applicationStateChanged.connect(self.on_application_state_changed)
+
+    @property
+    def frames_per_second(self) -> float:
+        return self.render_scheduler.fps
 
     def initializeGL(self) -> None:
         glEnable(GL_DEPTH_TEST)
@@ -778,81 +568,162 @@ class EarthWidget(QOpenGLWidget):
         glEnable(GL_MULTISAMPLE)
         glClearColor(0.06, 0.06, 0.06, 1.0)
 
-        self.texture = glGenTextures(1)
-        glBindTexture(GL_TEXTURE_2D, self.texture)
-        self.load_texture(resource_path("resource/earth_texture.jpg"))
+        # The texture is decoded in the background (see
+        # MainWindow.start_texture_load); a placeholder sphere is drawn until then.
+        if self.globe_renderer.initialize() == RENDER_MODE_SHADER:
+            self.tile_layer.initialize()
+            self.marker_layer.initialize()
+
+    def set_texture_levels(self, texture: TextureLevels) -> None:
+        """
+        Takes the decoded mipmap chain; it is uploaded on the next paint,
+        replacing the placeholder sphere.
+        """
+        self.pending_texture = texture
+        self.mark_activity()
+        self.update()
 
-        self.quadric = gluNewQuadric()
-        gluQuadricTexture(self.quadric, GL_TRUE)
+    def set_tile_pyramid(self, pyramid, load_tile: Callable[[tuple], None]) -> None:
+        self.tile_layer.set_pyramid(pyramid, load_tile)
+        self.mark_activity()
+        self.update()
 
-    def load_texture(self, texture_path: str) -> None:
-        try:
-            image = Image.open(texture_path)
-            image = image.transpose(Image.FLIP_TOP_BOTTOM)
-            image = image.transpose(Image.FLIP_LEFT_RIGHT)
-            image = image.convert("RGB")
-            img_data = image.tobytes()
-
-            glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
-            glTexImage2D(
-                GL_TEXTURE_2D,
-                0,
-                GL_RGB,
-                image.width,
-                image.height,
-                0,
-                GL_RGB,
-                GL_UNSIGNED_BYTE,
-                img_data,
-            )
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR_MIPMAP_LINEAR)
-            glGenerateMipmap(GL_TEXTURE_2D)
+    def on_tile_loaded(self, key: tuple, pixels) -> None:
+        self.tile_layer.on_tile_loaded(key, pixels)
+        self.update()
+
+    def add_markers(self, coordinates) -> None:
+        """
+        Adds (latitude, longitude) rows to the markers on the globe.
+        """
+        self.marker_layer.add(coordinates)
+        self.mark_activity()
+        self.update()
+
+    def add_interactive_marker(self, lat: float, lon: float) -> None:
+        """
+        Marks a looked-up location once, however often it is looked up again.
+        """
+        if (lat, lon) in self.interactive_markers:
+            return
+        self.interactive_markers.add((lat, lon))
+        self.add_markers([(lat, lon)])
+
+    def clear_markers(self) -> None:
+        self.marker_layer.clear()
+        self.interactive_markers.clear()
+        self.update()
 
+    def upload_pending_texture(self) -> None:
+        texture, self.pending_texture = self.pending_texture, None
+        try:
+            levels = texture.levels
+            if self.tile_layer.enabled:
+                # Detail comes from the tiles; only an overview stays resident.
+                levels = [level for level in levels if level.shape[1] <= OVERVIEW_MAX_WIDTH] or levels[-1:]
+                self.tile_layer.overview_width = levels[0].shape[1]
+
+            if self.texture:
+                glDeleteTextures([self.texture])
+            self.texture = upload_texture_levels(levels)
         except Exception:
-            logging.exception("Failed to load earth texture.")
+            logging.exception("Failed to upload earth texture.")
+            self.texture = None
+        finally:
+            texture.close()
 
     def update_rotation(self) -> None:
-        self.rotation = (self.rotation + 0.2) % 360
+        step = self.render_scheduler.animation_step()
+        self.rotation = (self.rotation + GLOBE_ROTATION_DEGREES_PER_SECOND * step) % 360
         self.update()
+        self.schedule_next_frame()
+
+    def schedule_next_frame(self) -> None:
+        interval = self.render_scheduler.frame_interval_ms()
+        if interval is None:
+            self.timer.stop()
+        elif not self.timer.isActive() or self.timer.interval() != interval:
+            self.timer.start(interval)
+
+    def mark_activity(self) -> None:
+        """
+        Render at full rate for a while (user input or new content).
+        """
+        self.render_scheduler.mark_activity()
+        self.schedule_next_frame()
+
+    # -------------------------------------------------------------------------
+    # Visibility
+    # -------------------------------------------------------------------------
+
+    def update_visibility(self) -> None:
+        visible = self.isVisible() and not self.window().isMinimized()
+        self.render_scheduler.set_visible(visible)
+        self.schedule_next_frame()
+
+    def showEvent(self, event) -> None:
+        super().showEvent(event)
+        handle = self.window().windowHandle()
+        if handle is not None and handle is not self.watched_window:
+            handle.visibilityChanged.connect(lambda _visibility: self.update_visibility())
+            self.watched_window = handle
+        self.update_visibility()
+
+    def hideEvent(self, event) -> None:
+        super().hideEvent(event)
+        self.update_visibility()
+
+    def on_application_state_changed(self, state) -> None:
+        if state != Qt.ApplicationActive:
+            self.render_scheduler.go_idle()
+        self.update_visibility()
 
     def resizeGL(self, w: int, h: int) -> None:
-        glViewport(0, 0, w, h)
-        glMatrixMode(GL_PROJECTION)
-        glLoadIdentity()
-        gluPerspective(45.0, w / h if h != 0 else 1, 1.0, 100.0)
-        glMatrixMode(GL_MODELVIEW)
+        self.globe_renderer.resize(w, h)
 
     def paintGL(self) -> None:
-        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-        glLoadIdentity()
-
-        gluLookAt(0.0, 0.0, self.zoom_level, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0)
+        if self.pending_texture is not None:
+            self.upload_pending_texture()
 
-        if self.texture:
-            glBindTexture(GL_TEXTURE_2D, self.texture)
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
 
-        glRotatef(self.rotation, 0.0, 1.0, 0.0)
-        glRotatef(self.rotation_x, 1.0, 0.0, 0.0)
-        glRotatef(self.rotation_y, 0.0, 1.0, 0.0)
-        glRotatef(self.rotation_z, 0.0, 0.0, 1.0)
+        model_view = globe_model_view(
+            self.zoom_level, self.rotation, self.rotation_x, self.rotation_y, self.rotation_z
+        )
+        self.globe_renderer.draw(model_view, self.texture)
+        uploads_pending = self.tile_layer.draw(
+            model_view, self.globe_renderer.projection, self.globe_renderer.viewport, FIELD_OF_VIEW
+        )
+        self.marker_layer.draw(model_view, self.globe_renderer.projection)
+        self.render_scheduler.record_frame()
 
-        if self.quadric:
-            gluSphere(self.quadric, 1.0, 100, 100)
+        if uploads_pending:
+            self.update()
 
     def cleanup_gl_resources(self) -> None:
-        if self.quadric:
-            try:
-                gluDeleteQuadric(self.quadric)
-            except Exception:
-                logging.exception("Failed to delete OpenGL quadric.")
-            self.quadric = None
+        if self.pending_texture is not None:
+            self.pending_texture.close()
+            self.pending_texture = None
+        if self.context() is None:
+            return
+
+        self.makeCurrent()
+        try:
+            self.globe_renderer.cleanup()
+            self.tile_layer.cleanup()
+            self.marker_layer.cleanup()
+            if self.texture:
+                glDeleteTextures([self.texture])
+                self.texture = None
+        except Exception:
+            logging.exception("Failed to release OpenGL resources.")
+        finally:
+            self.doneCurrent()
 
     def mousePressEvent(self, event) -> None:
         self.last_mouse_x = event.x()
         self.last_mouse_y = event.y()
+        self.mark_activity()
 
     def mouseMoveEvent(self, event) -> None:
         dx = event.x() - self.last_mouse_x
@@ -864,12 +735,17 @@ class EarthWidget(QOpenGLWidget):
         self.last_mouse_x = event.x()
         self.last_mouse_y = event.y()
 
+        self.mark_activity()
         self.update()
 
     def wheelEvent(self, event) -> None:
         delta = event.angleDelta().y() / 120
-        self.zoom_level += delta * 0.5
-        self.zoom_level = max(-8.0, min(-2.2, self.zoom_level))
+        # Smaller steps near the surface.
+        step = 0.5 * min(1.0, (-self.zoom_level - 1.0) / 1.2)
+        nearest = GLOBE_NEAREST_ZOOM_WITH_TILES if self.tile_layer.pyramid is not None else GLOBE_NEAREST_ZOOM
+        self.zoom_level += delta * step
+        self.zoom_level = max(GLOBE_FARTHEST_ZOOM, min(nearest, self.zoom_level))
+        self.mark_activity()
         self.update()
 
 
@@ -998,6 +874,7 @@ class MainWindow(QMainWindow):
     TEXT_STYLE = "color: white; font-size: 12px; background: transparent;"
     MALICIOUS_TITLE_STYLE = "color: red; font-size: 16px; font-weight: bold; background: transparent;"
     MALICIOUS_TEXT_STYLE = "color: lightgrey; font-size: 14px; background: transparent;"
+    DEGRADED_TEXT_STYLE = "color: orange; font-size: 12px; background: transparent;"
 
     BUTTON_STYLE = """
         QPushButton {
@@ -1011,22 +888,56 @@ class MainWindow(QMainWindow):
         }
     """
 
-    def __init__(self, config: AppConfig, geoip_reader):
+    def __init__(
+        self,
+        config: AppConfig,
+        geoip_reader,
+        vt_cache=None,
+        rdap_cache=None,
+        asn_index=None,
+        rir_index=None,
+    ):
         super().__init__()
 
         self.config = config
         self.gi = geoip_reader
+        self.vt_cache = vt_cache
+        self.rdap_cache = rdap_cache
+        self.asn_index = asn_index
+        self.rir_index = rir_index
+        self.blocklists = None
+        self.blocklist_matches: Tuple[str, ...] = ()
+        self.vt_lookup_policy = load_vt_lookup_policy()
+        self.rdap_fallback = load_rdap_fallback_enabled()
 
         self.drag_pos = QPoint()
         self.current_ip_addr = ""
 
-        self.vt_worker = None
-        self.whois_worker = None
-        self.private_ip_owner_worker = None
+        self.geo_request_id = 0
         self.vt_request_id = 0
         self.whois_request_id = 0
         self.private_ip_owner_request_id = 0
-        self._active_workers = []
+
+        # Running lookup per result kind; superseded ones are cancelled.
+        self.pending_lookups: Dict[str, concurrent.futures.Future] = {}
+
+        # VT lookups requested while the API keys are still being loaded or
+        # validated run once that finishes.
+        self.vt_keys_state = VT_KEYS_READY if config.vt_api_keys else VT_KEYS_MISSING
+        self.deferred_vt_lookup: Optional[Callable[[], None]] = None
+
+        self.engine = get_enrichment_engine()
+        self.engine.call_soon(set_vt_api_keys, config.vt_api_keys)
+        self.enrichment_bridge = EnrichmentBridge(self)
+        self.enrichment_bridge.result_ready.connect(self.on_enrichment_result)
+        self.enrichment_bridge.health_changed.connect(self.on_service_health_changed)
+        self.engine.call_soon(add_health_listener, self.enrichment_bridge.health_changed.emit)
+
+        # service -> circuit breaker state, for the degraded-mode indicator
+        self.service_states: Dict[str, str] = {}
+
+        cache_size, cache_ttl = load_geoip_cache_settings()
+        self.geo_view_cache = LruTtlCache(cache_size, cache_ttl, name="GeoIP label cache")
 
         self._setup_window()
         self._build_ui()
@@ -1160,6 +1071,7 @@ class MainWindow(QMainWindow):
             f"  > Software version : {self.config.software_version}",
             self.left_overlay,
         )
+        self.service_status = self._make_label("  > Online services : OK", self.left_overlay)
 
         self.ip_detail_title = self._make_label("* Target IP details", self.left_overlay, self.SECTION_STYLE)
         self.ipAddr_label = self._make_label("  > IP Address : No data", self.left_overlay)
@@ -1191,6 +1103,7 @@ class MainWindow(QMainWindow):
 
         left_layout.addWidget(self.sfInfo)
         left_layout.addWidget(self.sfVersion_info)
+        left_layout.addWidget(self.service_status)
         left_layout.addSpacing(16)
 
         left_layout.addWidget(self.ip_detail_title)
@@ -1263,6 +1176,15 @@ class MainWindow(QMainWindow):
         self.btn_online_ge.setStyleSheet(self.BUTTON_STYLE)
         self.btn_offline_ge.setStyleSheet(self.BUTTON_STYLE)
 
+        self.btn_batch_markers = QPushButton("Show batch results on globe", self.right_overlay)
+        self.btn_clear_markers = QPushButton("Clear globe markers", self.right_overlay)
+
+        self.btn_batch_markers.clicked.connect(self.show_batch_markers)
+        self.btn_clear_markers.clicked.connect(self.clear_globe_markers)
+
+        self.btn_batch_markers.setStyleSheet(self.BUTTON_STYLE)
+        self.btn_clear_markers.setStyleSheet(self.BUTTON_STYLE)
+
         self._set_right_label_heights()
 
         right_layout.addWidget(self.ip_input_title)
@@ -1285,6 +1207,8 @@ class MainWindow(QMainWindow):
 
         right_layout.addWidget(self.btn_online_ge)
         right_layout.addWidget(self.btn_offline_ge)
+        right_layout.addWidget(self.btn_batch_markers)
+        right_layout.addWidget(self.btn_clear_markers)
         right_layout.addStretch()
 
     def _make_label(self, text: str, parent: QWidget, style: Optional[str] = None) -> QLabel:
@@ -1297,6 +1221,7 @@ class MainWindow(QMainWindow):
             self.geodb_title,
             self.sfInfo,
             self.sfVersion_info,
+            self.service_status,
             self.ip_detail_title,
             self.ipAddr_label,
             self.domain_info_label,
@@ -1389,15 +1314,29 @@ class MainWindow(QMainWindow):
         event.accept()
 
     def closeEvent(self, event) -> None:
+        self.geo_request_id += 1
         self.vt_request_id += 1
         self.whois_request_id += 1
         self.private_ip_owner_request_id += 1
 
-        for worker in list(self._active_workers):
-            if worker is not None and worker.isRunning():
-                worker.requestInterruption()
-                worker.wait(1500)
-
+        self.cancel_pending_lookups()
+        self.engine.stop()
+
+        self.geo_view_cache.log_stats()
+        if isinstance(self.gi, CachedGeoIPReader):
+            self.gi.cache.log_stats()
+        if self.vt_cache is not None:
+            self.vt_cache.close()
+        if self.rdap_cache is not None:
+            self.rdap_cache.log_stats()
+            self.rdap_cache.close()
+        log_request_stats()
+        log_health_stats()
+
+        self.earth_widget.timer.stop()
+        self.earth_widget.render_scheduler.log_stats()
+        self.earth_widget.tile_layer.log_stats()
+        self.earth_widget.marker_layer.log_stats()
         self.earth_widget.cleanup_gl_resources()
         self.delete_kml_file()
         event.accept()
@@ -1439,24 +1378,256 @@ class MainWindow(QMainWindow):
             f"  > GeoDB Status : Activate\n  > GeoDB Version : {self.config.geodb_version}"
         )
 
-    def _track_worker(self, worker: QThread) -> None:
-        self._active_workers.append(worker)
-        worker.finished.connect(lambda w=worker: self._cleanup_worker(w))
+    def on_service_health_changed(self, snapshot: dict) -> None:
+        self.service_states[snapshot["service"]] = snapshot["state"]
+        self.refresh_service_status()
+
+    def refresh_service_status(self) -> None:
+        """
+        Degraded-mode indicator: lists the online services whose circuit
+        breaker is open. GeoIP is local and never affected.
+        """
+        offline = [
+            SERVICE_DISPLAY_NAMES.get(service, service)
+            for service, state in sorted(self.service_states.items())
+            if state != STATE_CLOSED
+        ]
 
-    def _cleanup_worker(self, worker: QThread) -> None:
-        try:
-            if worker in self._active_workers:
-                self._active_workers.remove(worker)
-        except ValueError:
-            pass
-        worker.deleteLater()
+        if offline:
+            self.service_status.setText(f"  > Degraded : {', '.join(offline)} offline")
+            self.service_status.setStyleSheet(self.DEGRADED_TEXT_STYLE)
+        elif self.vt_keys_state == VT_KEYS_PENDING:
+            self.service_status.setText("  > VirusTotal : pending (API key)")
+            self.service_status.setStyleSheet(self.TEXT_STYLE)
+        else:
+            self.service_status.setText("  > Online services : OK")
+            self.service_status.setStyleSheet(self.TEXT_STYLE)
+
+    def on_enrichment_result(self, result: dict) -> None:
+        kind = result.get("kind")
+
+        if kind == SERVICE_GEOIP:
+            self.on_geo_result(result)
+        elif kind == SERVICE_RDAP:
+            self.on_whois_result(result)
+        elif kind == SERVICE_VT:
+            self.on_vt_result(result)
+        elif kind == "vt_owner":
+            self.on_private_ip_owner_result(result, result.get("validation_message", ""))
+        elif kind == "vt_keys_loaded":
+            self.on_vt_keys_loaded(result)
+        elif kind == "vt_keys_validated":
+            self.on_vt_keys_validated(result)
+        elif kind == "blocklists_loaded":
+            self.on_blocklists_loaded(result)
+        elif kind == "texture_loaded":
+            self.on_texture_loaded(result)
+        elif kind == "tile_pyramid_loaded":
+            self.on_tile_pyramid_loaded(result)
+        elif kind == "tile_loaded":
+            self.earth_widget.on_tile_loaded(result["tile"], result["pixels"])
+        elif kind == "markers_loaded":
+            self.earth_widget.add_markers(result["markers"])
+
+    # -------------------------------------------------------------------------
+    # Earth texture
+    # -------------------------------------------------------------------------
+
+    def start_texture_load(self) -> None:
+        emit = self.enrichment_bridge.emitter("texture_loaded", 0, "")
+        self.engine.submit(SERVICE_BACKGROUND, load_earth_texture_in_background(self.engine, emit))
+
+    def on_texture_loaded(self, result: dict) -> None:
+        if result["texture"] is not None:
+            self.earth_widget.set_texture_levels(result["texture"])
+
+    def start_tile_pyramid_load(self) -> None:
+        if self.earth_widget.tile_layer.budget_bytes <= 0:
+            return
+        emit = self.enrichment_bridge.emitter("tile_pyramid_loaded", 0, "")
+        self.engine.submit(SERVICE_BACKGROUND, load_tile_pyramid_in_background(self.engine, emit))
+
+    def on_tile_pyramid_loaded(self, result: dict) -> None:
+        if result["tile_pyramid"] is not None:
+            self.earth_widget.set_tile_pyramid(result["tile_pyramid"], self.start_tile_read)
+
+    def start_tile_read(self, key: tuple) -> None:
+        emit = self.enrichment_bridge.emitter("tile_loaded", 0, "")
+        pyramid = self.earth_widget.tile_layer.pyramid
+        self.engine.submit(SERVICE_BACKGROUND, read_tile_in_background(self.engine, pyramid, key, emit))
+
+    # -------------------------------------------------------------------------
+    # Globe markers
+    # -------------------------------------------------------------------------
+
+    def show_batch_markers(self) -> None:
+        if not self.earth_widget.marker_layer.enabled:
+            QMessageBox.information(
+                self, "Globe markers", "Markers need the shader globe renderer (OpenGL 2.0 or newer)."
+            )
+            return
+
+        selected_path, _ = QFileDialog.getOpenFileName(
+            self,
+            "Select batch result file",
+            "",
+            "Batch results (*.jsonl *.csv *.gz);;All files (*.*)",
+        )
+        if not selected_path:
+            return
+
+        emit = self.enrichment_bridge.emitter("markers_loaded", 0, "")
+        self.engine.submit(SERVICE_BACKGROUND, load_markers_in_background(self.engine, selected_path, emit))
+
+    def clear_globe_markers(self) -> None:
+        self.earth_widget.clear_markers()
+
+    # -------------------------------------------------------------------------
+    # Local blocklists
+    # -------------------------------------------------------------------------
+
+    def start_blocklist_load(self) -> None:
+        emit = self.enrichment_bridge.emitter("blocklists_loaded", 0, "")
+        self.engine.submit(SERVICE_BACKGROUND, load_blocklists_in_background(self.engine, emit))
+
+    def on_blocklists_loaded(self, result: dict) -> None:
+        self.blocklists = result["blocklists"]
+
+    def needs_vt_lookup(self, listed: Tuple[str, ...]) -> bool:
+        """
+        VirusTotal is the second opinion for IPs the local lists do not
+        settle (see "vt_lookup_policy").
+        """
+        if self.vt_lookup_policy == "never":
+            return False
+        return self.vt_lookup_policy == "always" or not listed
+
+    def with_blocklist_status(self, status_text: str) -> str:
+        if not self.blocklist_matches:
+            return status_text
+        return f"{status_text} / Listed locally ({', '.join(self.blocklist_matches)})"
+
+    # -------------------------------------------------------------------------
+    # VirusTotal API key setup
+    # -------------------------------------------------------------------------
+
+    def start_vt_key_setup(self, force_prompt: bool = False) -> None:
+        """
+        Loads the stored keys off the GUI thread; VT lookups stay pending
+        until keys are loaded (or entered and validated).
+        """
+        self.set_vt_keys_state(VT_KEYS_PENDING)
+
+        if force_prompt:
+            self.prompt_vt_api_keys()
+            return
+
+        emit = self.enrichment_bridge.emitter("vt_keys_loaded", 0, "")
+        self.engine.submit(SERVICE_BACKGROUND, load_vt_api_keys_in_background(self.engine, emit))
+
+    def on_vt_keys_loaded(self, result: dict) -> None:
+        if result["api_keys"]:
+            self.apply_vt_api_keys(result["api_keys"])
+        else:
+            self.prompt_vt_api_keys()
+
+    def prompt_vt_api_keys(self) -> None:
+        if keyring is None:
+            QMessageBox.warning(
+                self,
+                "Keyring Module Missing",
+                "The 'keyring' module is not installed.\n\n"
+                "VirusTotal API key will not be saved in plaintext.\n"
+                "Install it with: pip install keyring"
+            )
+
+        dialog = VtApiKeyDialog(self)
+
+        if dialog.exec_() != QDialog.Accepted:
+            QMessageBox.warning(
+                self,
+                "VirusTotal API Key",
+                "VirusTotal API key was not entered. VirusTotal lookup will be disabled.",
+            )
+            self.apply_vt_api_keys([])
+            return
+
+        api_keys = dialog.get_api_keys()
+
+        if not api_keys:
+            QMessageBox.warning(self, "VirusTotal API Key", "API key cannot be empty.")
+            QTimer.singleShot(0, self.prompt_vt_api_keys)
+            return
+
+        emit = self.enrichment_bridge.emitter("vt_keys_validated", 0, "")
+        self.engine.submit(SERVICE_VT, validate_and_save_vt_api_keys(self.engine, api_keys, emit))
+
+    def on_vt_keys_validated(self, result: dict) -> None:
+        if result["failures"]:
+            QMessageBox.warning(
+                self,
+                "VirusTotal API Key Validation Failed",
+                "\n".join(result["failures"]),
+            )
+
+        valid_keys = result["valid_keys"]
+        if not valid_keys:
+            QTimer.singleShot(0, self.prompt_vt_api_keys)
+            return
+
+        # Start the deferred lookups before the (modal) confirmation box.
+        self.apply_vt_api_keys(valid_keys)
+
+        if result["saved"]:
+            QMessageBox.information(
+                self,
+                "VirusTotal API Key",
+                f"{len(valid_keys)} VirusTotal API key(s) validated and saved securely.",
+            )
+        else:
+            QMessageBox.warning(
+                self,
+                "VirusTotal API Key",
+                "VirusTotal API key has been validated, but it could not be saved securely.\n"
+                "It will be used for this session only.",
+            )
+
+    def apply_vt_api_keys(self, api_keys: List[str]) -> None:
+        self.engine.call_soon(set_vt_api_keys, tuple(api_keys))
+        self.set_vt_keys_state(VT_KEYS_READY if api_keys else VT_KEYS_MISSING)
+
+        deferred, self.deferred_vt_lookup = self.deferred_vt_lookup, None
+        if deferred is not None:
+            deferred()
+
+    def set_vt_keys_state(self, state: str) -> None:
+        self.vt_keys_state = state
+        self.refresh_service_status()
 
     # -------------------------------------------------------------------------
     # Lookup flow
     # -------------------------------------------------------------------------
 
+    def submit_lookup(self, kind: str, service: str, coro) -> None:
+        """
+        Starts `coro` on the engine, cancelling the previous lookup of the
+        same kind (its socket is closed and a queued VirusTotal request is
+        withdrawn before it uses quota).
+        """
+        previous = self.pending_lookups.pop(kind, None)
+        if previous is not None:
+            previous.cancel()
+        self.pending_lookups[kind] = self.engine.submit(service, coro)
+
+    def cancel_pending_lookups(self) -> None:
+        for future in self.pending_lookups.values():
+            future.cancel()
+        self.pending_lookups.clear()
+        self.deferred_vt_lookup = None
+
     def check_ip_address(self) -> None:
         input_ip_data = self.ip_input.text().strip()
+        self.cancel_pending_lookups()
         self.reset_result_fields()
 
         ip_addr, status_code, message = classify_ip_address(input_ip_data)
@@ -1479,20 +1650,61 @@ class MainWindow(QMainWindow):
         self.start_virustotal_lookup(ip_addr)
 
     def trace_ip_addr_info(self, ip_addr: str) -> None:
+        self.geo_request_id += 1
+        request_id = self.geo_request_id
+
         self.earth_widget.raw_lat = ""
         self.earth_widget.raw_lon = ""
 
-        try:
-            rec = self.gi.record_by_name(ip_addr)
-        except Exception:
-            logging.exception("GeoIP lookup failed.")
-            rec = None
+        geo_view = self.geo_view_cache.get(ip_addr)
+        if geo_view is not None:
+            self._apply_geo_view(geo_view)
+            return
+
+        emit = self.enrichment_bridge.emitter(SERVICE_GEOIP, request_id, ip_addr)
+        self.submit_lookup(SERVICE_GEOIP, SERVICE_GEOIP, lookup_geoip(self.engine, self.gi, ip_addr, emit))
 
+    def on_geo_result(self, geo_info: dict) -> None:
+        if geo_info.get("request_id") != self.geo_request_id:
+            return
+
+        ip_addr = geo_info.get("ip_addr")
+        if ip_addr != self.current_ip_addr:
+            return
+
+        rec = geo_info.get("record")
         if not rec:
             QMessageBox.information(self, "No GeoIP Data", f"No GeoIP data found for {ip_addr}.")
             self.ipAddr_label.setText(f"  > IP Address : {ip_addr}")
             return
 
+        geo_view = self.build_geo_view(rec)
+        self.geo_view_cache.put(ip_addr, geo_view)
+        self._apply_geo_view(geo_view)
+
+    def _apply_geo_view(self, geo_view: dict) -> None:
+        lat = geo_view["lat"]
+        lon = geo_view["lon"]
+
+        self.earth_widget.raw_lat = lat if lat is not None else ""
+        self.earth_widget.raw_lon = lon if lon is not None else ""
+
+        for label, text in zip(self._geo_view_labels(), geo_view["labels"]):
+            label.setText(text)
+
+        if lat not in (None, "No data") and lon not in (None, "No data"):
+            self.write_kml_file(lat, lon)
+            try:
+                self.earth_widget.add_interactive_marker(float(lat), float(lon))
+            except (TypeError, ValueError):
+                pass
+
+    @staticmethod
+    def build_geo_view(rec: dict) -> dict:
+        """
+        Formats a GeoIP record into label texts once; cached per IP.
+        Label order matches `_geo_view_labels`.
+        """
         country = rec.get("country_name", "No data")
         continent = rec.get("continent", "No data")
         total_country = f"{country}({continent})"
@@ -1506,36 +1718,69 @@ class MainWindow(QMainWindow):
         lat = rec.get("latitude", "No data")
         lon = rec.get("longitude", "No data")
 
-        self.earth_widget.raw_lat = lat if lat is not None else ""
-        self.earth_widget.raw_lon = lon if lon is not None else ""
-
-        self.geo_country.setText(f"  > Country : {total_country}")
-        self.geo_city.setText(f"  > City : {city}")
-        self.geo_timezone.setText(f"  > Timezone : {time_zone}")
-        self.geo_lat.setText(f"  > Latitude : {lat}")
-        self.geo_long.setText(f"  > Longitude : {lon}")
-        self.geo_postal.setText(f"  > Postal code : {postal_code}")
-        self.geo_lang.setText(f"  > Language : {language}")
-        self.geo_region_code.setText(f"  > Region code : {region_code}")
-        self.geo_region_num.setText(f"  > Region number : {region_num}")
-        self.geo_currency.setText(f"  > Currency : {CURRENCY_MAP.get(region_code, 'No data')}")
+        return {
+            "lat": lat,
+            "lon": lon,
+            "labels": (
+                f"  > Country : {total_country}",
+                f"  > City : {city}",
+                f"  > Timezone : {time_zone}",
+                f"  > Latitude : {lat}",
+                f"  > Longitude : {lon}",
+                f"  > Postal code : {postal_code}",
+                f"  > Language : {language}",
+                f"  > Region code : {region_code}",
+                f"  > Region number : {region_num}",
+                f"  > Currency : {CURRENCY_MAP.get(region_code, 'No data')}",
+            ),
+        }
 
-        if lat not in (None, "No data") and lon not in (None, "No data"):
-            self.write_kml_file(lat, lon)
+    def _geo_view_labels(self) -> tuple:
+        return (
+            self.geo_country,
+            self.geo_city,
+            self.geo_timezone,
+            self.geo_lat,
+            self.geo_long,
+            self.geo_postal,
+            self.geo_lang,
+            self.geo_region_code,
+            self.geo_region_num,
+            self.geo_currency,
+        )
 
     def start_virustotal_lookup(self, ip_addr: str) -> None:
         self.vt_request_id += 1
         request_id = self.vt_request_id
 
-        self.target_ip_malicious_level.setText("  > status : Checking VirusTotal...")
         self.target_source.setText("  > detect name : No data\n  > recent activity : No data")
 
-        worker = VirusTotalWorker(ip_addr, self.config.vt_api_key, request_id, self)
-        worker.result_ready.connect(self.on_vt_result)
-        self._track_worker(worker)
+        listed = self.blocklists.match_one(ip_addr) if self.blocklists is not None else ()
+        self.blocklist_matches = listed
+
+        if not self.needs_vt_lookup(listed):
+            if listed:
+                self.target_ip_malicious_level.setText(f"  > status : Listed locally ({', '.join(listed)})")
+                self.target_source.setText(
+                    f"  > detect name : {', '.join(listed)}\n  > recent activity : No data"
+                )
+            elif self.blocklists is not None:
+                self.target_ip_malicious_level.setText("  > status : Not listed locally")
+            else:
+                self.target_ip_malicious_level.setText("  > status : VirusTotal disabled")
+            return
+
+        if self.vt_keys_state == VT_KEYS_PENDING:
+            self.target_ip_malicious_level.setText(
+                "  > status : " + self.with_blocklist_status("VirusTotal pending (API key)")
+            )
+            self.deferred_vt_lookup = lambda: self.start_virustotal_lookup(ip_addr)
+            return
 
-        self.vt_worker = worker
-        worker.start()
+        self.target_ip_malicious_level.setText("  > status : " + self.with_blocklist_status("Checking VirusTotal..."))
+
+        emit = self.enrichment_bridge.emitter(SERVICE_VT, request_id, ip_addr)
+        self.submit_lookup(SERVICE_VT, SERVICE_VT, lookup_vt_status(ip_addr, self.vt_cache, emit))
 
     def on_vt_result(self, vt_info: dict) -> None:
         if vt_info.get("request_id") != self.vt_request_id:
@@ -1543,27 +1788,44 @@ class MainWindow(QMainWindow):
         if vt_info.get("ip_addr") != self.current_ip_addr:
             return
 
-        self.target_ip_malicious_level.setText(f"  > status : {vt_info['status_text']}")
+        if vt_info.get("queued"):
+            self.target_ip_malicious_level.setText(
+                "  > status : " + self.with_blocklist_status(self.format_queue_wait(vt_info["wait_seconds"]))
+            )
+            return
+
+        self.target_ip_malicious_level.setText("  > status : " + self.with_blocklist_status(vt_info["status_text"]))
         self.target_source.setText(
             f"  > detect name : {vt_info['detect_name']}\n"
             f"  > recent activity : {vt_info['recent_activity']}"
         )
 
+    @staticmethod
+    def format_queue_wait(wait_seconds: float) -> str:
+        # Waits for the daily quota run to hours; no usable key means no estimate.
+        if wait_seconds == float("inf"):
+            return "Queued for VirusTotal (quota exhausted)"
+        if wait_seconds >= 120:
+            return f"Queued for VirusTotal (~{round(wait_seconds / 60)} min)"
+        return f"Queued for VirusTotal (~{max(1, round(wait_seconds))} s)"
+
     def start_private_ip_owner_lookup(self, ip_addr: str, validation_message: str) -> None:
         self.private_ip_owner_request_id += 1
         request_id = self.private_ip_owner_request_id
 
-        self.target_ip_malicious_level.setText("  > status : Private IPv4 / VT owner check...")
         self.target_source.setText("  > detect name : No data\n  > recent activity : No data")
 
-        worker = VirusTotalIpOwnerWorker(ip_addr, self.config.vt_api_key, request_id, self)
-        worker.result_ready.connect(
-            lambda result, msg=validation_message: self.on_private_ip_owner_result(result, msg)
-        )
-        self._track_worker(worker)
+        if self.vt_keys_state == VT_KEYS_PENDING:
+            self.target_ip_malicious_level.setText("  > status : Private IPv4 / VT pending (API key)")
+            self.deferred_vt_lookup = lambda: self.start_private_ip_owner_lookup(ip_addr, validation_message)
+            return
 
-        self.private_ip_owner_worker = worker
-        worker.start()
+        self.target_ip_malicious_level.setText("  > status : Private IPv4 / VT owner check...")
+
+        emit = self.enrichment_bridge.emitter(
+            "vt_owner", request_id, ip_addr, validation_message=validation_message
+        )
+        self.submit_lookup("vt_owner", SERVICE_VT, lookup_vt_owner(ip_addr, emit))
 
     def on_private_ip_owner_result(self, vt_info: dict, validation_message: str) -> None:
         if vt_info.get("request_id") != self.private_ip_owner_request_id:
@@ -1571,6 +1833,12 @@ class MainWindow(QMainWindow):
         if vt_info.get("ip_addr") != self.current_ip_addr:
             return
 
+        if vt_info.get("queued"):
+            self.target_ip_malicious_level.setText(
+                f"  > status : Private IPv4 / {self.format_queue_wait(vt_info['wait_seconds'])}"
+            )
+            return
+
         owner = vt_info.get("owner") or "No data"
 
         self.target_ip_malicious_level.setText(" - status : Private IPv4")
@@ -1592,12 +1860,20 @@ class MainWindow(QMainWindow):
         self.asn_cidr_dat.setText("  > ASN CIDR : Checking RDAP...")
         self.asn_date.setText("  > ASN Date : Checking RDAP...")
 
-        worker = WhoisWorker(ip_addr, request_id, self)
-        worker.result_ready.connect(self.on_whois_result)
-        self._track_worker(worker)
-
-        self.whois_worker = worker
-        worker.start()
+        emit = self.enrichment_bridge.emitter(SERVICE_RDAP, request_id, ip_addr)
+        self.submit_lookup(
+            SERVICE_RDAP,
+            SERVICE_RDAP,
+            lookup_rdap(
+                self.engine,
+                ip_addr,
+                self.rdap_cache,
+                emit,
+                self.asn_index,
+                self.rdap_fallback,
+                self.rir_index,
+            ),
+        )
 
     def on_whois_result(self, whois_info: dict) -> None:
         if whois_info.get("request_id") != self.whois_request_id:
@@ -1708,8 +1984,20 @@ class MainWindow(QMainWindow):
 # Entrypoint
 # =============================================================================
 
+def parse_gui_args(argv: list) -> Tuple[argparse.Namespace, list]:
+    """
+    Parses app options; everything unknown is left for QApplication.
+    """
+    parser = argparse.ArgumentParser(prog=os.path.basename(argv[0]), add_help=False)
+    parser.add_argument("--geodb-cache-mode", choices=GEODB_READER_MODES, default=None)
+    parser.add_argument("--reset-vt-keys", action="store_true", help="re-enter the VirusTotal API key pool")
+    args, qt_args = parser.parse_known_args(argv[1:])
+    return args, argv[:1] + qt_args
+
+
 def main() -> None:
     setup_logging()
+    args, qt_argv = parse_gui_args(sys.argv)
 
     if os.name == "nt":
         try:
@@ -1721,27 +2009,42 @@ def main() -> None:
     ensure_geodb_exists_or_exit(geo_db_path)
 
     try:
-        geoip_reader = pygeoip.GeoIP(geo_db_path)
+        geoip_reader = open_geoip_reader(geo_db_path, resolve_geodb_cache_mode(args.geodb_cache_mode))
     except Exception:
         logging.exception("Failed to open GeoIP database.")
         sys.exit(1)
 
-    app = QApplication(sys.argv)
-    app.setWindowIcon(QIcon(resource_path("resource/AOI_icon.ico")))
+    cache_size, cache_ttl = load_geoip_cache_settings()
+    geoip_reader = CachedGeoIPReader(geoip_reader, LruTtlCache(cache_size, cache_ttl, name="GeoIP record cache"))
 
-    vt_api_key = load_or_prompt_vt_api_key()
+    app = QApplication(qt_argv)
+    app.setWindowIcon(QIcon(resource_path("resource/AOI_icon.ico")))
 
     config = AppConfig(
-        vt_api_key=vt_api_key,
+        vt_api_keys=(),
         geo_db_path=geo_db_path,
         kml_file_path=os.path.join(tempfile.gettempdir(), "target_geo_location.kml"),
         software_version=SOFTWARE_VERSION,
         geodb_version=GEODB_VERSION,
     )
 
-    window = MainWindow(config, geoip_reader)
+    window = MainWindow(
+        config,
+        geoip_reader,
+        vt_cache=open_vt_result_cache(load_vt_cache_ttl()),
+        rdap_cache=open_rdap_prefix_cache(),
+        asn_index=open_asn_index(),
+        rir_index=open_rir_index(),
+    )
     window.show()
 
+    # Keyring access, key validation and blocklist compilation must not
+    # delay the first frame.
+    QTimer.singleShot(0, lambda: window.start_vt_key_setup(force_prompt=args.reset_vt_keys))
+    QTimer.singleShot(0, window.start_texture_load)
+    QTimer.singleShot(0, window.start_tile_pyramid_load)
+    QTimer.singleShot(0, window.start_blocklist_load)
+
     sys.exit(app.exec_())
 
 
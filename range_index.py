@@ -0,0 +1,362 @@
+"""
+Building blocks for the offline, memory-mapped IPv4 range indexes
+(geoip_index.py, asn_index.py, rir_index.py, blocklist_index.py,
+ip_classifier.py) and the other files cached from a source file
+(texture_cache.py, tile_pyramid.py).
+
+A range index file is a fixed header followed by 8-byte aligned numpy
+sections (see `iter_section_offsets`): sorted, non-overlapping uint32
+`starts` / `ends`, per-range columns, and one interned UTF-8 string table.
+Files are written to a temporary name and renamed, so readers never see a
+half-written index.
+"""
+
+import io
+import os
+import gzip
+import mmap
+import hashlib
+import socket
+import struct
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+SECTION_ALIGNMENT = 8
+
+# Derived files (compiled indexes, texture caches) live in <app dir>/cache.
+INDEX_CACHE_DIR_NAME = "cache"
+
+NONE_STRING_ID = 0
+NO_RANGE = -1
+
+# Batches at least this large are searched in sorted order.
+SORTED_SEARCH_MIN_BATCH = 64
+
+_NOT_DECODED = object()
+
+
+# =============================================================================
+# Layout
+# =============================================================================
+
+def _aligned(offset: int) -> int:
+    return (offset + SECTION_ALIGNMENT - 1) // SECTION_ALIGNMENT * SECTION_ALIGNMENT
+
+
+def iter_section_offsets(header_size: int, sections: List[Tuple[str, str, int]]):
+    """
+    Yields (name, dtype, count, file offset) for (name, dtype, count) sections.
+    """
+    offset = _aligned(header_size)
+    for name, dtype, count in sections:
+        yield name, dtype, count, offset
+        offset = _aligned(offset + np.dtype(dtype).itemsize * count)
+
+
+def string_table_sections(string_count: int, blob_size: int) -> List[Tuple[str, str, int]]:
+    return [
+        ("string_offsets", "<u8", string_count + 1),
+        ("string_blob", "u1", blob_size),
+    ]
+
+
+def write_index_file(
+    index_path: str,
+    header: bytes,
+    sections: List[Tuple[str, str, int]],
+    arrays: Dict[str, np.ndarray],
+) -> None:
+    index_dir = os.path.dirname(os.path.abspath(index_path))
+    os.makedirs(index_dir, exist_ok=True)
+
+    fd, temp_path = tempfile.mkstemp(prefix=".range-", suffix=".tmp", dir=index_dir)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header)
+            for name, dtype, count, offset in iter_section_offsets(len(header), sections):
+                f.write(b"\0" * (offset - f.tell()))
+                f.write(np.ascontiguousarray(arrays[name], dtype=dtype).tobytes())
+
+        os.replace(temp_path, index_path)
+
+    except Exception:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def map_index_file(
+    index_path: str,
+    header_struct: struct.Struct,
+    sections: List[Tuple[str, str, int]],
+) -> Tuple[mmap.mmap, Dict[str, np.ndarray]]:
+    with open(index_path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    views = {
+        name: np.frombuffer(mapped, dtype=dtype, count=count, offset=offset)
+        for name, dtype, count, offset in iter_section_offsets(header_struct.size, sections)
+    }
+    return mapped, views
+
+
+def file_sha256(path: str) -> bytes:
+    """
+    Identity of the source a derived file was built from.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.digest()
+
+
+def open_dataset(path: str) -> io.TextIOBase:
+    """
+    Opens a plain or gzipped text dataset for import.
+    """
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, "r", encoding="utf-8", errors="replace")
+
+
+def read_header_bytes(index_path: str, header_struct: struct.Struct) -> Optional[tuple]:
+    try:
+        with open(index_path, "rb") as f:
+            raw = f.read(header_struct.size)
+    except OSError:
+        return None
+
+    if len(raw) != header_struct.size:
+        return None
+    return header_struct.unpack(raw)
+
+
+# =============================================================================
+# Strings
+# =============================================================================
+
+class StringInterner:
+    """
+    Assigns one id per distinct string; id 0 stands for None / empty.
+    """
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._strings: List[bytes] = [b""]
+
+    def __len__(self) -> int:
+        return len(self._strings)
+
+    def intern(self, value: Optional[str]) -> int:
+        if not value:
+            return NONE_STRING_ID
+        string_id = self._ids.get(value)
+        if string_id is None:
+            string_id = self._ids[value] = len(self._strings)
+            self._strings.append(value.encode("utf-8"))
+        return string_id
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            "string_offsets": np.concatenate(
+                ([0], np.cumsum([len(raw) for raw in self._strings], dtype=np.uint64))
+            ).astype("<u8"),
+            "string_blob": np.frombuffer(b"".join(self._strings), dtype="u1"),
+        }
+
+    @property
+    def blob_size(self) -> int:
+        return sum(len(raw) for raw in self._strings)
+
+
+class StringTable:
+    """
+    Read side of an interned string table; each id is decoded once.
+    """
+
+    def __init__(self, offsets: np.ndarray, blob: np.ndarray):
+        self.offsets = offsets
+        self.blob = blob
+        self._decoded: Dict[int, Optional[str]] = {NONE_STRING_ID: None}
+
+    def get(self, string_id: int) -> Optional[str]:
+        value = self._decoded.get(string_id, _NOT_DECODED)
+        if value is _NOT_DECODED:
+            start, end = int(self.offsets[string_id]), int(self.offsets[string_id + 1])
+            value = self._decoded[string_id] = self.blob[start:end].tobytes().decode("utf-8")
+        return value
+
+
+# =============================================================================
+# Lookup
+# =============================================================================
+
+def resolve_overlaps(starts: np.ndarray, ends: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Turns ranges sorted by start (stably), the longer range first where
+    starts are equal, into the non-overlapping table lookups need: where
+    ranges overlap, the later one wins inside its own extent and an outer
+    range continues after a nested one ends. Returns (starts, ends, rows),
+    `rows` being the input row of each piece.
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    if len(starts) < 2 or (ends[:-1] < starts[1:]).all():
+        return starts, ends, np.arange(len(starts), dtype=np.int64)
+
+    piece_starts: List[int] = []
+    piece_ends: List[int] = []
+    piece_rows: List[int] = []
+
+    # Ranges still open at the cursor, the newest (winning) one on top;
+    # each one's end is below the end of the one beneath it.
+    open_ranges: List[Tuple[int, int]] = []
+    cursor = 0
+
+    def emit_until(limit: int) -> None:
+        nonlocal cursor
+        while open_ranges and cursor < limit:
+            row, end = open_ranges[-1]
+            piece_end = min(end, limit - 1)
+            piece_starts.append(cursor)
+            piece_ends.append(piece_end)
+            piece_rows.append(row)
+            cursor = piece_end + 1
+            if end <= piece_end:
+                open_ranges.pop()
+
+    for row, (start, end) in enumerate(zip(starts.tolist(), ends.tolist())):
+        emit_until(start)
+        while open_ranges and open_ranges[-1][1] <= end:
+            open_ranges.pop()
+        open_ranges.append((row, end))
+        cursor = start
+    emit_until(1 << 32)
+
+    return (
+        np.asarray(piece_starts, dtype=np.int64),
+        np.asarray(piece_ends, dtype=np.int64),
+        np.asarray(piece_rows, dtype=np.int64),
+    )
+
+
+def lookup_range_slots(starts: np.ndarray, ends: np.ndarray, ip_nums: np.ndarray) -> np.ndarray:
+    """
+    Index of the range holding each address, NO_RANGE where none does.
+    """
+    ip_nums = np.asarray(ip_nums, dtype=np.uint32)
+
+    if not len(starts):
+        return np.full(len(ip_nums), NO_RANGE, dtype=np.int64)
+
+    if len(ip_nums) >= SORTED_SEARCH_MIN_BATCH:
+        # Sorted needles make each binary search start near the previous
+        # one, so the starts array is walked mostly forward instead of
+        # random cache misses: several times faster for large indexes.
+        order = np.argsort(ip_nums)
+        slots = np.empty(len(ip_nums), dtype=np.int64)
+        slots[order] = np.searchsorted(starts, ip_nums[order], side="right")
+        slots -= 1
+    else:
+        slots = np.searchsorted(starts, ip_nums, side="right") - 1
+    slots_clipped = np.maximum(slots, 0)
+    hit = (slots >= 0) & (ip_nums <= ends[slots_clipped])
+    return np.where(hit, slots, NO_RANGE)
+
+
+def lookup_range_slot(starts: np.ndarray, ends: np.ndarray, ip_num: int) -> int:
+    # A Python int needle would make numpy promote (copy) the whole array.
+    slot = int(np.searchsorted(starts, np.uint32(ip_num), side="right")) - 1
+    if slot < 0 or ip_num > int(ends[slot]):
+        return NO_RANGE
+    return slot
+
+
+def covering_prefix_lengths(ip_nums: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """
+    Shortest prefix length whose aligned block around each address still
+    lies inside its [start, end] range, i.e. the largest CIDR block of the
+    range that contains the address.
+    """
+    ip_nums = np.asarray(ip_nums, dtype=np.uint64)
+    starts = np.asarray(starts, dtype=np.uint64)
+    ends = np.asarray(ends, dtype=np.uint64)
+
+    prefix_lengths = np.full(len(ip_nums), 32, dtype=np.int64)
+    pending = np.ones(len(ip_nums), dtype=bool)
+
+    for prefix_len in range(33):
+        host_mask = np.uint64((1 << (32 - prefix_len)) - 1)
+        network = ip_nums & ~host_mask & np.uint64(0xFFFFFFFF)
+        fits = pending & (network >= starts) & ((network | host_mask) <= ends)
+        prefix_lengths[fits] = prefix_len
+        pending &= ~fits
+        if not pending.any():
+            break
+
+    return prefix_lengths
+
+
+def covering_prefix_length(ip_num: int, start: int, end: int) -> int:
+    """
+    Scalar `covering_prefix_lengths` for single lookups.
+    """
+    for prefix_len in range(33):
+        host_mask = (1 << (32 - prefix_len)) - 1
+        network = ip_num & ~host_mask
+        if network >= start and (network | host_mask) <= end:
+            return prefix_len
+    return 32
+
+
+def format_cidr(ip_num: int, prefix_len: int) -> str:
+    network = ip_num & ~((1 << (32 - prefix_len)) - 1) & 0xFFFFFFFF
+    return f"{network >> 24}.{(network >> 16) & 255}.{(network >> 8) & 255}.{network & 255}/{prefix_len}"
+
+
+# =============================================================================
+# Parsing
+# =============================================================================
+
+def parse_dotted_ipv4(text: str) -> Optional[int]:
+    # inet_aton also accepts shorthand like "10.1"; only dotted quads are ranges.
+    if text.count(".") != 3:
+        return None
+    try:
+        return int.from_bytes(socket.inet_aton(text), "big")
+    except OSError:
+        return None
+
+
+def parse_ipv4_range(text: str) -> Optional[Tuple[int, int]]:
+    """
+    (start, end) for "a.b.c.d", "a.b.c.d/nn" (host bits ignored) or
+    "a.b.c.d-e.f.g.h"; None for anything else (IPv6, hostnames, headers).
+    """
+    if "/" in text:
+        address, _, prefix = text.partition("/")
+        ip_num = parse_dotted_ipv4(address)
+        if ip_num is None or not prefix.isdigit() or int(prefix) > 32:
+            return None
+        host_mask = (1 << (32 - int(prefix))) - 1
+        return ip_num & ~host_mask & 0xFFFFFFFF, ip_num | host_mask
+
+    if "-" in text:
+        first, _, last = text.partition("-")
+        start, end = parse_dotted_ipv4(first.strip()), parse_dotted_ipv4(last.strip())
+        if start is None or end is None or end < start:
+            return None
+        return start, end
+
+    ip_num = parse_dotted_ipv4(text)
+    return (ip_num, ip_num) if ip_num is not None else None
@@ -0,0 +1,189 @@
+"""
+Prefix-aware cache of RDAP (ipwhois) answers, keyed by `asn_cidr`.
+
+An RDAP answer describes the whole announced prefix, so every address inside
+a cached CIDR is answered locally by longest-prefix match. Prefixes are held
+in memory as one dict per (IP version, prefix length), and persisted to a
+SQLite file next to the settings file so they survive restarts.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import ipaddress
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from app_core import get_app_dir
+
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+RDAP_CACHE_FILE_NAME = "geo_ip_tracker_rdap_cache.sqlite3"
+
+
+def get_rdap_cache_file_path() -> str:
+    return os.path.join(get_app_dir(), RDAP_CACHE_FILE_NAME)
+
+
+def parse_asn_cidrs(asn_cidr: str) -> list:
+    """
+    `asn_cidr` may hold several comma-separated prefixes, or "NA".
+    """
+    networks = []
+    for part in str(asn_cidr or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            networks.append(ipaddress.ip_network(part, strict=False))
+        except ValueError:
+            continue
+    return networks
+
+
+# =============================================================================
+# Cache
+# =============================================================================
+
+class RdapPrefixCache:
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+
+        # (version, prefix_len) -> {network_int >> host_bits: result}
+        self._tables: Dict[Tuple[int, int], Dict[int, dict]] = {}
+        # version -> prefix lengths present, longest first
+        self._prefix_lengths: Dict[int, List[int]] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+        self._conn = sqlite3.connect(db_path, timeout=5, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS rdap_prefixes (
+                    cidr       TEXT PRIMARY KEY,
+                    result     TEXT NOT NULL,
+                    fetched_at REAL NOT NULL
+                ) WITHOUT ROWID
+                """
+            )
+        self._load()
+
+    def __len__(self) -> int:
+        return sum(len(table) for table in self._tables.values())
+
+    def _load(self) -> None:
+        for cidr, result_json in self._conn.execute("SELECT cidr, result FROM rdap_prefixes"):
+            try:
+                network = ipaddress.ip_network(cidr, strict=False)
+                self._insert(network, json.loads(result_json))
+            except ValueError:
+                continue
+        logging.info("RDAP prefix cache loaded: %s (%d prefixes)", self.db_path, len(self))
+
+    def _insert(self, network, result: dict) -> None:
+        key = (network.version, network.prefixlen)
+        table = self._tables.get(key)
+        if table is None:
+            table = self._tables[key] = {}
+            lengths = self._prefix_lengths.setdefault(network.version, [])
+            lengths.append(network.prefixlen)
+            lengths.sort(reverse=True)
+
+        host_bits = network.max_prefixlen - network.prefixlen
+        table[int(network.network_address) >> host_bits] = result
+
+    def lookup(self, ip_addr: str) -> Optional[dict]:
+        """
+        Returns the cached answer of the longest cached prefix containing
+        `ip_addr`, or None.
+        """
+        try:
+            addr = ipaddress.ip_address(ip_addr)
+        except ValueError:
+            return None
+
+        addr_int = int(addr)
+        max_prefixlen = addr.max_prefixlen
+
+        with self._lock:
+            for prefix_len in self._prefix_lengths.get(addr.version, ()):
+                result = self._tables[(addr.version, prefix_len)].get(addr_int >> (max_prefixlen - prefix_len))
+                if result is not None:
+                    self.hits += 1
+                    return dict(result)
+
+            self.misses += 1
+            return None
+
+    def store(self, asn_cidr: str, result: dict) -> int:
+        """
+        Caches `result` under every prefix in `asn_cidr`; returns how many.
+        """
+        networks = parse_asn_cidrs(asn_cidr)
+        if not networks:
+            return 0
+
+        result_json = json.dumps(result, ensure_ascii=False)
+        fetched_at = time.time()
+
+        with self._lock:
+            for network in networks:
+                self._insert(network, dict(result))
+
+            try:
+                with self._conn:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO rdap_prefixes (cidr, result, fetched_at) VALUES (?, ?, ?)",
+                        [(str(network), result_json, fetched_at) for network in networks],
+                    )
+            except sqlite3.Error:
+                logging.exception("RDAP prefix cache write failed.")
+
+        return len(networks)
+
+    def stats(self) -> dict:
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "prefixes": sum(len(table) for table in self._tables.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / requests) if requests else 0.0,
+            }
+
+    def log_stats(self) -> None:
+        stats = self.stats()
+        logging.info(
+            "RDAP prefix cache stats: prefixes=%d hits=%d misses=%d hit_rate=%.1f%%",
+            stats["prefixes"],
+            stats["hits"],
+            stats["misses"],
+            stats["hit_rate"] * 100,
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            try:
+                self._conn.close()
+            except sqlite3.Error:
+                logging.exception("Failed to close RDAP prefix cache.")
+
+
+def open_rdap_prefix_cache() -> Optional[RdapPrefixCache]:
+    """
+    Opens the cache next to the settings file; None when it cannot be opened
+    (lookups then always go to RDAP).
+    """
+    try:
+        return RdapPrefixCache(get_rdap_cache_file_path())
+    except sqlite3.Error:
+        logging.exception("Failed to open RDAP prefix cache.")
+        return None
@@ -0,0 +1,203 @@
+"""
+Frame scheduling for the globe view.
+
+EarthWidget used to repaint every 20 ms for as long as the process ran,
+including while minimized or left alone. The scheduler decides how often
+to render instead:
+
+- active : full frame rate, while the user drags / zooms and for a few
+  seconds after, or after the displayed content changed
+- idle   : a low frame rate (or none) once nothing happened for a while;
+  the globe keeps turning at the same speed, in larger steps
+- paused : no frames while the window is hidden or minimized
+
+It is Qt-free: EarthWidget feeds it visibility and activity, asks it for
+the next timer interval, and reports painted frames so the measured frame
+rate can be read back.
+"""
+
+import time
+import logging
+from collections import deque
+from typing import Callable, Dict, Optional
+
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+RENDER_STATE_ACTIVE = "active"
+RENDER_STATE_IDLE = "idle"
+RENDER_STATE_PAUSED = "paused"
+RENDER_STATES = (RENDER_STATE_ACTIVE, RENDER_STATE_IDLE, RENDER_STATE_PAUSED)
+
+FPS_WINDOW_SECONDS = 2.0
+
+# Longest animation step after a pause or a stalled event loop, so the
+# globe does not jump when rendering resumes.
+MAX_ANIMATION_STEP_SECONDS = 0.25
+
+
+# =============================================================================
+# Frame rate meter
+# =============================================================================
+
+class FrameRateMeter:
+    """
+    Frames per second over the last `window_seconds` of painted frames.
+    """
+
+    def __init__(self, window_seconds: float = FPS_WINDOW_SECONDS, clock: Callable[[], float] = time.monotonic):
+        self.window_seconds = window_seconds
+        self.clock = clock
+        self._frames = deque()
+        self.total_frames = 0
+
+    def record_frame(self, now: Optional[float] = None) -> None:
+        now = self.clock() if now is None else now
+        self._frames.append(now)
+        self.total_frames += 1
+        self._expire(now)
+
+    def _expire(self, now: float) -> None:
+        while self._frames and now - self._frames[0] > self.window_seconds:
+            self._frames.popleft()
+
+    def fps(self, now: Optional[float] = None) -> float:
+        now = self.clock() if now is None else now
+        self._expire(now)
+        if len(self._frames) < 2:
+            return 0.0
+        # Measured up to now, so the rate decays once frames stop.
+        return (len(self._frames) - 1) / max(now - self._frames[0], 1e-6)
+
+
+# =============================================================================
+# Scheduler
+# =============================================================================
+
+class RenderScheduler:
+    def __init__(
+        self,
+        active_fps: float,
+        idle_fps: float,
+        idle_after_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.active_fps = active_fps
+        self.idle_fps = idle_fps  # 0 = no frames while idle
+        self.idle_after_seconds = idle_after_seconds
+        self.clock = clock
+
+        self.meter = FrameRateMeter(clock=clock)
+
+        now = clock()
+        self.visible = True
+        self._last_activity = now
+        self._last_step = None
+
+        self._state = self.state(now)
+        self._state_since = now
+        self.state_seconds: Dict[str, float] = {state: 0.0 for state in RENDER_STATES}
+        self.state_frames: Dict[str, int] = {state: 0 for state in RENDER_STATES}
+
+    # -------------------------------------------------------------------------
+    # Inputs
+    # -------------------------------------------------------------------------
+
+    def set_visible(self, visible: bool) -> None:
+        if visible and not self.visible:
+            self._last_step = None
+        self.visible = visible
+        self._update_state()
+
+    def mark_activity(self) -> None:
+        """
+        User interaction or a content change: render at full rate for the
+        next `idle_after_seconds`.
+        """
+        self._last_activity = self.clock()
+        self._update_state()
+
+    def go_idle(self) -> None:
+        self._last_activity = self.clock() - self.idle_after_seconds
+        self._update_state()
+
+    def record_frame(self) -> None:
+        now = self.clock()
+        self.meter.record_frame(now)
+        self.state_frames[self._update_state(now)] += 1
+
+    # -------------------------------------------------------------------------
+    # Decisions
+    # -------------------------------------------------------------------------
+
+    def state(self, now: Optional[float] = None) -> str:
+        now = self.clock() if now is None else now
+        if not self.visible:
+            return RENDER_STATE_PAUSED
+        if now - self._last_activity < self.idle_after_seconds:
+            return RENDER_STATE_ACTIVE
+        if self.idle_fps <= 0:
+            return RENDER_STATE_PAUSED
+        return RENDER_STATE_IDLE
+
+    def frame_interval_ms(self) -> Optional[int]:
+        """
+        Timer interval for the next frame; None while paused.
+        """
+        state = self._update_state()
+        if state == RENDER_STATE_PAUSED:
+            return None
+        fps = self.active_fps if state == RENDER_STATE_ACTIVE else self.idle_fps
+        return max(1, int(round(1000.0 / fps)))
+
+    def animation_step(self) -> float:
+        """
+        Seconds of animation to advance for the frame about to be drawn.
+        """
+        now = self.clock()
+        step = 0.0 if self._last_step is None else min(now - self._last_step, MAX_ANIMATION_STEP_SECONDS)
+        self._last_step = now
+        return step
+
+    @property
+    def fps(self) -> float:
+        return self.meter.fps()
+
+    # -------------------------------------------------------------------------
+    # Bookkeeping
+    # -------------------------------------------------------------------------
+
+    def _update_state(self, now: Optional[float] = None) -> str:
+        now = self.clock() if now is None else now
+        state = self.state(now)
+        if state != self._state:
+            self.state_seconds[self._state] += now - self._state_since
+            if state == RENDER_STATE_PAUSED:
+                self._last_step = None
+            self._state, self._state_since = state, now
+        return state
+
+    def stats(self) -> dict:
+        now = self.clock()
+        self._update_state(now)
+        seconds = dict(self.state_seconds)
+        seconds[self._state] += now - self._state_since
+        return {
+            "state": self._state,
+            "fps": self.meter.fps(now),
+            "frames": self.meter.total_frames,
+            "seconds": seconds,
+            "frames_by_state": dict(self.state_frames),
+        }
+
+    def log_stats(self) -> None:
+        stats = self.stats()
+        parts = []
+        for state in RENDER_STATES:
+            seconds = stats["seconds"][state]
+            frames = stats["frames_by_state"][state]
+            rate = frames / seconds if seconds > 0 else 0.0
+            parts.append(f"{state}={seconds:.0f}s/{frames} frames ({rate:.1f} fps)")
+        logging.info("Globe render stats: frames=%d %s", stats["frames"], " ".join(parts))
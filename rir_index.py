@@ -0,0 +1,495 @@
+"""
+Offline RIR delegation index.
+
+`python main.py import-rir` imports the regional registries'
+delegated-extended statistics files (delegated-<registry>-extended-latest,
+pipe separated: registry|cc|type|start|value|date|status|...) into a
+memory-mapped sorted-interval file next to GeoLiteCity.dat. Each allocated
+or assigned IPv4 block maps to its registry, country and allocation date,
+the `asn_registry` / `asn_date` fields otherwise only known from RDAP.
+
+The index keeps a manifest of the files it was built from. Re-running the
+import after dropping a new file into the delegation directory only parses
+registries whose file changed; the rows of the other registries are copied
+from the existing index. Besides the lookup table, where overlapping
+delegations are resolved, the index keeps every registry's rows as
+imported, so an incremental rebuild resolves overlaps from the same rows a
+full rebuild parses.
+"""
+
+import os
+import sys
+import json
+import socket
+import struct
+import logging
+import argparse
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app_core import get_geo_db_file_path, load_app_settings, setup_logging
+from geoip_bulk import ipv4_to_uint32
+from range_index import (
+    NO_RANGE,
+    file_sha256,
+    lookup_range_slot,
+    lookup_range_slots,
+    map_index_file,
+    open_dataset,
+    read_header_bytes,
+    resolve_overlaps,
+    write_index_file,
+)
+
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+RIR_INDEX_MAGIC = b"RIRIDX\0\0"
+RIR_INDEX_VERSION = 2
+RIR_INDEX_FILE_NAME = "rir_delegations.idx"
+RIR_DELEGATION_DIR_NAME = "rir"
+
+# Override the default index / delegation directory (next to GeoLiteCity.dat).
+RIR_INDEX_PATH_SETTING_KEY = "rir_index_path"
+RIR_DELEGATION_DIR_SETTING_KEY = "rir_delegation_dir"
+
+# magic, version, range_count, raw_count, manifest_size
+RIR_INDEX_HEADER = struct.Struct("<8sIIII")
+
+RIR_RECORD_STATUSES = ("allocated", "assigned")
+DATASET_SUFFIXES = (".md5", ".asc", ".sha256")
+
+DelegationRow = Tuple[int, int, str, int]
+
+
+def get_default_rir_index_path() -> str:
+    return os.path.join(os.path.dirname(get_geo_db_file_path()), RIR_INDEX_FILE_NAME)
+
+
+def get_rir_index_file_path() -> str:
+    return load_app_settings().get(RIR_INDEX_PATH_SETTING_KEY) or get_default_rir_index_path()
+
+
+def get_rir_delegation_dir() -> str:
+    return load_app_settings().get(RIR_DELEGATION_DIR_SETTING_KEY) or os.path.join(
+        os.path.dirname(get_geo_db_file_path()), RIR_DELEGATION_DIR_NAME
+    )
+
+
+RIR_COLUMNS = (("starts", "<u4"), ("ends", "<u4"), ("source", "<u2"), ("date", "<u4"), ("country", "S2"))
+
+
+def rir_index_sections(range_count: int, raw_count: int, manifest_size: int) -> List[Tuple[str, str, int]]:
+    """
+    Lookup table (overlaps resolved), then the rows as imported ("raw_*").
+    """
+    return (
+        [(name, dtype, range_count) for name, dtype in RIR_COLUMNS]
+        + [("raw_" + name, dtype, raw_count) for name, dtype in RIR_COLUMNS]
+        + [("manifest", "u1", manifest_size)]
+    )
+
+
+def format_delegation_date(date: int) -> Optional[str]:
+    """
+    YYYYMMDD -> "YYYY-MM-DD" (the RDAP `asn_date` format); None for 0.
+    """
+    if not date:
+        return None
+    return f"{date // 10000:04d}-{date // 100 % 100:02d}-{date % 100:02d}"
+
+
+# =============================================================================
+# Delegation files
+# =============================================================================
+
+def _parse_date(text: str) -> int:
+    return int(text) if len(text) == 8 and text.isdigit() else 0
+
+
+def read_delegation_file_info(path: str) -> Optional[dict]:
+    """
+    Registry and end date from the version line of a delegated-extended
+    file, or None when it is not one.
+    """
+    try:
+        with open_dataset(path) as f:
+            for line in f:
+                if not line.strip() or line.startswith("#"):
+                    continue
+                fields = line.rstrip("\r\n").split("|")
+                if len(fields) < 6 or not fields[0].replace(".", "").isdigit():
+                    return None
+                return {
+                    "registry": fields[1].lower(),
+                    "date": _parse_date(fields[5]) or _parse_date(fields[2]),
+                }
+    except (OSError, EOFError, UnicodeError):
+        logging.exception("Failed to read delegation file: %s", path)
+    return None
+
+
+def iter_delegation_rows(lines: Iterable[str]) -> Iterator[DelegationRow]:
+    """
+    Yields (start, end, country_code, YYYYMMDD date) for every allocated or
+    assigned IPv4 record. Version, summary and malformed lines are skipped.
+    """
+    for line in lines:
+        if line.startswith("#"):
+            continue
+
+        fields = line.rstrip("\r\n").split("|")
+        if len(fields) < 7 or fields[2] != "ipv4" or fields[6] not in RIR_RECORD_STATUSES:
+            continue
+
+        try:
+            start = int.from_bytes(bytes(int(part) for part in fields[3].split(".")), "big")
+            count = int(fields[4])
+        except ValueError:
+            continue
+        if count <= 0 or len(fields[3].split(".")) != 4:
+            continue
+
+        end = min(start + count - 1, 0xFFFFFFFF)
+        country_code = fields[1].upper() if len(fields[1]) == 2 else ""
+
+        yield start, end, country_code, _parse_date(fields[5])
+
+
+def find_delegation_files(paths: Iterable[str]) -> Dict[str, dict]:
+    """
+    Newest delegated-extended file per registry among `paths` (files or
+    directories), as {registry: {"path", "date", "size", "mtime_ns"}}.
+    """
+    candidates = []
+    for path in paths:
+        if os.path.isdir(path):
+            candidates.extend(
+                os.path.join(path, name)
+                for name in sorted(os.listdir(path))
+                if not name.startswith(".") and not name.endswith(DATASET_SUFFIXES)
+            )
+        else:
+            candidates.append(path)
+
+    newest: Dict[str, dict] = {}
+    for path in candidates:
+        if not os.path.isfile(path):
+            continue
+        info = read_delegation_file_info(path)
+        if info is None:
+            logging.info("Skipping non-delegation file: %s", path)
+            continue
+
+        stat = os.stat(path)
+        info.update(path=os.path.abspath(path), size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+
+        current = newest.get(info["registry"])
+        if current is None or (info["date"], info["mtime_ns"]) > (current["date"], current["mtime_ns"]):
+            newest[info["registry"]] = info
+
+    return newest
+
+
+def _source_unchanged(source: dict, previous: Optional[dict]) -> bool:
+    if previous is None:
+        return False
+    if (source["path"], source["size"], source["mtime_ns"]) == (
+        previous["path"], previous["size"], previous["mtime_ns"]
+    ):
+        return True
+    # Touched, renamed or copied again: compare contents.
+    return source["size"] == previous["size"] and file_sha256(source["path"]).hex() == previous["sha256"]
+
+
+# =============================================================================
+# Import
+# =============================================================================
+
+def _rows_to_columns(rows: List[DelegationRow]) -> Dict[str, np.ndarray]:
+    return {
+        "starts": np.asarray([row[0] for row in rows], dtype=np.int64),
+        "ends": np.asarray([row[1] for row in rows], dtype=np.int64),
+        "country": np.asarray([row[2] for row in rows], dtype="S2"),
+        "date": np.asarray([row[3] for row in rows], dtype="<u4"),
+    }
+
+
+def build_rir_index(
+    paths: Iterable[str],
+    index_path: str,
+    full: bool = False,
+) -> dict:
+    """
+    Incrementally (re)builds the index from the newest delegation file per
+    registry in `paths`. Registries whose file is unchanged are copied from
+    the existing index; registries not found in `paths` are kept. With
+    `full` every file is parsed and only registries in `paths` remain.
+    Returns {"ranges", "parsed", "reused", "dropped", "written"}.
+    """
+    sources = find_delegation_files(paths)
+
+    previous = open_rir_index(index_path) if os.path.isfile(index_path) else None
+    previous_by_registry = {
+        source["registry"]: (source_id, source)
+        for source_id, source in enumerate(previous.manifest)
+    } if previous is not None else {}
+
+    imported: List[Tuple[dict, Dict[str, np.ndarray]]] = []
+    parsed: List[str] = []
+    reused: List[str] = []
+
+    def add_source(source: dict, source_columns: Dict[str, np.ndarray]) -> None:
+        imported.append((dict(source, range_count=len(source_columns["starts"])), source_columns))
+
+    for registry, source in sorted(sources.items()):
+        source_id, previous_source = previous_by_registry.pop(registry, (None, None))
+
+        if not full and _source_unchanged(source, previous_source):
+            add_source(dict(source, sha256=previous_source["sha256"]), previous.source_columns(source_id))
+            reused.append(registry)
+            continue
+
+        with open_dataset(source["path"]) as f:
+            rows = list(iter_delegation_rows(f))
+        add_source(dict(source, sha256=file_sha256(source["path"]).hex()), _rows_to_columns(rows))
+        parsed.append(registry)
+
+    # Registries that were imported before but have no file this time.
+    dropped = sorted(previous_by_registry) if full else []
+    if not full:
+        for registry, (source_id, previous_source) in sorted(previous_by_registry.items()):
+            add_source(previous_source, previous.source_columns(source_id))
+            reused.append(registry)
+
+    if previous is not None:
+        # Release the mapping before the file is replaced (required on Windows).
+        previous.close()
+
+    # Source ids in registry order, whichever sources were reused: an
+    # incremental build then equals a full build of the same files.
+    imported.sort(key=lambda entry: entry[0]["registry"])
+    manifest = [source for source, _source_columns in imported]
+    columns = [source_columns for _source, source_columns in imported]
+    for source_id, source_columns in enumerate(columns):
+        source_columns["source"] = np.full(len(source_columns["starts"]), source_id, dtype="<u2")
+
+    result = {
+        "ranges": sum(source["range_count"] for source in manifest),
+        "parsed": parsed,
+        "reused": reused,
+        "dropped": dropped,
+        "written": False,
+    }
+
+    if not manifest:
+        return result
+    if not parsed and not dropped and previous is not None:
+        logging.info("RIR index is up to date: %s", index_path)
+        return result
+
+    raw = {
+        name: np.concatenate([source_columns[name] for source_columns in columns])
+        for name, _dtype in RIR_COLUMNS
+    }
+    # By start, the longer range first: a nested range sharing its start
+    # with an enclosing one must come after it to win inside its extent.
+    order = np.lexsort((-raw["ends"].astype(np.int64), raw["starts"]))
+    raw = {name: values[order] for name, values in raw.items()}
+
+    # Overlaps (transfers listed by two registries, nested assignments):
+    # the later range wins inside its extent, an enclosing range resumes
+    # after it.
+    starts, ends, rows = resolve_overlaps(raw["starts"], raw["ends"])
+    arrays = {"starts": starts, "ends": ends}
+    arrays.update({name: raw[name][rows] for name in ("source", "date", "country")})
+    arrays.update({"raw_" + name: values for name, values in raw.items()})
+
+    manifest_blob = json.dumps(manifest, sort_keys=True).encode("utf-8")
+    arrays["manifest"] = np.frombuffer(manifest_blob, dtype="u1")
+    range_count = len(starts)
+    raw_count = len(order)
+
+    write_index_file(
+        index_path,
+        RIR_INDEX_HEADER.pack(RIR_INDEX_MAGIC, RIR_INDEX_VERSION, range_count, raw_count, len(manifest_blob)),
+        rir_index_sections(range_count, raw_count, len(manifest_blob)),
+        arrays,
+    )
+
+    logging.info(
+        "RIR index written: %s (%d ranges; parsed: %s; reused: %s; dropped: %s)",
+        index_path,
+        range_count,
+        ", ".join(parsed) or "-",
+        ", ".join(reused) or "-",
+        ", ".join(dropped) or "-",
+    )
+
+    return dict(result, ranges=range_count, written=True)
+
+
+def read_rir_index_header(index_path: str) -> Optional[dict]:
+    fields = read_header_bytes(index_path, RIR_INDEX_HEADER)
+    if fields is None:
+        return None
+
+    magic, version, range_count, raw_count, manifest_size = fields
+    if magic != RIR_INDEX_MAGIC or version != RIR_INDEX_VERSION:
+        return None
+
+    return {"range_count": range_count, "raw_count": raw_count, "manifest_size": manifest_size}
+
+
+# =============================================================================
+# Reader
+# =============================================================================
+
+class RirIndex:
+    def __init__(self, index_path: str):
+        header = read_rir_index_header(index_path)
+        if header is None:
+            raise ValueError(f"Not a compatible RIR index: {index_path}")
+
+        self.index_path = index_path
+        self.header = header
+
+        self._mmap, views = map_index_file(
+            index_path,
+            RIR_INDEX_HEADER,
+            rir_index_sections(header["range_count"], header["raw_count"], header["manifest_size"]),
+        )
+        self.views = views
+        self.starts = views["starts"]
+        self.ends = views["ends"]
+        self.sources = views["source"]
+        self.dates = views["date"]
+        self.countries = views["country"]
+
+        self.manifest: List[dict] = json.loads(views["manifest"].tobytes().decode("utf-8"))
+        self.registries = [source["registry"] for source in self.manifest]
+        self._formatted_dates: Dict[int, Optional[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def close(self) -> None:
+        self.starts = self.ends = self.sources = self.dates = self.countries = self.views = None
+        self._mmap.close()
+
+    def source_columns(self, source_id: int) -> Dict[str, np.ndarray]:
+        """
+        Copies of the rows imported from one manifest entry, before
+        overlaps with other entries were resolved.
+        """
+        mask = self.views["raw_source"] == source_id
+        return {
+            "starts": self.views["raw_starts"][mask].astype(np.int64),
+            "ends": self.views["raw_ends"][mask].astype(np.int64),
+            "country": self.views["raw_country"][mask].copy(),
+            "date": self.views["raw_date"][mask].copy(),
+        }
+
+    def _record(self, slot: int) -> dict:
+        date = int(self.dates[slot])
+        formatted = self._formatted_dates.get(date)
+        if formatted is None:
+            formatted = self._formatted_dates[date] = format_delegation_date(date)
+
+        return {
+            "asn_registry": self.registries[int(self.sources[slot])],
+            "asn_date": formatted,
+            "rir_country_code": self.countries[slot].decode("ascii") or None,
+        }
+
+    def lookup_one(self, ip_addr: str) -> Optional[dict]:
+        """
+        Registry, allocation date and country for one IPv4 address, or None
+        when no delegation covers it.
+        """
+        try:
+            ip_num = int.from_bytes(socket.inet_aton(ip_addr), "big")
+        except OSError:
+            return None
+
+        slot = lookup_range_slot(self.starts, self.ends, ip_num)
+        return self._record(slot) if slot != NO_RANGE else None
+
+    def lookup(self, ip_addrs: List[str]) -> List[Optional[dict]]:
+        """
+        Vectorized `lookup_one` over a list of IPv4 strings.
+        """
+        ip_nums, valid = ipv4_to_uint32(ip_addrs)
+        slots = lookup_range_slots(self.starts, self.ends, ip_nums)
+        slots[~valid] = NO_RANGE
+
+        return [self._record(slot) if slot != NO_RANGE else None for slot in slots.tolist()]
+
+
+def open_rir_index(index_path: Optional[str] = None) -> Optional[RirIndex]:
+    """
+    Opens the offline RIR index; None when none was imported.
+    """
+    index_path = index_path or get_rir_index_file_path()
+
+    if not os.path.isfile(index_path):
+        logging.info("No offline RIR index at %s", index_path)
+        return None
+
+    try:
+        index = RirIndex(index_path)
+    except (OSError, ValueError):
+        logging.exception("Failed to open RIR index: %s", index_path)
+        return None
+
+    logging.info("RIR index opened: %s (%d ranges, %s)", index_path, len(index), ", ".join(index.registries))
+    return index
+
+
+# =============================================================================
+# Entrypoint (`python main.py import-rir`)
+# =============================================================================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="main.py import-rir",
+        description="Import RIR delegated-extended statistics files into the offline RIR index. "
+                    "Only registries whose file changed are re-parsed.",
+    )
+    parser.add_argument(
+        "paths", nargs="*",
+        help="Delegation files or directories (default: the `rir` directory next to GeoLiteCity.dat).",
+    )
+    parser.add_argument("-o", "--output", default=None, help="Index path (default: next to GeoLiteCity.dat).")
+    parser.add_argument(
+        "--full", action="store_true",
+        help="Rebuild from the given files only, dropping registries that are not among them.",
+    )
+    args = parser.parse_args(argv)
+
+    setup_logging()
+
+    paths = args.paths or [get_rir_delegation_dir()]
+    missing = [path for path in paths if not os.path.exists(path)]
+    if missing:
+        print(f"Not found: {', '.join(missing)}", file=sys.stderr)
+        return 1
+
+    index_path = args.output or get_rir_index_file_path()
+    result = build_rir_index(paths, index_path, full=args.full)
+
+    if not result["parsed"] and not result["reused"]:
+        print(f"No delegated-extended files found in: {', '.join(paths)}", file=sys.stderr)
+        return 1
+
+    status = "written" if result["written"] else "up to date"
+    print(
+        f"RIR index {status}: {index_path} ({result['ranges']} ranges; "
+        f"parsed: {', '.join(result['parsed']) or '-'}; reused: {', '.join(result['reused']) or '-'}"
+        + (f"; dropped: {', '.join(result['dropped'])}" if result["dropped"] else "")
+        + ")"
+    )
+    return 0
@@ -0,0 +1,243 @@
+"""
+Health tracking of the online enrichment services (RDAP, VirusTotal).
+
+Each service has a circuit breaker. After `failure_threshold` consecutive
+network failures it opens: calls fail at once with ServiceUnavailableError
+instead of waiting for connect/read timeouts, and a background probe checks
+the service again with exponential backoff. A successful probe (or trial
+call) closes the breaker. Health changes are reported to listeners so the
+GUI can show a degraded-mode indicator.
+
+Breakers live on the enrichment event loop and are not thread-safe.
+"""
+
+import time
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional
+
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+SERVICE_GEOIP = "geoip"
+SERVICE_RDAP = "rdap"
+SERVICE_VT = "virustotal"
+
+SERVICE_DISPLAY_NAMES = {
+    SERVICE_GEOIP: "GeoIP",
+    SERVICE_RDAP: "RDAP",
+    SERVICE_VT: "VirusTotal",
+}
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+FAILURE_THRESHOLD = 3
+PROBE_INITIAL_SECONDS = 15.0
+PROBE_MAX_SECONDS = 300.0
+PROBE_TIMEOUT_SECONDS = 5.0
+
+ProbeCallback = Callable[[], Awaitable[None]]
+HealthListener = Callable[[dict], None]
+
+
+class ServiceUnavailableError(Exception):
+    """
+    Raised instead of calling a service whose circuit breaker is open.
+    """
+
+    def __init__(self, service: str, retry_in: float):
+        super().__init__(f"{service} is unavailable (next check in {retry_in:.0f} s)")
+        self.service = service
+        self.retry_in = retry_in
+
+
+# =============================================================================
+# Circuit breaker
+# =============================================================================
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        service: str,
+        probe: Optional[ProbeCallback] = None,
+        failure_threshold: int = FAILURE_THRESHOLD,
+        probe_initial_seconds: float = PROBE_INITIAL_SECONDS,
+        probe_max_seconds: float = PROBE_MAX_SECONDS,
+    ):
+        self.service = service
+        self.probe = probe
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.probe_initial_seconds = probe_initial_seconds
+        self.probe_max_seconds = probe_max_seconds
+
+        self.state = STATE_CLOSED
+        self.consecutive_failures = 0
+        self.next_probe_at = 0.0
+        self._probe_delay = probe_initial_seconds
+        self._probe_task: Optional[asyncio.Task] = None
+        self._trial_in_flight = False
+
+        self.short_circuited = 0
+        self.trips = 0
+
+    # -------------------------------------------------------------------------
+    # Calls
+    # -------------------------------------------------------------------------
+
+    def retry_in(self) -> float:
+        return max(0.0, self.next_probe_at - time.monotonic())
+
+    def check(self) -> None:
+        """
+        Raises ServiceUnavailableError when the call must not be made.
+        In half-open state exactly one trial call is let through.
+        """
+        if self.state == STATE_CLOSED:
+            return
+
+        if self.state == STATE_HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return
+
+        self.short_circuited += 1
+        raise ServiceUnavailableError(self.service, self.retry_in())
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+        self._trial_in_flight = False
+        if self.state != STATE_CLOSED:
+            self._close()
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        self._trial_in_flight = False
+
+        if self.state == STATE_HALF_OPEN:
+            self._open(backoff=True)
+        elif self.state == STATE_CLOSED and self.consecutive_failures >= self.failure_threshold:
+            self._open(backoff=False)
+
+    def record_cancelled(self) -> None:
+        """
+        A trial call was cancelled before it told us anything.
+        """
+        self._trial_in_flight = False
+
+    # -------------------------------------------------------------------------
+    # State changes
+    # -------------------------------------------------------------------------
+
+    def _open(self, backoff: bool) -> None:
+        if backoff:
+            self._probe_delay = min(self.probe_max_seconds, self._probe_delay * 2)
+        else:
+            self._probe_delay = self.probe_initial_seconds
+            self.trips += 1
+            logging.warning(
+                "%s marked unavailable after %d consecutive failures.",
+                SERVICE_DISPLAY_NAMES.get(self.service, self.service),
+                self.consecutive_failures,
+            )
+
+        self.state = STATE_OPEN
+        self.next_probe_at = time.monotonic() + self._probe_delay
+        if self._probe_task is None or self._probe_task.done():
+            self._probe_task = asyncio.ensure_future(self._probe_loop())
+        _notify(self)
+
+    def _close(self) -> None:
+        self.state = STATE_CLOSED
+        self.next_probe_at = 0.0
+        self._probe_delay = self.probe_initial_seconds
+        if self._probe_task is not None and self._probe_task is not asyncio.current_task():
+            self._probe_task.cancel()
+        self._probe_task = None
+        logging.info("%s is reachable again.", SERVICE_DISPLAY_NAMES.get(self.service, self.service))
+        _notify(self)
+
+    async def _probe_loop(self) -> None:
+        while self.state != STATE_CLOSED:
+            await asyncio.sleep(self.retry_in())
+
+            if self.probe is None:
+                # No cheap probe: let the next real call be the trial.
+                self.state = STATE_HALF_OPEN
+                _notify(self)
+                return
+
+            try:
+                await asyncio.wait_for(self.probe(), PROBE_TIMEOUT_SECONDS)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.info(
+                    "%s probe failed (%s); next check in %.0f s.",
+                    SERVICE_DISPLAY_NAMES.get(self.service, self.service),
+                    e.__class__.__name__,
+                    min(self.probe_max_seconds, self._probe_delay * 2),
+                )
+                self._open(backoff=True)
+                continue
+
+            self._close()
+            return
+
+    def snapshot(self) -> dict:
+        return {
+            "service": self.service,
+            "state": self.state,
+            "retry_in": self.retry_in(),
+        }
+
+    def log_stats(self) -> None:
+        logging.info(
+            "%s circuit breaker: state=%s trips=%d short_circuited=%d",
+            SERVICE_DISPLAY_NAMES.get(self.service, self.service),
+            self.state,
+            self.trips,
+            self.short_circuited,
+        )
+
+
+# =============================================================================
+# Registry
+# =============================================================================
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_listeners: List[HealthListener] = []
+
+
+def get_circuit_breaker(service: str) -> CircuitBreaker:
+    breaker = _breakers.get(service)
+    if breaker is None:
+        breaker = _breakers[service] = CircuitBreaker(service)
+    return breaker
+
+
+def set_service_probe(service: str, probe: ProbeCallback) -> None:
+    get_circuit_breaker(service).probe = probe
+
+
+def add_health_listener(listener: HealthListener) -> None:
+    """
+    `listener(snapshot)` is called on the loop thread on every state change.
+    """
+    _listeners.append(listener)
+
+
+def _notify(breaker: CircuitBreaker) -> None:
+    snapshot = breaker.snapshot()
+    for listener in list(_listeners):
+        try:
+            listener(snapshot)
+        except Exception:
+            logging.exception("Service health listener failed.")
+
+
+def log_health_stats() -> None:
+    for breaker in _breakers.values():
+        breaker.log_stats()
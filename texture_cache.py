@@ -0,0 +1,224 @@
+"""
+Disk cache of the decoded Earth texture.
+
+The first start decodes the JPEG once, in the orientation the globe mesh
+expects (rotated 180 degrees, i.e. flipped top-bottom and left-right),
+converts it to RGB, builds the full mipmap chain (2x2 box filter) and
+writes all levels raw into one memory-mappable file in the app cache
+directory. Later starts map that file and hand the levels straight to
+glTexImage2D: no JPEG decoding, flipping, conversion or mipmap generation.
+
+Like the compiled GeoDB index, the cache records the size, mtime and
+SHA-256 of the source image and is rebuilt when the image changes.
+Nothing here touches OpenGL, so it runs on a worker thread.
+"""
+
+import os
+import mmap
+import time
+import struct
+import logging
+from typing import List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from app_core import get_app_dir
+from range_index import INDEX_CACHE_DIR_NAME, file_sha256, map_index_file, read_header_bytes, write_index_file
+
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+TEXTURE_CACHE_MAGIC = b"TEXMIP\0\0"
+TEXTURE_CACHE_VERSION = 1
+TEXTURE_CACHE_SUFFIX = ".mip"
+
+TEXTURE_CHANNELS = 3  # RGB
+
+# magic, version, source_sha256, source_size, source_mtime_ns, width, height, level_count
+TEXTURE_CACHE_HEADER = struct.Struct("<8sI32sQqIII")
+
+
+# =============================================================================
+# Layout
+# =============================================================================
+
+def get_default_texture_cache_path(texture_path: str) -> str:
+    return os.path.join(get_app_dir(), INDEX_CACHE_DIR_NAME, os.path.basename(texture_path) + TEXTURE_CACHE_SUFFIX)
+
+
+def mip_level_sizes(width: int, height: int) -> List[Tuple[int, int]]:
+    """
+    (width, height) of every mipmap level down to 1x1, as OpenGL sizes them.
+    """
+    sizes = [(width, height)]
+    while width > 1 or height > 1:
+        width, height = max(1, width // 2), max(1, height // 2)
+        sizes.append((width, height))
+    return sizes
+
+
+def texture_cache_sections(width: int, height: int) -> List[Tuple[str, str, int]]:
+    return [
+        (f"level_{number}", "u1", level_width * level_height * TEXTURE_CHANNELS)
+        for number, (level_width, level_height) in enumerate(mip_level_sizes(width, height))
+    ]
+
+
+# =============================================================================
+# Texture levels
+# =============================================================================
+
+class TextureLevels:
+    """
+    The mipmap chain as (height, width, 3) uint8 arrays, level 0 first;
+    `source` is "cache" (memory-mapped) or "decoded".
+    """
+
+    def __init__(self, levels: List[np.ndarray], source: str, mapped: Optional[mmap.mmap] = None):
+        self.levels = levels
+        self.source = source
+        self._mapped = mapped
+
+    @property
+    def width(self) -> int:
+        return self.levels[0].shape[1]
+
+    @property
+    def height(self) -> int:
+        return self.levels[0].shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(level.nbytes for level in self.levels)
+
+    def close(self) -> None:
+        """
+        Releases the mapping once the levels are uploaded.
+        """
+        self.levels = []
+        if self._mapped is not None:
+            try:
+                self._mapped.close()
+            except BufferError:
+                # Still referenced by a view; released with it.
+                pass
+            self._mapped = None
+
+
+def decode_texture_levels(texture_path: str) -> TextureLevels:
+    with Image.open(texture_path) as image:
+        image = image.transpose(Image.ROTATE_180).convert("RGB")
+
+    levels = [np.asarray(image)]
+    for level_width, level_height in mip_level_sizes(image.width, image.height)[1:]:
+        image = image.resize((level_width, level_height), Image.BOX)
+        levels.append(np.asarray(image))
+    return TextureLevels(levels, "decoded")
+
+
+# =============================================================================
+# Cache file
+# =============================================================================
+
+def read_texture_cache_header(cache_path: str) -> Optional[dict]:
+    raw = read_header_bytes(cache_path, TEXTURE_CACHE_HEADER)
+    if raw is None:
+        return None
+
+    magic, version, source_sha256, source_size, source_mtime_ns, width, height, level_count = raw
+    if magic != TEXTURE_CACHE_MAGIC or version != TEXTURE_CACHE_VERSION:
+        return None
+
+    return {
+        "source_sha256": source_sha256,
+        "source_size": source_size,
+        "source_mtime_ns": source_mtime_ns,
+        "width": width,
+        "height": height,
+        "level_count": level_count,
+    }
+
+
+def is_texture_cache_current(header: Optional[dict], texture_path: str) -> bool:
+    """
+    Size + mtime is the fast path; on an mtime change (e.g. a fresh
+    PyInstaller extraction) the SHA-256 of the source decides.
+    """
+    if header is None:
+        return False
+
+    stat = os.stat(texture_path)
+    if header["source_size"] != stat.st_size:
+        return False
+    if header["source_mtime_ns"] == stat.st_mtime_ns:
+        return True
+
+    return header["source_sha256"] == file_sha256(texture_path)
+
+
+def write_texture_cache(cache_path: str, texture_path: str, texture: TextureLevels) -> None:
+    stat = os.stat(texture_path)
+    header = TEXTURE_CACHE_HEADER.pack(
+        TEXTURE_CACHE_MAGIC,
+        TEXTURE_CACHE_VERSION,
+        file_sha256(texture_path),
+        stat.st_size,
+        stat.st_mtime_ns,
+        texture.width,
+        texture.height,
+        len(texture.levels),
+    )
+    arrays = {f"level_{number}": level.reshape(-1) for number, level in enumerate(texture.levels)}
+    write_index_file(cache_path, header, texture_cache_sections(texture.width, texture.height), arrays)
+
+
+def map_texture_cache(cache_path: str, header: dict) -> TextureLevels:
+    width, height = header["width"], header["height"]
+    sizes = mip_level_sizes(width, height)
+    if header["level_count"] != len(sizes):
+        raise ValueError(f"Texture cache has {header['level_count']} levels, expected {len(sizes)}.")
+
+    mapped, views = map_index_file(cache_path, TEXTURE_CACHE_HEADER, texture_cache_sections(width, height))
+    levels = [
+        views[f"level_{number}"].reshape(level_height, level_width, TEXTURE_CHANNELS)
+        for number, (level_width, level_height) in enumerate(sizes)
+    ]
+    return TextureLevels(levels, "cache", mapped)
+
+
+def load_or_build_texture_cache(texture_path: str, cache_path: Optional[str] = None) -> TextureLevels:
+    """
+    The texture's mipmap chain, memory-mapped from the cache when it is
+    current, otherwise decoded (and cached for the next start).
+    """
+    cache_path = cache_path or get_default_texture_cache_path(texture_path)
+    started = time.perf_counter()
+
+    header = read_texture_cache_header(cache_path)
+    if is_texture_cache_current(header, texture_path):
+        try:
+            texture = map_texture_cache(cache_path, header)
+        except (OSError, ValueError):
+            logging.exception("Failed to map texture cache, decoding again: %s", cache_path)
+        else:
+            logging.info(
+                "Earth texture mapped from cache in %.1f ms: %s (%dx%d, %d levels)",
+                (time.perf_counter() - started) * 1000, cache_path, texture.width, texture.height, len(texture.levels),
+            )
+            return texture
+
+    texture = decode_texture_levels(texture_path)
+    decoded_ms = (time.perf_counter() - started) * 1000
+    try:
+        write_texture_cache(cache_path, texture_path, texture)
+    except OSError:
+        logging.exception("Failed to write texture cache: %s", cache_path)
+
+    logging.info(
+        "Earth texture decoded in %.1f ms and cached: %s (%dx%d, %d levels)",
+        decoded_ms, cache_path, texture.width, texture.height, len(texture.levels),
+    )
+    return texture
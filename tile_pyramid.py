@@ -0,0 +1,397 @@
+"""
+Tiled level-of-detail pyramid of the Earth texture.
+
+A single globe texture is either blurry when zoomed in or too large for GPU
+memory and start-up. The detail image (the bundled Earth texture, or a
+larger equirectangular image set with "globe_detail_texture") is cut into
+square tiles for every mipmap level wider than the overview texture and
+stored raw, pre-flipped like texture_cache, in one memory-mapped tile file
+in the app cache directory. The file is rebuilt when the image changes.
+
+This module also decides what to stream: the level whose texel density
+matches the screen at the current zoom, and the tiles of that level that
+face the camera and fall inside the view. It is numpy-only; the GPU side
+(tile textures, LRU budget, drawing) lives in globe_tiles.
+
+Tile keys are (level, x, y): level 0 is the coarsest tile level, x counts
+tiles along s (longitude), y along t, both as in the globe's texture
+coordinates.
+"""
+
+import os
+import math
+import time
+import struct
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app_core import get_app_dir, load_app_settings
+from range_index import INDEX_CACHE_DIR_NAME, file_sha256, map_index_file, read_header_bytes, write_index_file
+from texture_cache import TEXTURE_CHANNELS, decode_texture_levels, is_texture_cache_current, mip_level_sizes
+
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+TILE_PYRAMID_MAGIC = b"TEXTILE\0"
+TILE_PYRAMID_VERSION = 1
+TILE_PYRAMID_SUFFIX = ".tiles"
+
+TILE_SIZE = 256
+
+# Widest overview texture kept resident while tiles supply the detail.
+OVERVIEW_MAX_WIDTH = 2048
+
+GLOBE_DETAIL_TEXTURE_SETTING_KEY = "globe_detail_texture"
+GLOBE_TILE_MEMORY_SETTING_KEY = "globe_tile_memory_mb"  # 0 = no tiles
+DEFAULT_GLOBE_TILE_MEMORY_MB = 64
+
+# magic, version, source_sha256, source_size, source_mtime_ns, width, height, tile_size, overview_width, level_count
+TILE_PYRAMID_HEADER = struct.Struct("<8sI32sQqIIIII")
+
+# Points per tile edge tested against the view.
+TILE_SAMPLES = 3
+
+TileKey = Tuple[int, int, int]
+
+
+# =============================================================================
+# Settings
+# =============================================================================
+
+def get_detail_texture_path(default_path: str) -> str:
+    return load_app_settings().get(GLOBE_DETAIL_TEXTURE_SETTING_KEY) or default_path
+
+
+def load_tile_memory_budget() -> int:
+    """
+    GPU memory for detail tiles in bytes (0 = tiles disabled).
+    """
+    value = load_app_settings().get(GLOBE_TILE_MEMORY_SETTING_KEY, DEFAULT_GLOBE_TILE_MEMORY_MB)
+    try:
+        megabytes = float(value)
+    except (TypeError, ValueError):
+        megabytes = -1
+
+    if megabytes < 0:
+        logging.warning("Invalid %s %r, using %d.", GLOBE_TILE_MEMORY_SETTING_KEY, value, DEFAULT_GLOBE_TILE_MEMORY_MB)
+        megabytes = DEFAULT_GLOBE_TILE_MEMORY_MB
+    return int(megabytes * 1024 * 1024)
+
+
+def get_default_tile_pyramid_path(source_path: str) -> str:
+    return os.path.join(get_app_dir(), INDEX_CACHE_DIR_NAME, os.path.basename(source_path) + TILE_PYRAMID_SUFFIX)
+
+
+# =============================================================================
+# Geometry
+# =============================================================================
+
+def sphere_points(s: np.ndarray, t: np.ndarray) -> np.ndarray:
+    """
+    Unit-sphere positions of texture coordinates, laid out like the globe
+    mesh (globe_render.build_sphere_mesh).
+    """
+    theta = 2.0 * math.pi * np.asarray(s, dtype=np.float64)
+    rho = math.pi * (1.0 - np.asarray(t, dtype=np.float64))
+    return np.stack([-np.sin(theta) * np.sin(rho), np.cos(theta) * np.sin(rho), np.cos(rho)], axis=-1)
+
+
+def pixels_per_radian(viewport_height: int, field_of_view: float, camera_distance: float) -> float:
+    """
+    Screen pixels per radian of globe surface at the point facing the camera.
+    """
+    focal = (viewport_height / 2.0) / math.tan(math.radians(field_of_view) / 2.0)
+    return focal / max(camera_distance - 1.0, 1e-3)
+
+
+def tile_pyramid_level_sizes(width: int, height: int, overview_width: int) -> List[Tuple[int, int]]:
+    """
+    Sizes of the tiled levels, coarsest first: every mipmap level of the
+    image wider than the overview texture.
+    """
+    return [size for size in mip_level_sizes(width, height) if size[0] > overview_width][::-1]
+
+
+def tile_pyramid_sections(level_sizes: List[Tuple[int, int]], tile_size: int) -> List[Tuple[str, str, int]]:
+    tile_bytes = tile_size * tile_size * TEXTURE_CHANNELS
+    return [
+        (f"level_{number}", "u1", -(-width // tile_size) * -(-height // tile_size) * tile_bytes)
+        for number, (width, height) in enumerate(level_sizes)
+    ]
+
+
+def cut_tiles(level: np.ndarray, tile_size: int) -> np.ndarray:
+    """
+    (rows * cols, tile, tile, 3) tiles, row-major by y then x; edge tiles
+    are padded by repeating their last row / column.
+    """
+    height, width = level.shape[:2]
+    rows, cols = -(-height // tile_size), -(-width // tile_size)
+    padded = np.pad(level, ((0, rows * tile_size - height), (0, cols * tile_size - width), (0, 0)), mode="edge")
+    tiles = padded.reshape(rows, tile_size, cols, tile_size, TEXTURE_CHANNELS).swapaxes(1, 2)
+    return tiles.reshape(rows * cols, tile_size, tile_size, TEXTURE_CHANNELS)
+
+
+class TileLevel:
+    """
+    Placement of one level's tiles on the globe, precomputed for culling.
+    """
+
+    def __init__(self, width: int, height: int, tile_size: int):
+        self.width = width
+        self.height = height
+        self.cols = -(-width // tile_size)
+        self.rows = -(-height // tile_size)
+        self.texels_per_radian = width / (2.0 * math.pi)
+
+        y, x = np.divmod(np.arange(self.rows * self.cols), self.cols)
+        left, top = x * tile_size, y * tile_size
+        right, bottom = np.minimum(left + tile_size, width), np.minimum(top + tile_size, height)
+
+        # s0, t0, s1, t1 on the globe texture, and the used part of each tile.
+        self.rects = np.stack([left / width, top / height, right / width, bottom / height], axis=1)
+        self.extents = np.stack([(right - left) / tile_size, (bottom - top) / tile_size], axis=1)
+
+        steps = np.linspace(0.0, 1.0, TILE_SAMPLES)
+        s = self.rects[:, 0, None, None] + (self.rects[:, 2] - self.rects[:, 0])[:, None, None] * steps[None, None, :]
+        t = self.rects[:, 1, None, None] + (self.rects[:, 3] - self.rects[:, 1])[:, None, None] * steps[None, :, None]
+        s, t = np.broadcast_arrays(s, t)
+        self.samples = sphere_points(s, t).reshape(len(x), -1, 3)
+
+        self.centers = sphere_points((self.rects[:, 0] + self.rects[:, 2]) / 2, (self.rects[:, 1] + self.rects[:, 3]) / 2)
+        cosines = np.einsum("nkc,nc->nk", self.samples, self.centers).min(axis=1)
+        self.radii = np.arccos(np.clip(cosines, -1.0, 1.0))
+
+
+# =============================================================================
+# Pyramid
+# =============================================================================
+
+class TilePyramid:
+    """
+    The memory-mapped tile file plus per-level placement. `read_tile` copies
+    one tile out of the mapping (faulting its pages in), so it belongs on a
+    worker thread.
+    """
+
+    def __init__(self, path: str, header: dict):
+        self.path = path
+        self.tile_size = header["tile_size"]
+        self.overview_width = header["overview_width"]
+
+        level_sizes = tile_pyramid_level_sizes(header["width"], header["height"], self.overview_width)
+        if len(level_sizes) != header["level_count"]:
+            raise ValueError(f"Tile pyramid has {header['level_count']} levels, expected {len(level_sizes)}.")
+
+        self._mapped, views = map_index_file(
+            path, TILE_PYRAMID_HEADER, tile_pyramid_sections(level_sizes, self.tile_size)
+        )
+        self.levels = [TileLevel(width, height, self.tile_size) for width, height in level_sizes]
+        self._tiles = [
+            views[f"level_{number}"].reshape(-1, self.tile_size, self.tile_size, TEXTURE_CHANNELS)
+            for number in range(len(level_sizes))
+        ]
+
+    @property
+    def tile_count(self) -> int:
+        return sum(level.rows * level.cols for level in self.levels)
+
+    def read_tile(self, key: TileKey) -> np.ndarray:
+        level, x, y = key
+        return np.array(self._tiles[level][y * self.levels[level].cols + x])
+
+    def tile_rect(self, key: TileKey) -> Tuple[np.ndarray, np.ndarray]:
+        level, x, y = key
+        index = y * self.levels[level].cols + x
+        return self.levels[level].rects[index], self.levels[level].extents[index]
+
+    def parent(self, key: TileKey) -> Optional[TileKey]:
+        level, x, y = key
+        if level == 0:
+            return None
+        coarser = self.levels[level - 1]
+        return level - 1, min(x // 2, coarser.cols - 1), min(y // 2, coarser.rows - 1)
+
+    def select_level(self, screen_pixels_per_radian: float, overview_width: int) -> Optional[int]:
+        """
+        Coarsest level with at least one texel per screen pixel; None while
+        the overview texture is sharp enough.
+        """
+        if overview_width / (2.0 * math.pi) >= screen_pixels_per_radian:
+            return None
+        for number, level in enumerate(self.levels):
+            if level.texels_per_radian >= screen_pixels_per_radian:
+                return number
+        return len(self.levels) - 1
+
+    def visible_tiles(
+        self,
+        level_number: int,
+        mvp: np.ndarray,
+        camera: np.ndarray,
+        viewport: Tuple[int, int],
+        screen_pixels_per_radian: float,
+        overview_width: int = 0,
+    ) -> List[TileKey]:
+        """
+        Tiles in front of the horizon and inside the view, nearest to the
+        point facing the camera first. Over-inclusive at the edges (a tile
+        counts when a sample point lies within one sample spacing of the
+        viewport).
+
+        `level_number` is the level the point facing the camera needs;
+        tiles farther away are replaced by their ancestor at the coarsest
+        level that still gives them a texel per pixel, and left out where
+        the overview texture does.
+        """
+        level = self.levels[level_number]
+        distance = float(np.linalg.norm(camera))
+        if distance <= 1.0:
+            return []
+        direction = camera / distance
+
+        # Tiles that can reach the visible cap at all.
+        horizon = math.acos(1.0 / distance)
+        angles = np.arccos(np.clip(level.centers @ direction, -1.0, 1.0))
+        candidates = np.flatnonzero(angles <= horizon + level.radii)
+        if not len(candidates):
+            return []
+
+        samples = level.samples[candidates]
+        clip = samples @ mvp[:3, :3].T + mvp[:3, 3]
+        w = samples @ mvp[3, :3] + mvp[3, 3]
+
+        # Any tile overlapping the view has a sample within one sample spacing of it.
+        spacing = self.tile_size * screen_pixels_per_radian / level.texels_per_radian / (TILE_SAMPLES - 1)
+        limits = 1.0 + 2.0 * spacing / np.maximum(np.asarray(viewport, dtype=np.float64), 1.0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            in_view = (
+                (w > 0)
+                & (np.abs(clip[..., 0]) <= limits[0] * w)
+                & (np.abs(clip[..., 1]) <= limits[1] * w)
+            )
+        # In front of the horizon, with a tile's angular size of slack.
+        facing = samples @ direction > (1.0 / distance) - np.sin(level.radii[candidates])[:, None]
+
+        visible = candidates[(in_view & facing).any(axis=1)]
+        visible = visible[np.argsort(angles[visible], kind="stable")]
+
+        focal = screen_pixels_per_radian * (distance - 1.0)
+        nearest = np.linalg.norm(level.samples[visible] - camera, axis=2).min(axis=1)
+        needed = focal / np.maximum(nearest, 1e-6)
+        texels = np.array([tile_level.texels_per_radian for tile_level in self.levels])
+        tile_levels = np.minimum(np.searchsorted(texels, needed), level_number)
+        sharp_enough = needed <= overview_width / (2.0 * math.pi)
+
+        keys: List[TileKey] = []
+        seen = set()
+        for index, tile_level in zip(visible[~sharp_enough], tile_levels[~sharp_enough]):
+            key = (level_number, int(index % level.cols), int(index // level.cols))
+            while key[0] > tile_level:
+                key = self.parent(key)
+            if key not in seen:
+                seen.add(key)
+                keys.append(key)
+        return keys
+
+    def close(self) -> None:
+        self._tiles = []
+        try:
+            self._mapped.close()
+        except BufferError:
+            pass
+
+
+# =============================================================================
+# Tile file
+# =============================================================================
+
+def read_tile_pyramid_header(path: str) -> Optional[dict]:
+    raw = read_header_bytes(path, TILE_PYRAMID_HEADER)
+    if raw is None:
+        return None
+
+    magic, version, source_sha256, source_size, source_mtime_ns, width, height, tile_size, overview_width, level_count = raw
+    if magic != TILE_PYRAMID_MAGIC or version != TILE_PYRAMID_VERSION:
+        return None
+
+    return {
+        "source_sha256": source_sha256,
+        "source_size": source_size,
+        "source_mtime_ns": source_mtime_ns,
+        "width": width,
+        "height": height,
+        "tile_size": tile_size,
+        "overview_width": overview_width,
+        "level_count": level_count,
+    }
+
+
+def build_tile_pyramid(source_path: str, path: str, tile_size: int = TILE_SIZE,
+                       overview_width: int = OVERVIEW_MAX_WIDTH) -> Dict[str, int]:
+    """
+    Decodes the image once and writes every tiled level. Returns counts for logging.
+    """
+    texture = decode_texture_levels(source_path)
+    level_sizes = tile_pyramid_level_sizes(texture.width, texture.height, overview_width)
+    # Mipmap levels are finest first, tiled levels coarsest first.
+    levels = texture.levels[:len(level_sizes)][::-1]
+
+    stat = os.stat(source_path)
+    header = TILE_PYRAMID_HEADER.pack(
+        TILE_PYRAMID_MAGIC,
+        TILE_PYRAMID_VERSION,
+        file_sha256(source_path),
+        stat.st_size,
+        stat.st_mtime_ns,
+        texture.width,
+        texture.height,
+        tile_size,
+        overview_width,
+        len(level_sizes),
+    )
+    arrays = {f"level_{number}": cut_tiles(level, tile_size).reshape(-1) for number, level in enumerate(levels)}
+    write_index_file(path, header, tile_pyramid_sections(level_sizes, tile_size), arrays)
+
+    return {
+        "width": texture.width,
+        "height": texture.height,
+        "levels": len(level_sizes),
+        "tiles": sum(-(-w // tile_size) * -(-h // tile_size) for w, h in level_sizes),
+    }
+
+
+def load_or_build_tile_pyramid(source_path: str, path: Optional[str] = None,
+                               overview_width: int = OVERVIEW_MAX_WIDTH) -> Optional[TilePyramid]:
+    """
+    The mapped tile pyramid of `source_path`, built first when missing or
+    stale. None when the image is no wider than the overview texture.
+    """
+    path = path or get_default_tile_pyramid_path(source_path)
+    started = time.perf_counter()
+
+    header = read_tile_pyramid_header(path)
+    if header is None or header["tile_size"] != TILE_SIZE or header["overview_width"] != overview_width \
+            or not is_texture_cache_current(header, source_path):
+        counts = build_tile_pyramid(source_path, path, TILE_SIZE, overview_width)
+        logging.info(
+            "Globe tile pyramid built in %.1f ms: %s (%dx%d, %d levels, %d tiles)",
+            (time.perf_counter() - started) * 1000, path, counts["width"], counts["height"],
+            counts["levels"], counts["tiles"],
+        )
+        header = read_tile_pyramid_header(path)
+
+    if header is None or not header["level_count"]:
+        logging.info("Globe detail texture is no wider than %d px; tiles not used: %s", overview_width, source_path)
+        return None
+
+    pyramid = TilePyramid(path, header)
+    logging.info(
+        "Globe tile pyramid mapped: %s (%d levels, %d tiles, finest %dx%d)",
+        path, len(pyramid.levels), pyramid.tile_count, pyramid.levels[-1].width, pyramid.levels[-1].height,
+    )
+    return pyramid
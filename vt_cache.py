@@ -0,0 +1,114 @@
+"""
+Persistent SQLite cache of parsed VirusTotal results, keyed by IP.
+
+Lives next to the settings file, so it survives restarts. Reads are single
+primary-key lookups on a WITHOUT ROWID table (sub-millisecond). Entries
+older than the TTL are still returned, flagged as stale, so callers can
+show them immediately and refresh from the network in the background.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from typing import Optional, Tuple
+
+from app_core import get_app_dir
+
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+VT_CACHE_FILE_NAME = "geo_ip_tracker_vt_cache.sqlite3"
+VT_CACHE_SCHEMA_VERSION = 1
+
+
+def get_vt_cache_file_path() -> str:
+    return os.path.join(get_app_dir(), VT_CACHE_FILE_NAME)
+
+
+# =============================================================================
+# Cache
+# =============================================================================
+
+class VtResultCache:
+    def __init__(self, db_path: str, ttl_seconds: float):
+        self.db_path = db_path
+        self.ttl_seconds = max(0.0, float(ttl_seconds))
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=5, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+
+    def _create_schema(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS vt_results (
+                    ip_addr    TEXT PRIMARY KEY,
+                    result     TEXT NOT NULL,
+                    fetched_at REAL NOT NULL
+                ) WITHOUT ROWID
+                """
+            )
+            self._conn.execute(f"PRAGMA user_version={VT_CACHE_SCHEMA_VERSION}")
+
+    def get(self, ip_addr: str) -> Optional[Tuple[dict, bool]]:
+        """
+        Returns (result, is_stale), or None when the IP was never cached.
+        """
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT result, fetched_at FROM vt_results WHERE ip_addr = ?",
+                    (ip_addr,),
+                ).fetchone()
+        except sqlite3.Error:
+            logging.exception("VirusTotal cache read failed.")
+            return None
+
+        if row is None:
+            return None
+
+        result_json, fetched_at = row
+        try:
+            result = json.loads(result_json)
+        except ValueError:
+            return None
+
+        is_stale = (time.time() - fetched_at) > self.ttl_seconds
+        return result, is_stale
+
+    def put(self, ip_addr: str, result: dict) -> None:
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO vt_results (ip_addr, result, fetched_at) VALUES (?, ?, ?)",
+                    (ip_addr, json.dumps(result, ensure_ascii=False), time.time()),
+                )
+        except sqlite3.Error:
+            logging.exception("VirusTotal cache write failed.")
+
+    def close(self) -> None:
+        with self._lock:
+            try:
+                self._conn.close()
+            except sqlite3.Error:
+                logging.exception("Failed to close VirusTotal cache.")
+
+
+def open_vt_result_cache(ttl_seconds: float) -> Optional[VtResultCache]:
+    """
+    Opens the cache next to the settings file; None when it cannot be opened
+    (lookups then simply go to the network).
+    """
+    try:
+        return VtResultCache(get_vt_cache_file_path(), ttl_seconds)
+    except sqlite3.Error:
+        logging.exception("Failed to open VirusTotal cache.")
+        return None
@@ -0,0 +1,623 @@
+"""
+VirusTotal HTTP access and response parsing, shared by the enrichment engine
+and the API key check.
+
+All VT traffic goes through one pooled keep-alive asyncio client (gzip,
+separate connect/read timeouts, per-request latency recording) that lives on
+the enrichment event loop. Concurrent requests for the same IP are coalesced:
+one GET is in flight per IP, and every caller gets that same payload (or the
+same error), so the status parse and the owner parse never cost two requests.
+"""
+
+import io
+import ssl
+import gzip
+import json
+import time
+import asyncio
+import logging
+import http.client
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+from urllib.parse import urlsplit
+from urllib.error import HTTPError, URLError
+
+from app_core import load_vt_http_timeouts, load_vt_quota_settings
+from service_health import SERVICE_VT, get_circuit_breaker, set_service_probe
+from vt_scheduler import (
+    PRIORITY_INTERACTIVE,
+    VtRequestScheduler,
+    WaitCallback,
+    parse_retry_after,
+)
+
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+VT_API_BASE_URL = "https://www.virustotal.com/api/v3"
+
+HTTP_POOL_SIZE = 4
+HTTP_LATENCY_SAMPLES = 1024
+
+# How often a request rejected with 429 is re-queued before giving up.
+VT_RATE_LIMIT_RETRIES = 2
+
+
+# =============================================================================
+# Pooled HTTP client
+# =============================================================================
+
+@dataclass
+class HttpResponse:
+    status: int
+    headers: http.client.HTTPMessage
+    body: bytes
+    elapsed: float
+
+    def json(self) -> Any:
+        return json.loads(self.body.decode("utf-8"))
+
+
+class PooledHttpClient:
+    """
+    Minimal HTTP/1.1 GET client that keeps up to `pool_size` idle keep-alive
+    connections to one origin. It must only be used from one event loop.
+    Errors are raised as urllib's HTTPError (status >= 400) and URLError
+    (connection problems, timeouts), so callers handle them like `urlopen`.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        connect_timeout: float,
+        read_timeout: float,
+        pool_size: int = HTTP_POOL_SIZE,
+        name: str = "HTTP client",
+        ssl_context: Optional[ssl.SSLContext] = None,
+    ):
+        parts = urlsplit(base_url)
+        if parts.scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported URL scheme: {base_url}")
+
+        self.base_url = base_url.rstrip("/")
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port or (443 if self.scheme == "https" else 80)
+        self.base_path = parts.path.rstrip("/")
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.pool_size = max(1, int(pool_size))
+        self.name = name
+
+        if self.scheme == "https" and ssl_context is None:
+            ssl_context = ssl.create_default_context()
+        self._ssl_context = ssl_context
+        self._host_header = self.host if parts.port is None else f"{self.host}:{self.port}"
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+
+        self.latencies = deque(maxlen=HTTP_LATENCY_SAMPLES)
+        self.requests = 0
+        self.connections_opened = 0
+        self.connections_reused = 0
+
+    # -------------------------------------------------------------------------
+    # Connections
+    # -------------------------------------------------------------------------
+
+    async def _new_connection(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        conn = await asyncio.wait_for(
+            asyncio.open_connection(
+                self.host,
+                self.port,
+                ssl=self._ssl_context,
+                server_hostname=self.host if self._ssl_context is not None else None,
+            ),
+            self.connect_timeout,
+        )
+        self.connections_opened += 1
+        return conn
+
+    def _acquire(self) -> Optional[Tuple[asyncio.StreamReader, asyncio.StreamWriter]]:
+        while self._idle:
+            reader, writer = self._idle.pop()
+            if reader.at_eof() or writer.is_closing():
+                writer.close()
+                continue
+            self.connections_reused += 1
+            return reader, writer
+        return None
+
+    def _release(self, conn: Tuple[asyncio.StreamReader, asyncio.StreamWriter]) -> None:
+        if len(self._idle) < self.pool_size:
+            self._idle.append(conn)
+        else:
+            conn[1].close()
+
+    async def probe(self) -> None:
+        """
+        Reachability check: opens one connection (TCP + TLS) and keeps it
+        for the next request. Raises URLError when the origin is unreachable.
+        """
+        try:
+            conn = await self._new_connection()
+        except (OSError, asyncio.TimeoutError) as e:
+            raise URLError(e)
+        self._release(conn)
+
+    def close(self) -> None:
+        idle, self._idle = self._idle, []
+        for _, writer in idle:
+            writer.close()
+
+    # -------------------------------------------------------------------------
+    # Requests
+    # -------------------------------------------------------------------------
+
+    @staticmethod
+    async def _read_chunked(reader: asyncio.StreamReader) -> bytes:
+        chunks = []
+        while True:
+            size_line = await reader.readuntil(b"\r\n")
+            size = int(size_line.split(b";", 1)[0].strip(), 16)
+            if size == 0:
+                # Skip optional trailers up to the terminating empty line.
+                while await reader.readuntil(b"\r\n") != b"\r\n":
+                    pass
+                return b"".join(chunks)
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+
+    async def _read_response(self, reader: asyncio.StreamReader):
+        head = await reader.readuntil(b"\r\n\r\n")
+        status_line, _, header_block = head.partition(b"\r\n")
+
+        parts = status_line.decode("latin-1").split(None, 2)
+        version, status = parts[0], int(parts[1])
+        reason = parts[2] if len(parts) > 2 else ""
+        headers = http.client.parse_headers(io.BytesIO(header_block))
+
+        keep_alive = version == "HTTP/1.1" and headers.get("Connection", "").lower() != "close"
+
+        if headers.get("Transfer-Encoding", "").lower() == "chunked":
+            body = await self._read_chunked(reader)
+        elif headers.get("Content-Length") is not None:
+            body = await reader.readexactly(int(headers["Content-Length"]))
+        else:
+            body = await reader.read()
+            keep_alive = False
+
+        if headers.get("Content-Encoding", "").lower() == "gzip":
+            body = gzip.decompress(body)
+
+        return status, reason, headers, body, keep_alive
+
+    async def _send(self, conn, path: str, headers: dict):
+        reader, writer = conn
+        lines = [f"GET {path} HTTP/1.1", f"Host: {self._host_header}"]
+        lines.extend(f"{key}: {value}" for key, value in headers.items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        await writer.drain()
+        return await asyncio.wait_for(self._read_response(reader), self.read_timeout)
+
+    async def get(self, path: str, headers: Optional[dict] = None) -> HttpResponse:
+        url = f"{self.base_url}{path}"
+        request_headers = {
+            "Accept-Encoding": "gzip",
+            "Connection": "keep-alive",
+        }
+        request_headers.update(headers or {})
+
+        started = time.perf_counter()
+        conn = self._acquire()
+
+        try:
+            if conn is not None:
+                try:
+                    response = await self._send(conn, self.base_path + path, request_headers)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    # The server dropped an idle keep-alive connection; GET is
+                    # idempotent, so retry once on a fresh connection.
+                    conn[1].close()
+                    conn = None
+
+            if conn is None:
+                conn = await self._new_connection()
+                response = await self._send(conn, self.base_path + path, request_headers)
+
+        # asyncio.TimeoutError (wait_for) is an OSError only from Python 3.11.
+        except (OSError, EOFError, ValueError, asyncio.LimitOverrunError, asyncio.TimeoutError) as e:
+            if conn is not None:
+                conn[1].close()
+            raise URLError(e)
+
+        except BaseException:
+            # Cancelled mid-request: the connection is in an unknown state.
+            if conn is not None:
+                conn[1].close()
+            raise
+
+        status, reason, response_headers, body, keep_alive = response
+        elapsed = time.perf_counter() - started
+
+        if keep_alive:
+            self._release(conn)
+        else:
+            conn[1].close()
+
+        self.requests += 1
+        self.latencies.append(elapsed)
+
+        if status >= 400:
+            raise HTTPError(url, status, reason, response_headers, None)
+
+        return HttpResponse(status, response_headers, body, elapsed)
+
+    def latency_stats(self) -> dict:
+        samples = sorted(self.latencies)
+        stats = {
+            "name": self.name,
+            "requests": self.requests,
+            "connections_opened": self.connections_opened,
+            "connections_reused": self.connections_reused,
+        }
+
+        if samples:
+            stats.update({
+                "mean_ms": sum(samples) / len(samples) * 1000,
+                "p50_ms": samples[len(samples) // 2] * 1000,
+                "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000,
+                "max_ms": samples[-1] * 1000,
+            })
+        return stats
+
+    def log_stats(self) -> None:
+        stats = self.latency_stats()
+        logging.info(
+            "%s stats: requests=%d opened=%d reused=%d mean=%.1fms p50=%.1fms p95=%.1fms",
+            stats["name"],
+            stats["requests"],
+            stats["connections_opened"],
+            stats["connections_reused"],
+            stats.get("mean_ms", 0.0),
+            stats.get("p50_ms", 0.0),
+            stats.get("p95_ms", 0.0),
+        )
+
+
+_vt_http_client: Optional[PooledHttpClient] = None
+
+
+def get_vt_http_client() -> PooledHttpClient:
+    global _vt_http_client
+
+    if _vt_http_client is None:
+        connect_timeout, read_timeout = load_vt_http_timeouts()
+        _vt_http_client = PooledHttpClient(
+            VT_API_BASE_URL, connect_timeout, read_timeout, name="VirusTotal HTTP client"
+        )
+        set_service_probe(SERVICE_VT, _vt_http_client.probe)
+    return _vt_http_client
+
+
+_vt_scheduler: Optional[VtRequestScheduler] = None
+
+
+def get_vt_scheduler() -> VtRequestScheduler:
+    global _vt_scheduler
+
+    if _vt_scheduler is None:
+        _vt_scheduler = VtRequestScheduler(*load_vt_quota_settings())
+    return _vt_scheduler
+
+
+def set_vt_api_keys(api_keys) -> None:
+    """
+    Sets the API key pool. Must run on the enrichment loop.
+    """
+    get_vt_scheduler().set_keys(api_keys)
+
+
+def has_vt_api_keys() -> bool:
+    return get_vt_scheduler().has_keys()
+
+
+def has_usable_vt_api_keys() -> bool:
+    """
+    False when every key in the pool is suspended after a 401.
+    """
+    return get_vt_scheduler().usable_key_count() > 0
+
+
+# =============================================================================
+# Single-flight request coalescing
+# =============================================================================
+
+class SingleFlight:
+    """
+    `do(key, factory)` runs `factory()` once per key at a time; callers
+    arriving while it runs await the same task. Results are not kept
+    afterwards. One caller being cancelled does not cancel the others, but
+    when the last caller is cancelled the task is cancelled too, so nobody
+    keeps paying for an answer no one is waiting for.
+    """
+
+    def __init__(self, name: str = "single-flight"):
+        self.name = name
+        self._flights: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Dict[Hashable, int] = {}
+
+        self.calls = 0
+        self.shared = 0
+        self.cancelled = 0
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._flights.get(key) is task:
+            del self._flights[key]
+            self._waiters.pop(key, None)
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._flights.get(key)
+
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._flights[key] = task
+            task.add_done_callback(lambda done, key=key: self._forget(key, done))
+            self.calls += 1
+        else:
+            self.shared += 1
+
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and self._waiters.get(key) == 1 and self._flights.get(key) is task:
+                # Unregister first so a caller arriving now starts afresh.
+                self._forget(key, task)
+                task.cancel()
+                self.cancelled += 1
+            raise
+        finally:
+            if self._flights.get(key) is task:
+                self._waiters[key] -= 1
+
+    def log_stats(self) -> None:
+        logging.info(
+            "%s stats: calls=%d shared=%d cancelled=%d", self.name, self.calls, self.shared, self.cancelled
+        )
+
+
+_ip_report_flights = SingleFlight(name="VirusTotal request coalescing")
+
+
+# =============================================================================
+# IP report
+# =============================================================================
+
+# Wait-time listeners of every caller attached to an in-flight IP.
+_wait_listeners: Dict[str, List[WaitCallback]] = {}
+
+
+async def get_ip_report_response(ip_addr: str, api_key: str) -> HttpResponse:
+    """
+    Unmetered, uncoalesced GET /ip_addresses/{ip}.
+    """
+    return await get_vt_http_client().get(f"/ip_addresses/{ip_addr}", headers={
+        "x-apikey": api_key,
+        "accept": "application/json",
+    })
+
+
+async def get_validation_response(ip_addr: str, api_key: str) -> HttpResponse:
+    """
+    API key check: sent immediately, but counted against the key's quota.
+    """
+    get_vt_scheduler().record_unscheduled(api_key)
+    return await get_ip_report_response(ip_addr, api_key)
+
+
+async def _fetch_metered(ip_addr: str, priority: int) -> dict:
+    scheduler = get_vt_scheduler()
+    rate_limited = 0
+
+    def notify_wait(seconds: float) -> None:
+        for listener in list(_wait_listeners.get(ip_addr, ())):
+            listener(seconds)
+
+    breaker = get_circuit_breaker(SERVICE_VT)
+
+    while True:
+        # Checked before queueing, so an unreachable service costs no quota.
+        breaker.check()
+        try:
+            api_key = await scheduler.acquire(priority, notify_wait)
+            response = await get_ip_report_response(ip_addr, api_key)
+
+        except HTTPError as e:
+            if e.code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+
+            if e.code == 401:
+                # Retry with another key while any usable key is left.
+                scheduler.report_unauthorized(api_key)
+                if scheduler.usable_key_count() == 0:
+                    raise
+            elif e.code == 429 and rate_limited < VT_RATE_LIMIT_RETRIES:
+                rate_limited += 1
+                scheduler.report_rate_limited(api_key, parse_retry_after(e.headers.get("Retry-After")))
+            else:
+                raise
+
+        except URLError:
+            breaker.record_failure()
+            raise
+
+        except asyncio.CancelledError:
+            breaker.record_cancelled()
+            raise
+
+        else:
+            breaker.record_success()
+            return response.json()
+
+
+async def fetch_ip_report(
+    ip_addr: str,
+    priority: int = PRIORITY_INTERACTIVE,
+    on_wait: Optional[WaitCallback] = None,
+) -> dict:
+    """
+    GET /ip_addresses/{ip}, sent with a key from the pool as soon as the
+    scheduler grants one. While the request is queued,
+    `on_wait(estimated_seconds)` reports the expected wait.
+
+    Raises urllib's HTTPError / URLError like `urlopen`. The returned
+    payload may be shared between callers and must be treated as read-only.
+    """
+    if on_wait is not None:
+        _wait_listeners.setdefault(ip_addr, []).append(on_wait)
+
+    try:
+        return await _ip_report_flights.do(ip_addr, lambda: _fetch_metered(ip_addr, priority))
+    finally:
+        if on_wait is not None:
+            listeners = _wait_listeners.get(ip_addr, [])
+            if on_wait in listeners:
+                listeners.remove(on_wait)
+            if not listeners:
+                _wait_listeners.pop(ip_addr, None)
+
+
+def log_request_stats() -> None:
+    _ip_report_flights.log_stats()
+    if _vt_scheduler is not None:
+        _vt_scheduler.log_stats()
+    if _vt_http_client is not None:
+        _vt_http_client.log_stats()
+
+
+# =============================================================================
+# Report parsing
+# =============================================================================
+
+def format_vt_date(ts) -> str:
+    if not ts:
+        return "No data"
+    try:
+        return datetime.fromtimestamp(int(ts), timezone.utc).strftime("%Y.%m.%d")
+    except Exception:
+        return "No data"
+
+
+def format_vt_http_error(code: int) -> dict:
+    if code == 401:
+        return {
+            "status_text": "Unauthorized",
+            "detect_name": "Invalid API key",
+            "recent_activity": "No data",
+        }
+    if code == 404:
+        return {
+            "status_text": "0/0 (VirusTotal)",
+            "detect_name": "No data",
+            "recent_activity": "No data",
+        }
+    if code == 429:
+        return {
+            "status_text": "Rate limited",
+            "detect_name": "Try again later",
+            "recent_activity": "No data",
+        }
+
+    return {
+        "status_text": "Error",
+        "detect_name": f"HTTP {code}",
+        "recent_activity": "No data",
+    }
+
+
+def parse_vt_status(data: dict) -> dict:
+    attributes = data.get("data", {}).get("attributes", {})
+    stats = attributes.get("last_analysis_stats", {})
+    results = attributes.get("last_analysis_results", {})
+
+    harmless = int(stats.get("harmless", 0))
+    malicious = int(stats.get("malicious", 0))
+    suspicious = int(stats.get("suspicious", 0))
+    undetected = int(stats.get("undetected", 0))
+    timeout = int(stats.get("timeout", 0))
+
+    total = harmless + malicious + suspicious + undetected + timeout
+    detected = malicious + suspicious
+
+    detect_name = "No data"
+    for result_obj in results.values():
+        category = str(result_obj.get("category", "")).lower()
+        result_name = result_obj.get("result")
+        if category in ("malicious", "suspicious") and result_name:
+            detect_name = str(result_name)
+            break
+
+    recent_ts = attributes.get("last_analysis_date") or attributes.get("last_modification_date")
+
+    return {
+        "status_text": f"{detected}/{total} (VirusTotal)",
+        "detect_name": detect_name,
+        "recent_activity": format_vt_date(recent_ts),
+    }
+
+
+def extract_owner_from_whois_text(whois_text: str) -> str:
+    if not whois_text:
+        return ""
+
+    preferred_keys = (
+        "OrgName",
+        "org-name",
+        "Organization",
+        "owner",
+        "descr",
+        "netname",
+    )
+
+    for line in whois_text.splitlines():
+        if ":" not in line:
+            continue
+
+        key, value = line.split(":", 1)
+        key = key.strip()
+        value = value.strip()
+
+        if key in preferred_keys and value:
+            return value
+
+    return ""
+
+
+def parse_vt_owner(data: dict) -> str:
+    attributes = data.get("data", {}).get("attributes", {})
+
+    owner = (
+        attributes.get("as_owner")
+        or attributes.get("owner")
+        or attributes.get("network_owner")
+        or ""
+    )
+
+    if owner:
+        return str(owner)
+
+    whois_owner = extract_owner_from_whois_text(str(attributes.get("whois") or ""))
+    if whois_owner:
+        return whois_owner
+
+    registry = attributes.get("regional_internet_registry")
+    if registry:
+        return f"No owner data / RIR: {registry}"
+
+    return "No data"
@@ -0,0 +1,394 @@
+"""
+VirusTotal request metering over a pool of API keys: per-key minute (token
+bucket) and daily quotas, and one priority queue of waiting requests
+(interactive lookups ahead of batch work).
+
+Runs on the enrichment event loop. Waiting callers are told their estimated
+wait, so the GUI can show "queued (~N s)" instead of a rate-limit error.
+A 429 response pauses that key for the server's Retry-After; a 401 takes
+the key out of rotation for a while.
+"""
+
+import time
+import heapq
+import asyncio
+import itertools
+import logging
+from datetime import datetime, time as dt_time, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, List, Optional
+
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+# Used when a 429 response carries no usable Retry-After header.
+DEFAULT_RETRY_AFTER_SECONDS = 60.0
+
+# How long a key rejected with 401 is left out of rotation.
+UNAUTHORIZED_SUSPEND_SECONDS = 15 * 60
+
+WaitCallback = Callable[[float], None]
+
+
+def parse_retry_after(value: Optional[str], default: float = DEFAULT_RETRY_AFTER_SECONDS) -> float:
+    """
+    Retry-After is either delay-seconds or an HTTP-date.
+    """
+    if not value:
+        return default
+
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+# =============================================================================
+# Token bucket
+# =============================================================================
+
+class TokenBucket:
+    """
+    `capacity` tokens, refilled continuously at `refill_per_second`.
+    """
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        self.tokens = float(capacity)
+        self.paused_until = 0.0
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        # `_updated` lies in the future while paused: nothing refills then.
+        if now > self._updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.refill_per_second)
+            self._updated = now
+
+    def wait_time(self, tokens: float = 1.0) -> float:
+        """
+        Seconds until `tokens` tokens are available (0 = now).
+        """
+        now = time.monotonic()
+        self._refill(now)
+
+        pause = max(0.0, self.paused_until - now)
+        missing = max(0.0, tokens - self.tokens)
+        if missing and self.refill_per_second <= 0:
+            return float("inf")
+        return pause + (missing / self.refill_per_second if missing else 0.0)
+
+    def take(self) -> None:
+        """
+        Spends one token; the balance may go negative for unmetered calls.
+        """
+        self._refill(time.monotonic())
+        self.tokens -= 1
+
+    def pause(self, seconds: float) -> None:
+        """
+        No tokens are handed out for `seconds`, and the balance is emptied
+        (the server told us the quota is used up).
+        """
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens = min(self.tokens, 0.0)
+        self.paused_until = max(self.paused_until, now + seconds)
+        self._updated = max(self._updated, self.paused_until)
+
+
+# =============================================================================
+# API key pool
+# =============================================================================
+
+def mask_api_key(api_key: str) -> str:
+    return f"{api_key[:4]}...{api_key[-4:]}" if len(api_key) > 8 else "****"
+
+
+def seconds_until_utc_midnight() -> float:
+    now = datetime.now(timezone.utc)
+    midnight = datetime.combine(now.date() + timedelta(days=1), dt_time(0), timezone.utc)
+    return (midnight - now).total_seconds()
+
+
+class VtKeyState:
+    """
+    Quota accounting for one API key: a per-minute token bucket, a daily
+    counter (VirusTotal resets at 00:00 UTC) and a temporary suspension
+    after the key was rejected with 401.
+    """
+
+    def __init__(self, api_key: str, requests_per_minute: float, requests_per_day: int):
+        self.api_key = api_key
+        self.bucket = TokenBucket(requests_per_minute, requests_per_minute / 60.0)
+        self.requests_per_day = int(requests_per_day)
+
+        self.day = datetime.now(timezone.utc).date()
+        self.used_today = 0
+        self.used_total = 0
+        self.unauthorized_until = 0.0
+
+    def _roll_day(self) -> None:
+        today = datetime.now(timezone.utc).date()
+        if today != self.day:
+            self.day = today
+            self.used_today = 0
+
+    @property
+    def is_unauthorized(self) -> bool:
+        return self.unauthorized_until > time.monotonic()
+
+    def remaining_today(self) -> int:
+        self._roll_day()
+        return max(0, self.requests_per_day - self.used_today)
+
+    def wait_time(self, tokens: int = 1) -> float:
+        """
+        Seconds until this key can send its `tokens`-th next request.
+        """
+        wait = max(0.0, self.unauthorized_until - time.monotonic())
+        if tokens > self.remaining_today():
+            wait = max(wait, seconds_until_utc_midnight())
+        return max(wait, self.bucket.wait_time(tokens))
+
+    def spend(self) -> None:
+        self._roll_day()
+        self.bucket.take()
+        self.used_today += 1
+        self.used_total += 1
+
+
+# =============================================================================
+# Scheduler
+# =============================================================================
+
+class _Ticket:
+    __slots__ = ("priority", "seq", "future", "on_wait")
+
+    def __init__(self, priority: int, seq: int, future: asyncio.Future, on_wait):
+        self.priority = priority
+        self.seq = seq
+        self.future = future
+        self.on_wait = on_wait
+
+    def __lt__(self, other: "_Ticket") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class VtRequestScheduler:
+    """
+    Hands out API keys from the pool to waiting requests, highest priority
+    first, always picking the usable key with the most remaining budget.
+    Each key has its own quota, so throughput grows with the pool size.
+    """
+
+    def __init__(self, requests_per_minute: float, requests_per_day: int):
+        self.requests_per_minute = max(1.0, float(requests_per_minute))
+        self.requests_per_day = max(1, int(requests_per_day))
+
+        self._keys: Dict[str, VtKeyState] = {}
+        self._queue: List[_Ticket] = []
+        self._seq = itertools.count()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+        self.granted = 0
+        self.queued = 0
+        self.rate_limited = 0
+        self.unauthorized = 0
+        self.withdrawn = 0
+
+    def __len__(self) -> int:
+        return sum(1 for ticket in self._queue if not ticket.future.done())
+
+    # -------------------------------------------------------------------------
+    # Key pool
+    # -------------------------------------------------------------------------
+
+    def set_keys(self, api_keys) -> None:
+        """
+        Replaces the pool; accounting of keys that stay in it is kept.
+        """
+        states = {}
+        for api_key in api_keys:
+            if api_key and api_key not in states:
+                states[api_key] = self._keys.get(api_key) or VtKeyState(
+                    api_key, self.requests_per_minute, self.requests_per_day
+                )
+        self._keys = states
+        logging.info("VirusTotal key pool: %d key(s)", len(states))
+        if self._wakeup is not None:
+            self._wake()
+
+    def has_keys(self) -> bool:
+        return bool(self._keys)
+
+    def usable_key_count(self) -> int:
+        return sum(1 for state in self._keys.values() if not state.is_unauthorized)
+
+    def _pick_key(self) -> Optional[VtKeyState]:
+        ready = [state for state in self._keys.values() if state.wait_time() <= 0]
+        if not ready:
+            return None
+        return max(ready, key=lambda state: (state.bucket.tokens, state.remaining_today()))
+
+    def _next_grant_times(self, count: int) -> List[float]:
+        """
+        Estimated seconds until each of the next `count` grants, over all keys.
+        """
+        times = []
+        for state in self._keys.values():
+            for tokens in range(1, count + 1):
+                wait = state.wait_time(tokens)
+                if wait == float("inf"):
+                    break
+                times.append(wait)
+        times.sort()
+        return times[:count]
+
+    # -------------------------------------------------------------------------
+    # Requests
+    # -------------------------------------------------------------------------
+
+    async def acquire(
+        self,
+        priority: int = PRIORITY_INTERACTIVE,
+        on_wait: Optional[WaitCallback] = None,
+    ) -> str:
+        """
+        Returns the API key to send the next request with. While queued,
+        `on_wait(estimated_seconds)` is called whenever the estimate changes.
+        Cancelling the caller removes it from the queue without using quota.
+        """
+        ticket = _Ticket(priority, next(self._seq), asyncio.get_running_loop().create_future(), on_wait)
+        heapq.heappush(self._queue, ticket)
+        self._wake()
+
+        try:
+            return await ticket.future
+        except asyncio.CancelledError:
+            # Cancelling the caller cancels the ticket too, unless a key was
+            # already granted. The ticket stays in the heap; `_dispatch`
+            # skips cancelled ones.
+            if not ticket.future.done():
+                ticket.future.cancel()
+            if ticket.future.cancelled():
+                self.withdrawn += 1
+                self._wake()
+            raise
+
+    def record_unscheduled(self, api_key: str) -> None:
+        """
+        Accounts for a request sent outside the queue (API key validation).
+        """
+        state = self._keys.get(api_key)
+        if state is not None:
+            state.spend()
+
+    def report_rate_limited(self, api_key: str, retry_after: float) -> None:
+        """
+        The server answered 429: hold `api_key` for `retry_after` seconds.
+        """
+        self.rate_limited += 1
+        state = self._keys.get(api_key)
+        if state is not None:
+            state.bucket.pause(retry_after)
+        logging.warning(
+            "VirusTotal rate limit hit for key %s; pausing it for %.0f s.", mask_api_key(api_key), retry_after
+        )
+        self._wake()
+
+    def report_unauthorized(self, api_key: str) -> None:
+        """
+        The server answered 401: drop `api_key` from rotation for a while.
+        """
+        self.unauthorized += 1
+        state = self._keys.get(api_key)
+        if state is not None:
+            state.unauthorized_until = time.monotonic() + UNAUTHORIZED_SUSPEND_SECONDS
+        logging.warning(
+            "VirusTotal key %s was rejected (401); suspended for %.0f s.",
+            mask_api_key(api_key),
+            UNAUTHORIZED_SUSPEND_SECONDS,
+        )
+        self._wake()
+
+    def _wake(self) -> None:
+        if self._dispatcher is None or self._dispatcher.done():
+            self._wakeup = asyncio.Event()
+            self._dispatcher = asyncio.ensure_future(self._dispatch())
+        else:
+            self._wakeup.set()
+
+    def _estimate_waits(self) -> None:
+        pending = [ticket for ticket in sorted(self._queue) if not ticket.future.done()]
+        grant_times = self._next_grant_times(len(pending))
+
+        for position, ticket in enumerate(pending):
+            if ticket.on_wait is None:
+                continue
+            wait = grant_times[position] if position < len(grant_times) else float("inf")
+            try:
+                ticket.on_wait(wait)
+            except Exception:
+                logging.exception("VirusTotal queue wait callback failed.")
+
+    async def _dispatch(self) -> None:
+        while True:
+            while self._queue and self._queue[0].future.done():
+                heapq.heappop(self._queue)
+
+            if not self._queue:
+                return
+
+            state = self._pick_key()
+            if state is not None:
+                ticket = heapq.heappop(self._queue)
+                state.spend()
+                ticket.future.set_result(state.api_key)
+                self.granted += 1
+                continue
+
+            grant_times = self._next_grant_times(1)
+            wait = grant_times[0] if grant_times else None
+
+            self.queued += 1
+            self._estimate_waits()
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+
+    def log_stats(self) -> None:
+        logging.info(
+            "VirusTotal scheduler stats: keys=%d granted=%d queued_waits=%d withdrawn=%d rate_limited=%d "
+            "unauthorized=%d pending=%d",
+            len(self._keys),
+            self.granted,
+            self.queued,
+            self.withdrawn,
+            self.rate_limited,
+            self.unauthorized,
+            len(self),
+        )
+        for state in self._keys.values():
+            logging.info(
+                "VirusTotal key %s: used_today=%d/%d used_total=%d%s",
+                mask_api_key(state.api_key),
+                state.used_today,
+                state.requests_per_day,
+                state.used_total,
+                " (suspended: 401)" if state.is_unauthorized else "",
+            )